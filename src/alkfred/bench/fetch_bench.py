@@ -0,0 +1,107 @@
+"""
+Fetch throughput benchmark against the local CIViC stand-in.
+
+    python -m alkfred.bench.fetch_bench --total 20000 --latency 0.05 --rate-429 0.02 --workers 1 4 8
+
+Reports pages/sec, bytes/sec and retry overhead for each worker count, so throttling and
+concurrency can be tuned (and regressions caught) without touching civicdb.org.
+"""
+import argparse
+import logging
+import time
+
+import api_calls
+import utils
+from alkfred.bench.mock_civic import MockCivicServer
+from alkfred.etl import civic_fetch
+
+logger = logging.getLogger(__name__)
+
+
+def run_fetch_bench(server: MockCivicServer, workers: int = 1, page_size: int = 500, rate: float = 50.0,
+                    gene: str | None = None) -> dict:
+    """
+    Drain the fetch layer against `server` once and measure it.
+
+    Args:
+        server (MockCivicServer): A started mock server.
+        workers (int): Concurrent streams (full scans are cut per evidenceType when > 1).
+        page_size (int): Initial page size for the adaptive controller.
+        rate (float): Initial token-bucket rate, requests/sec.
+        gene (str | None): Resolve this gene server-side instead of scanning everything.
+    """
+    saved = (api_calls.GRAPHQL_URL, api_calls.page_sizer, utils.rate_limiter)
+    api_calls.GRAPHQL_URL = server.url
+    api_calls.page_sizer = utils.PageSizeController(size=page_size)
+    utils.rate_limiter = utils.TokenBucket(rate=rate, capacity=rate, max_rate=max(rate, 500.0))
+    before = dict(server.stats)
+    try:
+        started = time.perf_counter()
+        streams = civic_fetch.plan_streams(gene, server_filter=gene is not None, partition=workers > 1)
+        pages = items = 0
+        for _, nodes, _ in civic_fetch.iter_stream_pages(streams, workers=workers):
+            if nodes is None:
+                continue
+            pages += 1
+            items += len(nodes)
+        seconds = time.perf_counter() - started
+        final_page_size, final_rate = api_calls.page_sizer.size, utils.rate_limiter.rate
+    finally:
+        api_calls.GRAPHQL_URL, api_calls.page_sizer, utils.rate_limiter = saved
+
+    delta = {k: server.stats[k] - before[k] for k in server.stats}
+    return {
+        "workers": workers,
+        "pages": pages,
+        "items": items,
+        "seconds": seconds,
+        "pages_per_sec": pages / seconds if seconds else 0.0,
+        "bytes_per_sec": delta["bytes"] / seconds if seconds else 0.0,
+        "requests": delta["requests"],
+        "retries": delta["requests"] - delta["ok"],
+        "retry_overhead": (delta["requests"] - delta["ok"]) / delta["requests"] if delta["requests"] else 0.0,
+        "http_429": delta["429"],
+        "http_5xx": delta["5xx"],
+        "final_page_size": final_page_size,
+        "final_rate": final_rate,
+    }
+
+
+def build_bench_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark the CIViC fetch layer against a local mock server")
+    p.add_argument("--total", type=int, default=20000, help="Synthetic evidence items")
+    p.add_argument("--latency", type=float, default=0.02, help="Seconds added to every response")
+    p.add_argument("--jitter", type=float, default=0.01)
+    p.add_argument("--rate-429", type=float, default=0.0, help="Probability of a 429 per request")
+    p.add_argument("--retry-after", type=float, default=0.0)
+    p.add_argument("--burst-every", type=int, default=0, help="Start a 503 burst every N requests")
+    p.add_argument("--burst-len", type=int, default=1)
+    p.add_argument("--page-size", type=int, default=500)
+    p.add_argument("--rate", type=float, default=50.0, help="Initial requests/sec of the token bucket")
+    p.add_argument("--gene", type=str, default=None, help="Use the server-side gene filter for this symbol")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    p.add_argument("--verbose", action="store_true")
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_bench_parser().parse_args(argv)
+    # utils configures the root logger at import; quiet the per-page chatter unless asked
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    print(f"{'workers':>7} {'pages':>6} {'items':>7} {'secs':>7} {'pages/s':>8} {'MB/s':>6} "
+          f"{'retry%':>6} {'429':>4} {'5xx':>4} {'page':>5} {'rate':>6}")
+    for workers in args.workers:
+        server = MockCivicServer(total=args.total, latency=args.latency, jitter=args.jitter,
+                                 rate_429=args.rate_429, retry_after=args.retry_after,
+                                 burst_5xx_every=args.burst_every, burst_len=args.burst_len)
+        with server:
+            r = run_fetch_bench(server, workers=workers, page_size=args.page_size, rate=args.rate, gene=args.gene)
+        print(f"{r['workers']:>7} {r['pages']:>6} {r['items']:>7} {r['seconds']:>7.2f} {r['pages_per_sec']:>8.1f} "
+              f"{r['bytes_per_sec'] / 1e6:>6.2f} {r['retry_overhead'] * 100:>6.1f} {r['http_429']:>4} "
+              f"{r['http_5xx']:>4} {r['final_page_size']:>5} {r['final_rate']:>6.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
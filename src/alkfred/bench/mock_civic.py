@@ -0,0 +1,243 @@
+"""
+Local stand-in for the CIViC GraphQL endpoint.
+
+Serves a deterministic synthetic evidence corpus with opaque Relay cursors and the
+lookup queries the fetch layer uses (gene, variants by feature, molecularProfiles by
+name). Latency, 429s (with Retry-After) and 5xx bursts are configurable, so the fetch
+layer can be exercised and tuned without touching civicdb.org.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+GENES = ("ALK", "EGFR", "ROS1", "BRAF", "KRAS")
+EVIDENCE_TYPES = ("PREDICTIVE", "DIAGNOSTIC", "PROGNOSTIC", "PREDISPOSING", "ONCOGENIC", "FUNCTIONAL")
+PROFILES_PER_GENE = 40
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.b64encode(f"offset:{offset}".encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> int:
+    if not cursor:
+        return 0
+    return int(base64.b64decode(cursor).decode().split(":", 1)[1])
+
+
+def profile_for(mp_id: int) -> tuple[str, str]:
+    # (gene, profile name); every 10th profile of a gene is a fusion that only matches by name
+    gene = GENES[(mp_id - 1) // PROFILES_PER_GENE % len(GENES)]
+    n = (mp_id - 1) % PROFILES_PER_GENE
+    if n % 10 == 0:
+        return gene, f"EML4::{gene}"
+    return gene, f"{gene} X{1000 + n}Y"
+
+
+def synthetic_evidence(eid: int) -> dict:
+    mp_id = (eid * 7) % (PROFILES_PER_GENE * len(GENES)) + 1
+    gene, mp_name = profile_for(mp_id)
+    return {
+        "id": eid,
+        "status": "ACCEPTED",
+        "significance": "RESISTANCE" if eid % 3 == 0 else "SENSITIVITYRESPONSE",
+        "evidenceType": EVIDENCE_TYPES[eid % len(EVIDENCE_TYPES)],
+        "evidenceLevel": "ABCDE"[eid % 5],
+        "evidenceRating": eid % 5 + 1,
+        "evidenceDirection": "SUPPORTS",
+        "description": f"Synthetic evidence item {eid} for {mp_name}. " * 4,
+        "molecularProfile": {
+            "id": mp_id,
+            "name": mp_name,
+            "variants": [{
+                "name": mp_name.split(" ", 1)[-1] if " " in mp_name else "Fusion",
+                "alleleRegistryId": f"CA{900000 + mp_id}" if "::" not in mp_name else None,
+                "feature": {"name": gene},
+            }],
+        },
+        "therapies": [{"name": f"therapy{eid % 12}", "ncitId": f"C{100000 + eid % 12}"}],
+        "disease": {"doid": str(3908 + eid % 4), "name": f"Disease {eid % 4}", "diseaseAliases": []},
+        "source": {"ascoAbstractId": None, "citationId": str(20000000 + eid), "pmcId": None,
+                   "sourceType": "PUBMED", "title": f"Paper {eid}", "publicationYear": 2000 + eid % 25},
+    }
+
+
+@dataclass
+class MockCivicServer:
+    """
+    Threaded mock GraphQL server.
+
+    Args:
+        total (int): Number of synthetic evidence items.
+        latency (float): Base seconds added to every response.
+        jitter (float): Extra uniformly random seconds per response.
+        rate_429 (float): Probability of answering 429 instead of data.
+        retry_after (float): Retry-After seconds sent with each 429 (rounded up, HTTP wants integers).
+        burst_5xx_every (int): Every N-th request starts a 503 burst (0 = never).
+        burst_len (int): Consecutive 503s per burst.
+        max_page (int): Largest `first` honoured, like a real server's page cap.
+        seed (int): RNG seed so runs are reproducible.
+    """
+
+    total: int = 5000
+    latency: float = 0.0
+    jitter: float = 0.0
+    rate_429: float = 0.0
+    retry_after: float = 0.0
+    burst_5xx_every: int = 0
+    burst_len: int = 1
+    max_page: int = 1000
+    seed: int = 0
+    stats: dict = field(default_factory=lambda: {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "bytes": 0})
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._burst_left = 0
+        self._items: list[dict] | None = None
+        self._httpd: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    # --- lifecycle -----------------------------------------------------------
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/graphql"
+
+    def start(self) -> "MockCivicServer":
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                status, headers, body = server.handle(payload)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                log.debug("mock civic: " + fmt, *args)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-civic", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "MockCivicServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # --- request handling ----------------------------------------------------
+    def _fault(self) -> tuple[int, dict, bytes] | None:
+        with self._lock:
+            self.stats["requests"] += 1
+            n = self.stats["requests"]
+            if self.burst_5xx_every and n % self.burst_5xx_every == 0:
+                self._burst_left = self.burst_len
+            if self._burst_left:
+                self._burst_left -= 1
+                self.stats["5xx"] += 1
+                return 503, {"Content-Type": "text/plain"}, b"upstream unavailable"
+            if self.rate_429 and self._rng.random() < self.rate_429:
+                self.stats["429"] += 1
+                return 429, {"Content-Type": "application/json", "Retry-After": str(math.ceil(self.retry_after))}, b"{}"
+            delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        return None
+
+    def handle(self, payload: dict) -> tuple[int, dict, bytes]:
+        fault = self._fault()
+        if fault:
+            return fault
+        query = payload.get("query") or ""
+        variables = payload.get("variables") or {}
+        if "evidenceItems(" in query:
+            data = {"evidenceItems": self._evidence_page(variables)}
+        elif "gene(" in query:
+            symbol = (variables.get("symbol") or "").upper()
+            data = {"gene": {"id": GENES.index(symbol) + 1, "name": symbol} if symbol in GENES else None}
+        elif "variants(" in query:
+            data = {"variants": self._variants_page(variables)}
+        elif "molecularProfiles(" in query:
+            data = {"molecularProfiles": self._profiles_page(variables)}
+        else:
+            data = None
+        body = json.dumps({"data": data} if data else {"errors": [{"message": "unsupported query"}]}).encode()
+        with self._lock:
+            self.stats["ok"] += 1
+            self.stats["bytes"] += len(body)
+        return 200, {"Content-Type": "application/json"}, body
+
+    def _page(self, items: list, variables: dict) -> dict:
+        first = min(int(variables.get("first") or 25), self.max_page)
+        offset = decode_cursor(variables.get("after"))
+        chunk = items[offset:offset + first]
+        end = offset + len(chunk)
+        return {
+            "pageInfo": {"hasNextPage": end < len(items), "endCursor": encode_cursor(end)},
+            "nodes": chunk,
+        }
+
+    def _evidence_page(self, variables: dict) -> dict:
+        mp_id = variables.get("molecularProfileId")
+        etype = variables.get("evidenceType")
+        level = variables.get("evidenceLevel")
+        if mp_id is None and etype is None and level is None:
+            first = min(int(variables.get("first") or 25), self.max_page)
+            offset = decode_cursor(variables.get("after"))
+            end = min(self.total, offset + first)
+            return {
+                "pageInfo": {"hasNextPage": end < self.total, "endCursor": encode_cursor(end)},
+                "nodes": [synthetic_evidence(eid) for eid in range(offset + 1, end + 1)],
+            }
+        items = [ei for ei in self._corpus()
+                 if (mp_id is None or ei["molecularProfile"]["id"] == mp_id)
+                 and (etype is None or ei["evidenceType"] == etype)
+                 and (level is None or ei["evidenceLevel"] == level)]
+        return self._page(items, variables)
+
+    def _corpus(self) -> list[dict]:
+        # Filtered queries need the whole corpus; build it once per server
+        with self._lock:
+            if self._items is None:
+                self._items = [synthetic_evidence(eid) for eid in range(1, self.total + 1)]
+            return self._items
+
+    def _variants_page(self, variables: dict) -> dict:
+        gene = GENES[int(variables["featureId"]) - 1]
+        start = GENES.index(gene) * PROFILES_PER_GENE + 1
+        variants = [{"id": mp_id, "molecularProfiles": {"nodes": [{"id": mp_id, "name": profile_for(mp_id)[1]}]}}
+                    for mp_id in range(start, start + PROFILES_PER_GENE)
+                    if "::" not in profile_for(mp_id)[1]]
+        return self._page(variants, variables)
+
+    def _profiles_page(self, variables: dict) -> dict:
+        needle = (variables.get("name") or "").upper()
+        profiles = [{"id": mp_id, "name": profile_for(mp_id)[1]}
+                    for mp_id in range(1, PROFILES_PER_GENE * len(GENES) + 1)
+                    if needle in profile_for(mp_id)[1].upper()]
+        return self._page(profiles, variables)
@@ -0,0 +1,160 @@
+"""
+Schema benchmark: database size and query_choices latency, before and after the schema overhaul.
+
+    python -m alkfred.bench.schema_bench --total 50000 --rounds 5
+
+Builds the same synthetic corpus (see mock_civic.synthetic_evidence) twice: once with the
+previous layout (rowid evidence_link, duplicate and non-covering indexes, no planner
+statistics) and once with the current schema.sql / indexes.sql followed by ANALYZE.
+Reports file size, index count and per-query latency of the variant lookup the query
+CLI runs.
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from alkfred import config
+from alkfred.bench.mock_civic import synthetic_evidence
+from alkfred.sql import evidence_fact_create, evidence_link_create
+from alkfred.sql.dim_load.civic_dim_load import load_dimension_records
+
+logger = logging.getLogger(__name__)
+
+# Secondary indexes as they were before the overhaul (schema version 2)
+LEGACY_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_label_disease_norm ON dim_disease(label_disease_norm);
+CREATE INDEX IF NOT EXISTS idx_gene_symbol ON dim_gene_variant(gene_symbol);
+CREATE INDEX IF NOT EXISTS idx_label_gene_variant_norm ON dim_gene_variant(label_gene_variant_norm);
+CREATE INDEX IF NOT EXISTS idx_label_therapy_norm ON dim_therapy(label_therapy_norm);
+CREATE INDEX IF NOT EXISTS idx_evidence_eid ON dim_evidence(eid);
+CREATE INDEX IF NOT EXISTS idx_link_disease_variant ON evidence_link(disease_key, variant_key);
+CREATE INDEX IF NOT EXISTS idx_link_therapy      ON evidence_link(therapy_key);
+CREATE INDEX IF NOT EXISTS idx_link_eid          ON evidence_link(eid);
+CREATE INDEX IF NOT EXISTS idx_fact_disease_dir ON fact_evidence(disease_key, direction);
+CREATE INDEX IF NOT EXISTS idx_fact_variant ON fact_evidence(variant_key);
+CREATE INDEX IF NOT EXISTS idx_fact_therapy ON fact_evidence(therapy_key);
+CREATE INDEX IF NOT EXISTS idx_fact_eid ON fact_evidence(eid);
+CREATE INDEX IF NOT EXISTS idx_fact_keys ON fact_evidence(variant_key, therapy_key, disease_key);
+CREATE INDEX IF NOT EXISTS idx_fact_semantics ON fact_evidence(direction, significance);
+"""
+
+# The variant + significance lookup of cli/query.py
+BENCH_QUERY = """
+SELECT f.eid, d.doid, t.therapy_id, v.variant_id, t.label_display, d.label_disease_norm, e.significance
+FROM fact_evidence AS f
+JOIN dim_evidence AS e ON e.eid = f.eid
+JOIN dim_disease AS d ON d.disease_key = f.disease_key
+JOIN dim_gene_variant AS v ON v.variant_key = f.variant_key
+JOIN dim_therapy AS t ON t.therapy_key = f.therapy_key
+WHERE v.label_gene_variant_norm = ? AND e.significance = ?
+ORDER BY LOWER(t.label_display), f.eid
+LIMIT ?
+"""
+
+
+def _create_legacy_schema(conn: sqlite3.Connection) -> None:
+    schema = (config.sql_dir() / "schema.sql").read_text(encoding="utf-8")
+    conn.executescript(schema.replace(") WITHOUT ROWID;", ");"))
+    conn.executescript(LEGACY_INDEXES_SQL)
+    conn.commit()
+
+
+def build_bench_db(db_path: Path, total: int, optimized: bool = True) -> None:
+    """
+    Build a synthetic ALKfred database of `total` evidence items.
+
+    Args:
+        db_path (Path): Database file to create (must not exist).
+        total (int): Synthetic evidence items.
+        optimized (bool): Current schema plus ANALYZE; False builds the legacy layout.
+    """
+    records = [synthetic_evidence(eid) for eid in range(1, total + 1)]
+    by_gene: dict[str, list[dict]] = {}
+    for rec in records:
+        by_gene.setdefault(rec["molecularProfile"]["variants"][0]["feature"]["name"], []).append(rec)
+
+    conn = config.get_conn(db_path)
+    try:
+        if optimized:
+            config.create_schema(conn)
+        else:
+            _create_legacy_schema(conn)
+        load_dimension_records(conn, records)
+        for gene, nodes in by_gene.items():
+            evidence_link_create.insert_links(conn, nodes, oncogene=gene, bulk=True)
+        evidence_fact_create.insert_facts(conn)
+        if optimized:
+            config.optimize_database(conn)
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def time_queries(db_path: Path, rounds: int = 3, limit: int = 50) -> dict:
+    """
+    Run BENCH_QUERY for every variant label `rounds` times.
+
+    Returns:
+        dict: Query count with mean and p95 latency in milliseconds.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        labels = [r[0] for r in conn.execute("SELECT DISTINCT label_gene_variant_norm FROM dim_gene_variant")]
+        timings = []
+        for _ in range(rounds):
+            for label in labels:
+                started = time.perf_counter()
+                conn.execute(BENCH_QUERY, (label, "RESISTANCE", limit)).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+        indexes = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index'").fetchone()[0]
+    finally:
+        conn.close()
+    timings.sort()
+    return {
+        "queries": len(timings),
+        "mean_ms": statistics.fmean(timings) if timings else 0.0,
+        "p95_ms": timings[int(len(timings) * 0.95)] if timings else 0.0,
+        "indexes": indexes,
+    }
+
+
+def run_schema_bench(total: int = 20000, rounds: int = 3, workdir: Path | None = None) -> dict[str, dict]:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="alkfred-schema-bench-", dir=workdir) as tmp:
+        for label, optimized in (("before", False), ("after", True)):
+            db = Path(tmp) / f"{label}.sqlite"
+            started = time.perf_counter()
+            build_bench_db(db, total, optimized=optimized)
+            build_secs = time.perf_counter() - started
+            results[label] = {"build_secs": build_secs, "bytes": os.path.getsize(db), **time_queries(db, rounds)}
+    return results
+
+
+def build_bench_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Compare database size and query latency of the old and new schema")
+    p.add_argument("--total", type=int, default=20000, help="Synthetic evidence items")
+    p.add_argument("--rounds", type=int, default=3, help="Passes over every variant label")
+    p.add_argument("--verbose", action="store_true")
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_bench_parser().parse_args(argv)
+    # the link loader configures the root logger at import; quiet it unless asked
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    results = run_schema_bench(total=args.total, rounds=args.rounds)
+    print(f"{'schema':<7} {'build s':>8} {'size KB':>9} {'indexes':>7} {'queries':>7} {'mean ms':>8} {'p95 ms':>7}")
+    for label, r in results.items():
+        print(f"{label:<7} {r['build_secs']:>8.2f} {r['bytes'] / 1024:>9.0f} {r['indexes']:>7} {r['queries']:>7} "
+              f"{r['mean_ms']:>8.3f} {r['p95_ms']:>7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
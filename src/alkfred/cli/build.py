@@ -1,6 +1,7 @@
 import argparse
-from alkfred import config
-from alkfred.etl import civic_curate, civic_fetch
+from alkfred import config, pipeline
+from alkfred.etl import civic_fetch, civic_sync
+import utils
 import sqlite3
 import logging
 from pathlib import Path
@@ -13,12 +14,23 @@ logger = logging.getLogger(__name__)
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(description="Welcome to ALKfred")
     p.add_argument("--overwrite", action="store_true", help="Refetch and rebuild JSONs even if they exist")
+    p.add_argument("--resume", action="store_true", help="Continue an interrupted CIViC fetch from its last checkpointed cursor")
+    p.add_argument("--full-scan", action="store_true", help="Page over all of CIViC and filter client-side instead of by molecular profile")
+    p.add_argument("--workers", type=int, default=1, help="Fetch independent CIViC partitions with this many threads")
+    p.add_argument("--sync", action="store_true", help="Merge only new, changed and withdrawn CIViC items into the raw snapshot(s); one pass for all genes, honours --resume")
     p.add_argument("--limit", type = int)
-    p.add_argument("--oncogene", type=str, default= "ALK", help = "Target oncogene symbol")
+    p.add_argument("--oncogene", type=str, default= "ALK", help = "Target oncogene symbol(s), comma-separated (e.g. ALK,ROS1,EGFR)")
     p.add_argument("--source", choices=["curated", "civic"], required=True)
     p.add_argument("--db", type=Path, default=config.default_db_path())
     p.add_argument("--curated", type=Path, default=config.data_dir() / "curated_resistance_db.json")
     p.add_argument("--raw", type=Path, default=config.data_dir() / "civic_raw_evidence_db.json")
+    p.add_argument("--cache", action="store_true", help="Cache HTTP/GraphQL responses under data/http_cache")
+    p.add_argument("--cache-ttl", type=float, default=86400, help="Seconds a cached response stays fresh")
+    p.add_argument("--offline", action="store_true", help="Replay from the response cache only; never touch the network")
+    p.add_argument("--bulk", action="store_true", help="Fast full rebuild: relaxed durability, indexes and FK checks after the load")
+    p.add_argument("--dim-workers", type=int, default=0, help="Build dimensions in this many processes (staging DBs merged with ATTACH)")
+    p.add_argument("--link-workers", type=int, default=0, help="Resolve evidence links in this many processes with one writer thread")
+    p.add_argument("--incremental", action="store_true", help="Apply only evidence whose content hash changed since the last build")
     p.add_argument("--verbose", action="store_true")
     return p
 
@@ -27,16 +39,29 @@ def build_parser() -> argparse.ArgumentParser:
 def main(argv=None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
-    
+    if args.incremental and args.bulk:
+        parser.error("--incremental and --bulk are mutually exclusive")
     logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
 
-    if args.source == "civic":
+    if args.cache or args.offline:
+        utils.configure_cache(config.data_dir() / "http_cache", ttl=args.cache_ttl, offline=args.offline)
+
+    genes = civic_fetch.parse_oncogenes(args.oncogene)
+
+    if args.source == "civic" and args.sync:
+        # One checkpointed pass for every gene; each shard is then merged against its own manifest
+        civic_sync.sync_civic_shards(oncogene=args.oncogene, raw_path=args.raw, server_filter=not args.full_scan,
+                                     workers=args.workers, resume=args.resume)
+    elif args.source == "civic":
     
         civic_fetch.fetch_civic_evidence(
             oncogene = args.oncogene,
             raw_path=args.raw,
             overwrite=args.overwrite,
             limit=args.limit,           # <-- actually use it
+            resume=args.resume,
+            server_filter=not args.full_scan,
+            workers=args.workers,
         )
     #     civic_curate.curate_civic(items, curated_path=args.curated)
         
@@ -47,14 +72,16 @@ def main(argv=None) -> int:
     # config.default_db_path = (lambda p=Path(args.db): lambda: p)()
     # config.data_dir        = (lambda p=Path(args.curated).parent: lambda: p)()
 
-    # Build — ensure these functions consume the same paths
-    config.apply_schema(db_path=args.db)
-    config.apply_dim_disease()
-    config.apply_dim_gene_variant()
-    config.apply_dim_therapy()
-    config.apply_dim_evidence()
-    config.apply_evidence_link(oncogene=args.oncogene)   
-    config.apply_fact_evidence()
+    # Build — one in-process graph sharing the connection and the parsed snapshots
+    shards = {gene: civic_fetch.shard_path(args.raw, gene, genes) for gene in genes}
+    ctx = pipeline.BuildContext(db_path=args.db, shards=shards, bulk=args.bulk)
+    results = pipeline.run_pipeline(pipeline.build_stages(genes, bulk=args.bulk, dim_workers=args.dim_workers,
+                                                          link_workers=args.link_workers,
+                                                          incremental=args.incremental), ctx)
+    logger.info("Build timings:\n%s", pipeline.format_timings(results))
+    orphans = ctx.results.get("orphans")
+    if orphans:
+        logger.warning("Bulk build finished with %d orphaned rows", sum(orphans.values()))
 
     logger.info("Database ready: %s", args.db)
 
@@ -1,134 +1,156 @@
 import argparse
-from calendar import c
-from sys import argv
+import csv
+import json
 import sys
-from typing import Any, AnyStr
+from pathlib import Path
+from typing import IO, Iterable, Iterator
 
-from pytest import ExitCode
 import alkfred.config
-import sqlite3
-import utils
-import alkfred.config
-from alkfred.etl import civic_fetch
 import logging
+from alkfred.query import Query, QueryEngine, bare_variant, encode_cursor
 
 logger = logging.getLogger(__name__)
 
-def query_choices(variant_cli_choice: str, limit:int, significance: str, disease: str):
 
+def normalize_significance(significance: str) -> str | None:
+    # "resistance"/"sensitivity" or any prefix of them; "" and "all" mean no filter
     significance_list = ["RESISTANCE", "SENSITIVITY"]
     if significance.lower() == significance_list[0].lower() or significance.lower() in significance_list[0].lower():
-        significance = "RESISTANCE"
+        return "RESISTANCE"
     elif significance.lower() == significance_list[1].lower() or significance.lower() in significance_list[1].lower():
-        significance = "SENSITIVITY"
+        return "SENSITIVITY"
     elif significance.lower() == "" or significance.lower() == "all":
-        significance = "all"
-    else:
-        raise ValueError("Please input relevant significance information")
-    
+        return None
+    raise ValueError("Please input relevant significance information")
+
+
+def build_query(variant_cli_choice: str, limit: int | None, significance: str = "all", disease: str = "all",
+                gene: str | None = "ALK") -> Query:
+    """
+    Translate CLI-style inputs into a Query.
+
+    Args:
+        variant_cli_choice (str): Variant as typed, e.g. "g1202r" or "ALK G1202R".
+        limit (int | None): Maximum rows.
+        significance (str): "resistance", "sensitivity", "all" or a prefix of one of them.
+        disease (str): Normalized disease label, or "all".
+        gene (str | None): Gene the variant belongs to: only its rows are returned, and its
+            prefix is dropped from the input, matching labels stored with or without it.
+
+    Returns:
+        Query: The filter set, ready for QueryEngine.iter_rows.
+    """
+    return Query().where(
+        variant_norm=bare_variant(variant_cli_choice, gene),
+        gene=gene.strip().upper() if gene else None,
+        significance=normalize_significance(significance),
+        disease=None if disease in ("", "all") else disease,
+    ).limit(limit)
+
+
+def query_choices(variant_cli_choice: str, limit:int, significance: str, disease: str, gene: str = "ALK"):
+    query = build_query(variant_cli_choice, limit, significance, disease, gene)
+    logger.info("Final query input: %s", dict(query.filters))
+
+    with QueryEngine(alkfred.config.default_db_path()) as engine:
+        logger.info("Connected to database: %s", alkfred.config.default_db_path())
+        query_list = list(engine.iter_rows(query))
+    return query_list, len(query_list)
 
-    
-    gene_symbol = "ALK"
-    if gene_symbol in variant_cli_choice or gene_symbol.lower() in variant_cli_choice:
-        variant_cli_choice = utils.normalize_label(variant_cli_choice)
+
+def read_batch(stream: IO[str], fmt: str) -> Iterator[dict]:
+    # Batch input: csv/tsv with a header (variant[,disease][,significance]) or one JSON object per line
+    if fmt == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
     else:
-        variant_cli_choice = gene_symbol + " " + variant_cli_choice
-        variant_cli_choice = utils.normalize_label(variant_cli_choice)
-    logger.info("Final query input: %s", variant_cli_choice)
-    
-    try:
-        conn = alkfred.config.get_conn(alkfred.config.default_db_path())
-        logger.info("Connected to database: %s", alkfred.config.default_db_path())
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-
-        
-
-        #query by all significance and all disease and all significance with user input disease
-        if significance == "" or significance == "all":
-            if disease == "" or disease == "all":
-                query = """SELECT f.eid, f.doid, f.therapy_id, f.variant_id, t.label_display, d.label_disease_norm, e.significance FROM fact_evidence AS f
-                    JOIN dim_evidence AS e ON e.eid = f.eid
-                    JOIN dim_disease AS d ON d.doid = f.doid
-                    JOIN dim_gene_variant AS v ON v.variant_id = f.variant_id
-                    JOIN dim_therapy AS t ON t.therapy_id = f.therapy_id
-                    WHERE v.label_gene_variant_norm = ?
-                    ORDER BY LOWER(t.label_display), f.eid 
-                    LIMIT ?
-
-                    """
-                params = [variant_cli_choice, limit]
-                cur.execute(query,params)
-                rows = cur.fetchall()
-                row_count = len(rows)
-                query_list = []
-                for row in rows:
-                    query_list.append(dict(row))
-
-            else:
-                query = """SELECT f.eid, f.doid, f.therapy_id, f.variant_id, t.label_display, d.label_disease_norm, e.significance FROM fact_evidence AS f
-                    JOIN dim_evidence AS e ON e.eid = f.eid
-                    JOIN dim_disease AS d ON d.doid = f.doid
-                    JOIN dim_gene_variant AS v ON v.variant_id = f.variant_id
-                    JOIN dim_therapy AS t ON t.therapy_id = f.therapy_id
-                    WHERE v.label_gene_variant_norm = ? AND d.label_disease_norm = ?
-                    ORDER BY LOWER(t.label_display), f.eid 
-                    LIMIT ?
-
-                    """
-                params = [variant_cli_choice, disease, limit]
-                cur.execute(query,params)
-                rows = cur.fetchall()
-                row_count = len(rows)
-                query_list = []
-                for row in rows:
-                    query_list.append(dict(row))
-        #query for input significance but all disease and input significance and specified disease
-        if significance == "RESISTANCE" or significance == "SENSITIVITY":
-            if disease == "" or disease == "all":
-                query = """SELECT f.eid, f.doid, f.therapy_id, f.variant_id, t.label_display, d.label_disease_norm, e.significance FROM fact_evidence AS f
-                            JOIN dim_evidence AS e ON e.eid = f.eid
-                            JOIN dim_disease AS d ON d.doid = f.doid
-                            JOIN dim_gene_variant AS v ON v.variant_id = f.variant_id
-                            JOIN dim_therapy AS t ON t.therapy_id = f.therapy_id
-                            WHERE v.label_gene_variant_norm = ? AND e.significance = ?
-                            ORDER BY LOWER(t.label_display), f.eid 
-                            LIMIT ?
-                            """
-                params = [variant_cli_choice, significance,limit]
-
-                cur.execute(query,params)
-                rows = cur.fetchall()
-                row_count = len(rows)
-                query_list = []
-                for row in rows:
-                    query_list.append(dict(row))
-            else:
-                query = """SELECT f.eid, f.doid, f.therapy_id, f.variant_id, t.label_display, d.label_disease_norm, e.significance FROM fact_evidence AS f
-                            JOIN dim_evidence AS e ON e.eid = f.eid
-                            JOIN dim_disease AS d ON d.doid = f.doid
-                            JOIN dim_gene_variant AS v ON v.variant_id = f.variant_id
-                            JOIN dim_therapy AS t ON t.therapy_id = f.therapy_id
-                            WHERE v.label_gene_variant_norm = ? AND e.significance = ? AND d.label_disease_norm = ?
-                            ORDER BY LOWER(t.label_display), f.eid 
-                            LIMIT ?
-                            """
-                params = [variant_cli_choice, significance, disease, limit]
-
-                cur.execute(query,params)
-                rows = cur.fetchall()
-                row_count = len(rows)
-                query_list = []
-                for row in rows:
-                    query_list.append(dict(row))
-
-      
-    finally:
-        conn.close()
-    return query_list, row_count
+        yield from csv.DictReader(stream, delimiter="\t" if fmt == "tsv" else ",")
+
+
+def batch_items(records: Iterable[dict], gene: str | None = "ALK") -> Iterator[tuple]:
+    """
+    Normalize batch input records for QueryEngine.iter_batch.
+
+    Args:
+        records (Iterable[dict]): Input rows with "variant" and optional "disease"/"significance"/"gene".
+        gene (str | None): Default gene for rows without a "gene" value.
+
+    Returns:
+        Iterator[tuple]: (row_no, variant labels, significance or None, disease or None,
+        gene or None); rows are numbered from 1 in input order.
+    """
+    for row_no, rec in enumerate(records, start=1):
+        variant = (rec.get("variant") or "").strip()
+        if not variant:
+            raise ValueError(f"Input row {row_no}: missing variant")
+        try:
+            significance = normalize_significance((rec.get("significance") or "all").strip())
+        except ValueError as e:
+            raise ValueError(f"Input row {row_no}: {e}") from None
+        disease = (rec.get("disease") or "all").strip()
+        row_gene = (rec.get("gene") or "").strip().upper() or (gene.strip().upper() if gene else None)
+        yield (row_no, (bare_variant(variant, row_gene),), significance,
+               None if disease in ("", "all") else disease, row_gene)
+
+
+def write_rows(rows: Iterable[dict], out: IO[str], fmt: str) -> int:
+    # Streams rows as they arrive; returns how many were written
+    n = 0
+    if fmt in ("ndjson", "text"):
+        for row in rows:
+            out.write((json.dumps(row) if fmt == "ndjson" else str(row)) + "\n")
+            n += 1
+        return n
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(out, fieldnames=list(row), delimiter="\t" if fmt == "tsv" else ",",
+                                    lineterminator="\n")
+            writer.writeheader()
+        writer.writerow(row)
+        n += 1
+    return n
+
+
+def stream_query(engine: QueryEngine, query: Query, out: IO[str], fmt: str = "ndjson") -> tuple[int, str | None]:
+    """
+    Write one page of `query` to `out` while rows are fetched.
+
+    Args:
+        engine (QueryEngine): Open engine.
+        query (Query): Filters, page size (limit) and optional resume point (page_after).
+        out (IO[str]): Destination, e.g. sys.stdout.
+        fmt (str): "ndjson", "csv", "tsv" or "text" (one dict per line).
+
+    Returns:
+        tuple[int, str | None]: Rows written and the cursor of the next page, None on the last page.
+    """
+    last_key = None
+
+    def rows():
+        nonlocal last_key
+        for key, row in engine.iter_keyed(query):
+            last_key = key
+            yield row
+
+    n = write_rows(rows(), out, fmt)
+    more = query.max_rows is not None and n == query.max_rows
+    return n, encode_cursor(last_key) if more else None
+
+
+def run_batch(db_path: Path, source: IO[str], out: IO[str], input_format: str = "csv", output_format: str = "ndjson",
+              limit: int | None = None, gene: str | None = "ALK") -> int:
+    """
+    Annotate every input row with one set-based query on one connection.
+
+    Returns:
+        int: Result rows written.
+    """
+    with QueryEngine(db_path) as engine:
+        rows = engine.iter_batch(batch_items(read_batch(source, input_format), gene), limit=limit)
+        return write_rows(rows, out, output_format)
 
-    
-    
 
 def build_query_parser()-> argparse.ArgumentParser:
     p = argparse.ArgumentParser()
@@ -140,8 +162,40 @@ def build_query_parser()-> argparse.ArgumentParser:
     create_parser.add_argument("--verbose", action="store_true" )
     create_parser.add_argument("--significance", type= str, default= "all")
     create_parser.add_argument("--disease", type=str, default= "all")
-    
+    create_parser.add_argument("--gene", type=str, default="ALK", help="Gene of the variant (labels may omit it)")
+    create_parser.add_argument("--format", choices=["text", "ndjson", "csv", "tsv"], default="text")
+    create_parser.add_argument("--cursor", type=str, default=None, help="Resume after a previous page (see 'Next cursor')")
+    create_parser.add_argument("--db", type=Path, default=None, help="Defaults to the configured database")
+
+    batch_parser = subparser.add_parser("batch", help="Annotate many variant/disease/significance rows at once")
+    batch_parser.add_argument("--input", type=str, default="-", help="csv/tsv/ndjson file, or - for stdin")
+    batch_parser.add_argument("--input-format", choices=["csv", "tsv", "ndjson"], default=None,
+                              help="Defaults to the file suffix, csv for stdin")
+    batch_parser.add_argument("--format", choices=["ndjson", "csv", "tsv"], default="ndjson", help="Output format")
+    batch_parser.add_argument("--limit", type=int, default=None, help="Maximum rows per input row")
+    batch_parser.add_argument("--gene", type=str, default="ALK", help="Gene for rows without a gene column")
+    batch_parser.add_argument("--db", type=Path, default=alkfred.config.default_db_path())
+    batch_parser.add_argument("--verbose", action="store_true")
+
     return p
+
+
+def batch_main(args) -> None:
+    fmt = args.input_format
+    if fmt is None:
+        suffix = Path(args.input).suffix.lower().lstrip(".")
+        fmt = {"tsv": "tsv", "ndjson": "ndjson", "jsonl": "ndjson"}.get(suffix, "csv")
+    try:
+        if args.input == "-":
+            n = run_batch(args.db, sys.stdin, sys.stdout, fmt, args.format, args.limit, args.gene)
+        else:
+            with open(args.input, encoding="utf-8", newline="") as source:
+                n = run_batch(args.db, source, sys.stdout, fmt, args.format, args.limit, args.gene)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    logger.info("Batch rows written: %d", n)
+    sys.exit(0 if n else 2)
     
     
 
@@ -151,6 +205,8 @@ def main(argv=None):
     args = parser.parse_args(argv)
     logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
 
+    if args.command == "batch":
+        batch_main(args)
     if args.command != "query":
         parser.print_help()
         sys.exit(2)
@@ -160,17 +216,19 @@ def main(argv=None):
     
 
     try:
-        rows, rows_count = query_choices(args.variant, args.limit, args.significance, args.disease)
+        query = build_query(args.variant, args.limit, args.significance, args.disease, args.gene).page_after(args.cursor)
+        with QueryEngine(args.db or alkfred.config.default_db_path()) as engine:
+            rows_count, next_cursor = stream_query(engine, query, sys.stdout, args.format)
         if rows_count == 0:
-            print("No rows found.")
+            print("No rows found.", file=sys.stderr if args.format != "text" else sys.stdout)
             sys.exit(2)
-        
-        
-        for r in rows:
-            print(r)
-        print(f"Number of rows: {rows_count}")
+        # Data formats keep stdout clean for pipes; the summary goes to stderr
+        summary = sys.stdout if args.format == "text" else sys.stderr
+        print(f"Number of rows: {rows_count}", file=summary)
+        if next_cursor:
+            print(f"Next cursor: {next_cursor}", file=summary)
         sys.exit(0)
-        
+
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,215 @@
+"""
+Long-running query service.
+
+    python -m alkfred.cli.serve --db data/alkfred.sqlite --port 8765 --pool 4
+    curl 'http://127.0.0.1:8765/query?variant=g1202r&significance=resistance&disease=all&limit=25'
+
+Keeps a pool of read-only SQLite connections open for the life of the process. Each
+connection has every query shape the CLI uses compiled in its statement cache (warmed at
+start-up) and a large page cache / mmap window, so a lookup costs one index walk
+instead of a Python start-up, imports and a fresh connection. Responses are JSON:
+{"rows": [...], "count": n, "next_cursor": token|null} or {"error": "..."} with a 4xx/5xx
+status; pass `cursor=<token>` to get the next page.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import alkfred.config
+from alkfred.cli.query import build_query
+from alkfred.query import CACHED_STATEMENTS, QueryEngine, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Per-connection tuning for a read-mostly working set
+CACHE_KIB = 65536           # page cache, KiB (PRAGMA cache_size takes negative KiB)
+MMAP_BYTES = 256 * 1024**2  # hot pages served straight from the OS page cache
+MAX_LIMIT = 1000
+
+
+def open_readonly(db_path: Path) -> sqlite3.Connection:
+    # mode=ro refuses writes at the VFS level; query_only guards against an accidental ATTACH
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of warm read-only connections.
+
+    Args:
+        db_path (Path): Built ALKfred database.
+        size (int): Connections (one per concurrently served request).
+    """
+
+    def __init__(self, db_path: Path, size: int = 4):
+        if not Path(db_path).exists():
+            raise FileNotFoundError(f"Database not found: {db_path}")
+        self._idle: queue.Queue = queue.Queue()
+        self._all = [open_readonly(db_path) for _ in range(max(1, size))]
+        for conn in self._all:
+            self._warm(conn)
+            self._idle.put(conn)
+
+    @staticmethod
+    def _warm(conn: sqlite3.Connection) -> None:
+        # Compile every statement shape once (the statement cache keeps them prepared) and pull
+        # query_evidence (the table the lookups read) into this connection's page cache
+        engine = QueryEngine(conn)
+        for significance in ("all", "resistance"):
+            for disease in ("all", "-"):
+                list(engine.iter_rows(build_query("-", 1, significance, disease)))
+        conn.execute("SELECT COUNT(*) FROM query_evidence").fetchone()
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        for conn in self._all:
+            conn.close()
+        self._all = []
+
+
+@dataclass
+class QueryServer:
+    """
+    Threaded HTTP front end over a ConnectionPool.
+
+    Args:
+        db_path (Path): Built ALKfred database.
+        host (str): Bind address; loopback by default.
+        port (int): Bind port; 0 picks a free one (see `url`).
+        pool_size (int): Read-only connections kept open.
+    """
+
+    db_path: Path
+    host: str = "127.0.0.1"
+    port: int = 8765
+    pool_size: int = 4
+
+    def __post_init__(self):
+        self._pool: ConnectionPool | None = None
+        self._httpd: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, path: str) -> tuple[int, dict]:
+        parsed = urlparse(path)
+        if parsed.path == "/health":
+            return 200, {"status": "ok"}
+        if parsed.path != "/query":
+            return 404, {"error": f"Unknown path: {parsed.path}"}
+        args = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        if not args.get("variant"):
+            return 400, {"error": "Missing required parameter: variant"}
+        try:
+            limit = int(args.get("limit", 25))
+            if not 1 <= limit <= MAX_LIMIT:
+                raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+            query = build_query(args["variant"], limit, args.get("significance", "all"), args.get("disease", "all"),
+                                gene=args.get("gene", "ALK")).page_after(args.get("cursor"))
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        with self._pool.connection() as conn:
+            keyed = list(QueryEngine(conn).iter_keyed(query))
+        rows = [row for _, row in keyed]
+        next_cursor = encode_cursor(keyed[-1][0]) if len(keyed) == limit else None
+        return 200, {"rows": rows, "count": len(rows), "next_cursor": next_cursor}
+
+    def start(self) -> "QueryServer":
+        server = self
+        self._pool = ConnectionPool(self.db_path, self.pool_size)
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: clients reuse one TCP connection
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+            def do_GET(self):
+                started = time.perf_counter()
+                try:
+                    status, payload = server.handle(self.path)
+                except Exception as e:  # any failure still answers in JSON instead of dropping the connection
+                    logger.exception("Query failed: %s", self.path)
+                    status, payload = 500, {"error": str(e)}
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                logger.debug("%s %d %.3f ms", self.path, status, (time.perf_counter() - started) * 1000)
+
+            def log_message(self, fmt, *args):
+                logger.debug("query server: " + fmt, *args)
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="alkfred-query", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def __enter__(self) -> "QueryServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Serve ALKfred lookups over HTTP from warm read-only connections")
+    p.add_argument("--db", type=Path, default=alkfred.config.default_db_path(), help="Built ALKfred database")
+    p.add_argument("--host", type=str, default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--pool", type=int, default=4, help="Read-only connections kept open")
+    p.add_argument("--verbose", action="store_true")
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_serve_parser().parse_args(argv)
+    logging.getLogger().setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    server = QueryServer(args.db, host=args.host, port=args.port, pool_size=args.pool).start()
+    logger.info("Serving %s on %s/query (pool=%d)", args.db, server.url, args.pool)
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,6 +8,7 @@ from pathlib import Path
 import sqlite3
 import importlib
 from typing import Any
+from alkfred import snapshot
 
 
 
@@ -39,7 +40,7 @@ def default_db_path() -> Path:
     d = data_dir() / "alkfred.sqlite"
     return d
 def raw_json_list_to_dict(path: Path) -> dict[Any,Any]:
-    raw_dict = {index: value for index,value in enumerate(load_from_json(path))}
+    raw_dict = {index: value for index,value in enumerate(iter_raw_evidence(path))}
     return raw_dict
 
     
@@ -71,11 +72,11 @@ def openai_api_key() -> str:
     # Get the OpenAI API key
     return get_env("OPENAI_API_KEY", required=True)
 
-def get_conn(db_path: str | Path | None) -> sqlite3.Connection:
+def get_conn(db_path: str | Path | None, check_same_thread: bool = True) -> sqlite3.Connection:
     # Get a connection to the database
     if db_path is None:
         db_path = default_db_path()
-    conn = sqlite3.connect(str(db_path), detect_types=sqlite3.PARSE_DECLTYPES)
+    conn = sqlite3.connect(str(db_path), detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
     
     return conn
@@ -85,25 +86,121 @@ def norm(text: str) -> str:
     return text.lower().strip()
 
 def save_to_json(data, path) -> json:
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
+    # Format (JSON/NDJSON, gzip/zstd) follows the file name, see alkfred.snapshot
+    snapshot.save(data, path)
 
 def load_from_json(path) -> dict:
-    with open(path, "r") as f:
-        data = json.load(f)
-    return data
+    # Compression and JSON vs NDJSON are detected transparently
+    return snapshot.load(path)
+
+def is_ndjson(path) -> bool:
+    # NDJSON snapshots are recognised by suffix (.ndjson/.jsonl, optionally .gz/.zst)
+    return snapshot.is_ndjson(path)
+
+def iter_ndjson(path):
+    # Yield one record per line without loading the whole file
+    return snapshot.iter_records(path)
+
+def iter_raw_evidence(path):
+    # Yield raw evidence nodes from either a JSON-list or an NDJSON snapshot
+    return snapshot.iter_records(path)
+
+def sql_dir() -> Path:
+    # Return the directory holding schema.sql / indexes.sql
+    return Path(__file__).resolve().parent / "sql"
+
+# Bulk rebuild: durability traded for speed, the build can simply be rerun on a crash
+BULK_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",   # KiB, i.e. 256 MiB of page cache
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = OFF",     # checked once at the end, see foreign_key_report()
+)
 
-def apply_schema(db_path: Path):
-    import sqlite3
-    schema_path = "src/alkfred/sql/schema.sql"
-    
-    print(f"Applying schema from {schema_path} to {db_path}")
-    conn = sqlite3.connect(db_path)
-    with open(schema_path, "r", encoding="utf-8") as f:
-        conn.executescript(f.read())
+def apply_bulk_pragmas(conn: sqlite3.Connection) -> None:
+    # Per-connection tuning for --bulk builds
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+
+# Bumped whenever schema.sql changes in a way CREATE ... IF NOT EXISTS cannot migrate
+SCHEMA_VERSION = 5  # 2: integer surrogate keys; 3: WITHOUT ROWID links, pruned indexes; 4: query_evidence;
+                    # 5: build_state.gene
+
+def create_schema(conn: sqlite3.Connection, with_indexes: bool = True) -> None:
+    # Tables (and the dedupe unique index); secondary indexes unless a bulk load creates them later
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    has_tables = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='fact_evidence'").fetchone()
+    if has_tables and version < SCHEMA_VERSION:
+        raise RuntimeError(f"Database uses schema version {version}, this build needs {SCHEMA_VERSION}: "
+                           "delete the database file and rebuild")
+    conn.executescript((sql_dir() / "schema.sql").read_text(encoding="utf-8"))
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    if with_indexes:
+        create_indexes(conn)
     conn.commit()
-    conn.close()
 
+def create_indexes(conn: sqlite3.Connection) -> None:
+    # One sorted build per index after the data is in, instead of row-by-row B-tree upkeep
+    conn.executescript((sql_dir() / "indexes.sql").read_text(encoding="utf-8"))
+    conn.commit()
+
+def optimize_database(conn: sqlite3.Connection, analyze: bool = True) -> None:
+    # Planner statistics for the finished build: a full ANALYZE after a fresh load, then
+    # PRAGMA optimize, which only re-analyzes tables whose contents moved since last time
+    if analyze:
+        conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+
+def foreign_key_orphans(conn: sqlite3.Connection) -> dict[tuple[str, str], int]:
+    # Set-based orphan check over the whole database: (child table, parent table) -> orphan rows
+    rows = conn.execute(
+        'SELECT "table", parent, COUNT(*) FROM pragma_foreign_key_check GROUP BY "table", parent'
+    ).fetchall()
+    report = {(table, parent): n for table, parent, n in rows}
+    for (table, parent), n in sorted(report.items()):
+        logging.warning("Foreign key check: %d %s rows reference a missing %s", n, table, parent)
+    return report
+
+def apply_schema(db_path: Path, with_indexes: bool = True):
+    print(f"Applying schema from {sql_dir() / 'schema.sql'} to {db_path}")
+    conn = sqlite3.connect(db_path)
+    try:
+        create_schema(conn, with_indexes=with_indexes)
+    finally:
+        conn.close()
+
+def apply_indexes(db_path: Path) -> None:
+    print(f"Creating indexes from {sql_dir() / 'indexes.sql'} on {db_path}")
+    conn = sqlite3.connect(db_path)
+    try:
+        create_indexes(conn)
+    finally:
+        conn.close()
+
+def foreign_key_report(db_path: Path) -> dict[tuple[str, str], int]:
+    conn = sqlite3.connect(db_path)
+    try:
+        return foreign_key_orphans(conn)
+    finally:
+        conn.close()
+
+
+def apply_dimensions(db_path: Path | str = default_db_path(),
+    raw_path: Path | str = data_dir() / "civic_raw_evidence_db.json", bulk: bool = False) -> dict[str, int]:
+    from .sql.dim_load.civic_dim_load import load_dimensions
+    if not Path(raw_path).exists():
+        logging.warning("Raw snapshot not found, skipping dimensions: %s", raw_path)
+        return {}
+    print(f"Loading dimensions → db={db_path} raw={raw_path}")
+    conn = get_conn(db_path)
+    if bulk:
+        apply_bulk_pragmas(conn)
+    try:
+        return load_dimensions(conn, Path(raw_path))
+    finally:
+        conn.close()
 
 def apply_dim_disease():
     
@@ -124,15 +221,17 @@ def apply_dim_evidence():
 
 def apply_evidence_link(db_path: Path | str = default_db_path(),
     raw_path: Path | str = data_dir() / "civic_raw_evidence_db.json",
-    oncogene: str = "ALK") -> None:
+    oncogene: str = "ALK", bulk: bool = False) -> None:
     from .sql.evidence_link_create import create_links
     db_path = Path(db_path)
     raw_path = Path(raw_path)
+    if not raw_path.exists():
+        logging.warning("Raw snapshot not found, skipping evidence links: %s", raw_path)
+        return
     print(f"Building evidence links → db={db_path} raw={raw_path} oncogene={oncogene}")
-    create_links(db_path, raw_path, oncogene)
-
-def apply_fact_evidence(db_path: Path | str = default_db_path(), raw_path: Path | str = data_dir() / "civic_raw_evidence_db.json", oncogene: str = "ALK"):
-    print(f"Loading /app/src/alkfred/sql/sql_evidence_fact_create.py to {default_db_path()}")
-    _run_module_main("alkfred.sql.evidence_fact_create")
+    create_links(db_path, raw_path, oncogene, bulk=bulk)
 
-    
\ No newline at end of file
+def apply_fact_evidence(db_path: Path | str = default_db_path(), bulk: bool = False):
+    from .sql.evidence_fact_create import build_facts
+    print(f"Building fact_evidence → db={db_path}")
+    build_facts(Path(db_path), bulk=bulk)
@@ -1,43 +1,316 @@
 import api_calls
 import civic_parser
-from alkfred import config
+from alkfred import config, snapshot
+from contextlib import ExitStack, closing
 from pathlib import Path
 from typing import Optional
+from graphql import GraphQLError
 import json
+import logging
+import os
 
+logger = logging.getLogger(__name__)
 
 
-def fetch_civic_evidence(oncogene = None, raw_path=None, overwrite=False, limit: Optional[int] = None):
-    
-    
+def _matches_oncogene(ei, oncogene) -> bool:
+    if not ei or not isinstance(ei, dict):
+        return False
+    mp = ei.get("molecularProfile")
+    if not mp:
+        return False
+    mp_name = mp.get("name", "")
+    return civic_parser.gene_in_molecular_profile(mp_name, oncogene)
+
+
+def parse_oncogenes(oncogene) -> list:
+    # "ALK,ROS1,EGFR" -> ["ALK", "ROS1", "EGFR"]; a single symbol (or None) stays a one-item list
+    if isinstance(oncogene, (list, tuple)):
+        genes = [g.strip().upper() for g in oncogene if g and g.strip()]
+    elif oncogene and "," in oncogene:
+        genes = [g.strip().upper() for g in oncogene.split(",") if g.strip()]
+    else:
+        return [oncogene]
+    return list(dict.fromkeys(genes))
+
+
+def _classify(ei, genes: list) -> list:
+    # One gene keeps the plain predicate; several share one tokenization of the profile name
+    if len(genes) == 1:
+        return genes if _matches_oncogene(ei, genes[0]) else []
+    if not ei or not isinstance(ei, dict):
+        return []
+    mp_name = (ei.get("molecularProfile") or {}).get("name", "")
+    hits = civic_parser.genes_in_molecular_profile(mp_name, genes)
+    return [g for g in genes if g in hits]
+
+
+def shard_path(raw_path: Path, gene, genes: list) -> Path:
+    # Single-gene builds keep raw_path as is; multi-gene builds get civic_raw_evidence_db_<GENE>.json
+    if len(genes) == 1:
+        return raw_path
+    stem, suffixes = snapshot.split_name(raw_path)
+    return raw_path.with_name(f"{stem}_{gene}{suffixes}")
+
+
+def resolve_molecular_profile_ids(oncogene: str) -> list[int]:
+    # Profiles on the gene's own variants plus name hits (fusion features only show up by name)
+    ids = set(api_calls.fetch_gene_molecular_profile_ids(oncogene))
+    for mp_id, mp_name in api_calls.search_molecular_profiles(oncogene).items():
+        if civic_parser.gene_in_molecular_profile(mp_name, oncogene):
+            ids.add(mp_id)
+    return sorted(ids)
+
+
+def plan_streams(oncogene=None, server_filter: bool = True, partition: bool = False) -> list[list]:
+    """
+    Decide which evidenceItems streams to page over.
+
+    With `server_filter` each gene is resolved to its molecular profile ids and one
+    filtered stream per profile (union over all genes) is returned; otherwise (or if any
+    gene fails to resolve) the full corpus, filtered client-side. With `partition` the
+    full corpus is cut into one stream per evidenceType so the streams can be paged
+    concurrently.
+
+    Returns:
+        list[list]: [stream_key, graphql_filters] pairs (lists so they round-trip through JSON).
+    """
+    genes = [g for g in parse_oncogenes(oncogene) if g]
+    if server_filter and genes:
+        mp_ids: set[int] = set()
+        for gene in genes:
+            try:
+                gene_ids = resolve_molecular_profile_ids(gene)
+            except (RuntimeError, GraphQLError) as e:
+                logger.warning("Could not resolve %s molecular profiles (%s); falling back to a full scan", gene, e)
+                gene_ids = []
+            if not gene_ids:
+                logger.warning("No molecular profiles resolved for %s; falling back to a full scan", gene)
+                mp_ids = set()
+                break
+            mp_ids.update(gene_ids)
+        if mp_ids:
+            logger.info("Server-side filter: %d molecular profiles for %s", len(mp_ids), ",".join(genes))
+            return [[f"mp:{mp_id}", {"molecularProfileId": mp_id}] for mp_id in sorted(mp_ids)]
+    if partition:
+        return [[f"type:{t}", {"evidenceType": t}] for t in api_calls.EVIDENCE_TYPES]
+    return [["all", {}]]
+
+
+def iter_stream_pages(streams: list, cursors: Optional[dict] = None, seen_ids: Optional[set] = None,
+                      workers: int = 1):
+    """
+    Page over the planned streams, sequentially or with `workers` threads.
+
+    Yields:
+        tuple[str, list[dict] | None, str | None]: (stream_key, nodes, endCursor) per page,
+        (stream_key, None, None) when a stream is exhausted. Nodes are unique across streams.
+    """
+    cursors = cursors or {}
+    if seen_ids is None:
+        seen_ids = set()
+    if workers > 1 and len(streams) > 1:
+        for key, nodes, end_cursor in api_calls.iter_streams_concurrently(streams, max_workers=workers, cursors=cursors):
+            if nodes is not None:
+                fresh = []
+                for ei in nodes:
+                    if ei.get("id") not in seen_ids:
+                        seen_ids.add(ei.get("id"))
+                        fresh.append(ei)
+                nodes = fresh
+            yield key, nodes, end_cursor
+        return
+    for key, filters in streams:
+        pages = api_calls.iter_civic_evidence_pages(after_cursor=cursors.get(key), seen_ids=seen_ids,
+                                                    filters=filters or None)
+        for nodes, end_cursor in pages:
+            yield key, nodes, end_cursor
+        yield key, None, None
+
+
+def iter_oncogene_evidence(oncogene=None, limit: Optional[int] = None, server_filter: bool = True,
+                           workers: int = 1):
+    """
+    Stream CIViC evidence items for a gene symbol, filtering each page as it arrives.
+
+    Args:
+        oncogene (str | None): Target gene symbol, e.g., "ALK".
+        limit (int | None): Max evidence items to yield.
+        server_filter (bool): Push the gene filter into the GraphQL request.
+        workers (int): Page the planned streams with this many threads.
+    """
+    kept = 0
+    streams = plan_streams(oncogene, server_filter=server_filter, partition=workers > 1)
+    with closing(iter_stream_pages(streams, workers=workers)) as pages:
+        for _, nodes, _ in pages:
+            for ei in nodes or []:
+                if _matches_oncogene(ei, oncogene):
+                    yield ei
+                    kept += 1
+                    if limit is not None and kept >= limit:
+                        return
+
+
+def write_ndjson_snapshot(items, raw_path: Path) -> int:
+    # Stream items one line at a time (compressed if the name says so), swapped in atomically
+    return snapshot.write_records(items, raw_path)
+
+
+def checkpoint_paths(raw_path: Path) -> tuple[Path, Path]:
+    # (cursor checkpoint, items fetched so far) kept next to the raw snapshot
+    return (raw_path.with_name(raw_path.name + ".checkpoint.json"),
+            raw_path.with_name(raw_path.name + ".partial.ndjson"))
+
+
+def _save_checkpoint(path: Path, state: dict) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def fetch_with_checkpoints(oncogene, raw_path: Path, limit: Optional[int] = None, resume: bool = False,
+                           server_filter: bool = True, workers: int = 1) -> dict:
+    """
+    Page through CIViC, checkpointing the endCursor and matching items after every page.
+
+    If a page fails (retries exhausted, MAX_PAGES tripped) the checkpoint and the partial
+    NDJSON stay on disk, and `resume=True` continues after the last good cursor. The
+    checkpoint also pins the stream plan, so a resume never re-resolves the gene.
+
+    Several genes ("ALK,ROS1,EGFR") share one pass: each node is classified once and
+    appended to the partial file of every gene it matches.
+
+    Args:
+        oncogene (str | None): Target gene symbol(s), e.g., "ALK" or "ALK,ROS1".
+        raw_path (Path): Raw snapshot location the checkpoint belongs to.
+        limit (int | None): Max evidence items to retrieve per gene.
+        resume (bool): Continue from an existing checkpoint instead of starting over.
+        server_filter (bool): Push the gene filter into the GraphQL request.
+        workers (int): Page independent streams concurrently with this many threads.
+
+    Returns:
+        dict: gene -> completed partial NDJSON, ready to be promoted to its snapshot.
+    """
+    genes = parse_oncogenes(oncogene)
+    checkpoint_path, _ = checkpoint_paths(raw_path)
+    partials = {gene: checkpoint_paths(shard_path(raw_path, gene, genes))[1] for gene in genes}
+    raw_path.parent.mkdir(parents=True, exist_ok=True)
+
+    state = None
+    seen_ids: set = set()
+    if resume and checkpoint_path.exists() and all(p.exists() for p in partials.values()):
+        saved = config.load_from_json(checkpoint_path)
+        if saved.get("oncogene") == oncogene and "streams" in saved:
+            state = saved
+            # Trust only what actually reached the partial files
+            state["written"] = {}
+            for gene, partial_path in partials.items():
+                ids = {ei.get("id") for ei in config.iter_ndjson(partial_path)}
+                state["written"][gene or ""] = len(ids)
+                seen_ids |= ids
+            logger.info("Resuming CIViC fetch after page %s (%s items kept)", state["pages"], len(seen_ids))
+        else:
+            logger.warning("Checkpoint does not match oncogene %s; starting over", oncogene)
+    if state is None:
+        for partial_path in partials.values():
+            partial_path.unlink(missing_ok=True)
+        state = {
+            "oncogene": oncogene,
+            "streams": plan_streams(oncogene, server_filter=server_filter, partition=workers > 1),
+            "cursors": {},
+            "done": [],
+            "pages": 0,
+            "written": {gene or "": 0 for gene in genes},
+        }
+        _save_checkpoint(checkpoint_path, state)
+
+    def _full(gene) -> bool:
+        return limit is not None and state["written"][gene or ""] >= limit
+
+    def _limit_hit() -> bool:
+        return all(_full(gene) for gene in genes)
+
+    pending = [[key, filters] for key, filters in state["streams"] if key not in state["done"]]
+    with ExitStack() as stack:
+        sinks = {gene: stack.enter_context(path.open("ab")) for gene, path in partials.items()}
+        pages = stack.enter_context(closing(iter_stream_pages(pending, state["cursors"], seen_ids, workers=workers)))
+        for key, nodes, end_cursor in pages:
+            if _limit_hit():
+                break
+            if nodes is None:
+                state["done"].append(key)
+                _save_checkpoint(checkpoint_path, state)
+                continue
+            for ei in nodes:
+                for gene in _classify(ei, genes):
+                    if _full(gene):
+                        continue
+                    sinks[gene].write(snapshot.dumps(ei) + b"\n")
+                    state["written"][gene or ""] += 1
+                if _limit_hit():
+                    break
+            for f in sinks.values():
+                f.flush()
+                os.fsync(f.fileno())
+            state["cursors"][key] = end_cursor
+            state["pages"] += 1
+            _save_checkpoint(checkpoint_path, state)
+
+    return partials
+
+
+def fetch_civic_evidence(oncogene = None, raw_path=None, overwrite=False, limit: Optional[int] = None, resume: bool = False,
+                         server_filter: bool = True, workers: int = 1):
+    """
+    Fetch and filter CIViC evidence items for a given gene symbol.
+
+    The snapshot format follows the suffix of `raw_path`: `.ndjson`/`.jsonl` streams
+    matching nodes straight to disk page by page and returns None, anything else keeps
+    the JSON-list compatibility mode and returns the filtered list.
+
+    A comma-separated `oncogene` ("ALK,ROS1,EGFR") fans one pass over CIViC out into
+    per-gene shards (see shard_path); JSON-list mode then returns {gene: list}.
+
+    Args:
+        oncogene (str | None): Target gene symbol(s), e.g., "ALK" or "ALK,ROS1,EGFR".
+        raw_path (Path | None): Raw snapshot location.
+        overwrite (bool): Refetch even if the snapshot exists.
+        limit (int | None): Max evidence items to retrieve per gene.
+        resume (bool): Continue an interrupted fetch from its last checkpoint.
+        server_filter (bool): Page only over the gene's molecular profiles instead of all of CIViC.
+        workers (int): Page independent streams concurrently with this many threads.
+    """
     if raw_path is None:
         raw_path = config.data_dir() / "civic_raw_evidence_db.json"
     raw_path = Path(raw_path)
+    ndjson = config.is_ndjson(raw_path)
+    genes = parse_oncogenes(oncogene)
+    shards = {gene: shard_path(raw_path, gene, genes) for gene in genes}
 
-    if raw_path.exists() and not overwrite:
-        with raw_path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    # Fetch CIViC evidence
-    all_items = api_calls.fetch_civic_all_evidence_items()
-    filtered = []
-    for ei in all_items:
-            if not ei or not isinstance(ei, dict):
-                continue
-            mp = ei.get("molecularProfile")
-            # disease = ei.get("disease")
-            
-            if not mp:
-                continue
-            mp_name = mp.get("name", "")
-            # disease_name = disease.get("name", "")
-            
-            if civic_parser.gene_in_molecular_profile(mp_name, oncogene):
-                filtered.append(ei)
-                if limit is not None and len(filtered) >= limit:
-                    break
-    raw_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    config.save_to_json(filtered, path=raw_path)
-    
-    return filtered
-   
+    if all(p.exists() for p in shards.values()) and not overwrite:
+        if ndjson:
+            return None
+        loaded = {gene: config.load_from_json(path) for gene, path in shards.items()}
+        return loaded if len(genes) > 1 else loaded[genes[0]]
+
+    partials = fetch_with_checkpoints(oncogene, raw_path, limit=limit, resume=resume,
+                                      server_filter=server_filter, workers=workers)
+    checkpoint_path, _ = checkpoint_paths(raw_path)
+
+    filtered = {}
+    for gene, partial_path in partials.items():
+        if ndjson and shards[gene].suffix.lower() not in snapshot.COMPRESSION_SUFFIXES:
+            os.replace(partial_path, shards[gene])
+            continue
+        if ndjson:
+            snapshot.write_records(config.iter_ndjson(partial_path), shards[gene])
+            partial_path.unlink(missing_ok=True)
+            continue
+        filtered[gene] = list(config.iter_ndjson(partial_path))
+        config.save_to_json(filtered[gene], path=shards[gene])
+        partial_path.unlink(missing_ok=True)
+    checkpoint_path.unlink(missing_ok=True)
+
+    if ndjson:
+        return None
+    return filtered if len(genes) > 1 else filtered[genes[0]]
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable
+
+from alkfred import config, snapshot
+from alkfred.etl import civic_fetch
+
+logger = logging.getLogger(__name__)
+
+
+def manifest_path_for(raw_path: Path) -> Path:
+    # civic_raw_evidence_db.json -> civic_raw_evidence_db.sync.json (same directory)
+    stem, _ = snapshot.split_name(raw_path)
+    return raw_path.with_name(f"{stem}.sync.json")
+
+
+def evidence_hash(node: dict) -> str:
+    # Stable content hash: key order and whitespace must not register as a change
+    blob = json.dumps(node, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def load_manifest(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {"last_run_utc": None, "oncogene": None, "hashes": {}}
+    return config.load_from_json(path)
+
+
+def _write_snapshot(nodes: list[dict], raw_path: Path) -> None:
+    raw_path.parent.mkdir(parents=True, exist_ok=True)
+    if config.is_ndjson(raw_path):
+        civic_fetch.write_ndjson_snapshot(nodes, raw_path)
+    else:
+        config.save_to_json(nodes, path=raw_path)
+
+
+def sync_civic_evidence(oncogene=None, raw_path=None, manifest_path=None, server_filter: bool = True,
+                        workers: int = 1) -> dict[str, int]:
+    """
+    Merge new, changed and withdrawn CIViC evidence into an existing raw snapshot.
+
+    A sync manifest next to the snapshot records the last run time and a content hash
+    per evidence id. The snapshot is only rewritten when the hashes say something moved.
+
+    Args:
+        oncogene (str | None): Target gene symbol, e.g., "ALK".
+        raw_path (Path | None): Raw snapshot location.
+        manifest_path (Path | None): Manifest location (defaults next to the snapshot).
+        server_filter (bool): Push the gene filter into the GraphQL request.
+        workers (int): Page independent streams concurrently with this many threads.
+
+    Returns:
+        dict[str, int]: Counts for new, changed, withdrawn and unchanged evidence ids.
+    """
+    if raw_path is None:
+        raw_path = config.data_dir() / "civic_raw_evidence_db.json"
+    nodes = civic_fetch.iter_oncogene_evidence(oncogene, server_filter=server_filter, workers=workers)
+    return merge_into_snapshot(nodes, oncogene, Path(raw_path), manifest_path)
+
+
+def sync_civic_shards(oncogene=None, raw_path=None, server_filter: bool = True, workers: int = 1,
+                      resume: bool = False) -> dict[str, dict[str, int]]:
+    """
+    Sync every gene shard of a multi-gene build from one pass over CIViC.
+
+    The pass is civic_fetch.fetch_with_checkpoints: each node is classified once and
+    appended to the partial file of every gene it matches, and the cursor is
+    checkpointed, so an interrupted sync continues with `resume=True`. Each completed
+    partial is then merged into its shard (see shard_path) against that shard's manifest.
+
+    Args:
+        oncogene (str | None): Target gene symbol(s), e.g., "ALK" or "ALK,ROS1".
+        raw_path (Path | None): Raw snapshot location; multi-gene builds sync its per-gene shards.
+        server_filter (bool): Push the gene filter into the GraphQL request.
+        workers (int): Page independent streams concurrently with this many threads.
+        resume (bool): Continue an interrupted sync from its last checkpoint.
+
+    Returns:
+        dict[str, dict[str, int]]: gene -> counts as returned by sync_civic_evidence.
+    """
+    if raw_path is None:
+        raw_path = config.data_dir() / "civic_raw_evidence_db.json"
+    raw_path = Path(raw_path)
+    genes = civic_fetch.parse_oncogenes(oncogene)
+    partials = civic_fetch.fetch_with_checkpoints(oncogene, raw_path, resume=resume, server_filter=server_filter,
+                                                  workers=workers)
+    counts = {}
+    for gene, partial_path in partials.items():
+        counts[gene] = merge_into_snapshot(config.iter_ndjson(partial_path), gene,
+                                           civic_fetch.shard_path(raw_path, gene, genes))
+        partial_path.unlink(missing_ok=True)
+    civic_fetch.checkpoint_paths(raw_path)[0].unlink(missing_ok=True)
+    return counts
+
+
+def merge_into_snapshot(nodes: Iterable[dict], oncogene, raw_path: Path, manifest_path=None) -> dict[str, int]:
+    """
+    Diff a complete stream of one gene's accepted evidence against its snapshot and manifest.
+
+    Args:
+        nodes (Iterable[dict]): Every evidence node currently matching the gene.
+        oncogene (str | None): Gene the snapshot belongs to (recorded in the manifest).
+        raw_path (Path): Raw snapshot location.
+        manifest_path (Path | None): Manifest location (defaults next to the snapshot).
+
+    Returns:
+        dict[str, int]: Counts for new, changed, withdrawn and unchanged evidence ids.
+    """
+    manifest_path = Path(manifest_path) if manifest_path else manifest_path_for(raw_path)
+
+    manifest = load_manifest(manifest_path)
+    snapshot: dict[str, dict] = {}
+    old_hashes: dict[str, str] = {}
+    # A manifest is only trusted alongside the snapshot it describes
+    if raw_path.exists() and manifest.get("oncogene") == oncogene:
+        snapshot = {str(n.get("id")): n for n in config.iter_raw_evidence(raw_path)}
+        old_hashes = manifest.get("hashes") or {}
+
+    counts = {"new": 0, "changed": 0, "withdrawn": 0, "unchanged": 0}
+    new_hashes: dict[str, str] = {}
+
+    for node in nodes:
+        key = str(node.get("id"))
+        digest = evidence_hash(node)
+        new_hashes[key] = digest
+        previous = old_hashes.get(key)
+        if previous is None:
+            counts["new"] += 1
+        elif previous != digest:
+            counts["changed"] += 1
+        else:
+            counts["unchanged"] += 1
+            continue
+        snapshot[key] = node
+
+    # Anything we had before that the accepted stream no longer returns was withdrawn
+    for key in set(old_hashes) - set(new_hashes):
+        snapshot.pop(key, None)
+        counts["withdrawn"] += 1
+
+    if counts["new"] or counts["changed"] or counts["withdrawn"] or not raw_path.exists():
+        _write_snapshot(list(snapshot.values()), raw_path)
+        logger.info("Snapshot updated: %s", raw_path)
+    else:
+        logger.info("Snapshot already current: %s", raw_path)
+
+    manifest = {
+        "last_run_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "oncogene": oncogene,
+        "hashes": new_hashes,
+    }
+    config.save_to_json(manifest, path=manifest_path)
+
+    logger.info("CIViC sync %s: new=%d changed=%d withdrawn=%d unchanged=%d",
+                oncogene, counts["new"], counts["changed"], counts["withdrawn"], counts["unchanged"])
+    return counts
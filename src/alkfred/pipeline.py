@@ -0,0 +1,297 @@
+"""
+In-process build pipeline.
+
+The build is a small dependency graph of stages (parse, schema, dims, links, facts and,
+for bulk builds, indexes and the FK check). Stages share one SQLite connection and the
+parsed raw snapshots through a BuildContext instead of re-importing modules that each
+open their own connection and re-read the raw JSON. Stages that never touch the database
+(parsing) run concurrently with the rest; database stages are serialized on the shared
+connection. Every stage reports wall time, rows and rows/sec.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from alkfred import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BuildContext:
+    """
+    State shared by all stages of one build.
+
+    Args:
+        db_path (Path): SQLite database being built.
+        shards (dict[str, Path]): Gene symbol -> raw snapshot path.
+        bulk (bool): Relaxed durability, deferred indexes and FK checks.
+    """
+
+    db_path: Path
+    shards: dict[str, Path]
+    bulk: bool = False
+    records: dict[str, list[dict]] = field(default_factory=dict)
+    results: dict[str, Any] = field(default_factory=dict)
+    db_lock: threading.Lock = field(default_factory=threading.Lock)
+    _conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Opened lazily; db stages run one at a time under db_lock, possibly on different threads
+        if self._conn is None:
+            self._conn = config.get_conn(self.db_path, check_same_thread=False)
+            if self.bulk:
+                config.apply_bulk_pragmas(self._conn)
+            else:
+                self._conn.execute("PRAGMA foreign_keys = ON")
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+@dataclass
+class Stage:
+    """
+    One node of the build graph.
+
+    Args:
+        name (str): Unique stage name, e.g. "dims:ALK".
+        run (Callable[[BuildContext], int]): Does the work, returns the rows it produced.
+        deps (tuple[str, ...]): Stages that must finish first.
+        uses_db (bool): Needs the shared connection, so it is serialized with other db stages.
+    """
+
+    name: str
+    run: Callable[[BuildContext], int]
+    deps: tuple[str, ...] = ()
+    uses_db: bool = True
+
+
+@dataclass
+class StageResult:
+    name: str
+    seconds: float
+    rows: int
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _ordered(stages: list[Stage]) -> list[Stage]:
+    # Validate the graph (unknown deps, cycles); returns stages in a topological order
+    by_name = {s.name: s for s in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Duplicate stage names in pipeline")
+    order: list[Stage] = []
+    state: dict[str, str] = {}
+
+    def visit(name: str, path: tuple[str, ...]) -> None:
+        if name not in by_name:
+            raise ValueError(f"Stage {path[-1]!r} depends on unknown stage {name!r}")
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Cycle in pipeline: {' -> '.join(path + (name,))}")
+        state[name] = "visiting"
+        for dep in by_name[name].deps:
+            visit(dep, path + (name,))
+        state[name] = "done"
+        order.append(by_name[name])
+
+    for s in stages:
+        visit(s.name, ())
+    return order
+
+
+def _timed(stage: Stage, ctx: BuildContext) -> StageResult:
+    started = time.perf_counter()
+    if stage.uses_db:
+        with ctx.db_lock:
+            rows = stage.run(ctx)
+    else:
+        rows = stage.run(ctx)
+    result = StageResult(stage.name, time.perf_counter() - started, int(rows or 0))
+    logger.info("Stage %-16s %8.2fs %9d rows %11.0f rows/s",
+                result.name, result.seconds, result.rows, result.rows_per_sec)
+    return result
+
+
+def run_pipeline(stages: list[Stage], ctx: BuildContext, max_workers: int = 4) -> list[StageResult]:
+    """
+    Run `stages` respecting their dependencies.
+
+    Args:
+        stages (list[Stage]): The build graph.
+        ctx (BuildContext): Shared connection and parsed data; closed when the run ends.
+        max_workers (int): Threads for stages whose dependencies are satisfied.
+
+    Returns:
+        list[StageResult]: One entry per stage, in completion order.
+    """
+    pending = {s.name: s for s in _ordered(stages)}
+    done: set[str] = set()
+    results: list[StageResult] = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="alkfred-build") as pool:
+            running = {}
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in done for dep in stage.deps):
+                        running[pool.submit(_timed, stage, ctx)] = name
+                        del pending[name]
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    name = running.pop(fut)
+                    # Re-raises the stage error; queued stages are abandoned with the pool
+                    results.append(fut.result())
+                    done.add(name)
+    finally:
+        ctx.close()
+    return results
+
+
+# --- the ALKfred build graph ---------------------------------------------------------
+
+def _parse(gene: str, incremental: bool = False) -> Callable[[BuildContext], int]:
+    def run(ctx: BuildContext) -> int:
+        path = ctx.shards[gene]
+        if not path.exists() and incremental:
+            # Not "this gene has no evidence": leave it out so none of its rows are withdrawn
+            logger.warning("Raw snapshot not found, leaving %s unchanged: %s", gene, path)
+            return 0
+        if not path.exists():
+            logger.warning("Raw snapshot not found, skipping %s: %s", gene, path)
+            ctx.records[gene] = []
+        else:
+            ctx.records[gene] = list(config.iter_raw_evidence(path))
+        return len(ctx.records[gene])
+    return run
+
+
+def _schema(ctx: BuildContext) -> int:
+    config.create_schema(ctx.conn, with_indexes=not ctx.bulk)
+    return 0
+
+
+def _dims(gene: str) -> Callable[[BuildContext], int]:
+    def run(ctx: BuildContext) -> int:
+        from alkfred.sql.dim_load.civic_dim_load import load_dimension_records
+        counts = load_dimension_records(ctx.conn, ctx.records[gene])
+        ctx.results[f"dims:{gene}"] = counts
+        return sum(counts.values())
+    return run
+
+
+def _dims_parallel(workers: int) -> Callable[[BuildContext], int]:
+    def run(ctx: BuildContext) -> int:
+        from alkfred.sql.dim_load.civic_dim_load import load_dimensions_parallel
+        counts = load_dimensions_parallel(ctx.conn, list(ctx.shards.values()), workers=workers,
+                                          staging_dir=Path(ctx.db_path).resolve().parent)
+        ctx.results["dims"] = counts
+        return sum(counts.values())
+    return run
+
+
+def _links(gene: str, workers: int = 0) -> Callable[[BuildContext], int]:
+    def run(ctx: BuildContext) -> int:
+        from alkfred.sql.evidence_link_create import insert_links, insert_links_parallel
+        if workers > 1:
+            return insert_links_parallel(ctx.conn, ctx.records[gene], oncogene=gene, workers=workers, bulk=ctx.bulk)
+        return insert_links(ctx.conn, ctx.records[gene], oncogene=gene, bulk=ctx.bulk)
+    return run
+
+
+def _incremental(ctx: BuildContext) -> int:
+    from alkfred.sql.incremental_build import incremental_build
+    counts = incremental_build(ctx.conn, ctx.records)
+    ctx.results["incremental"] = counts
+    return counts["dim_rows"] + counts["links"] + counts["facts"]
+
+
+def _facts(ctx: BuildContext) -> int:
+    from alkfred.sql.evidence_fact_create import insert_facts
+    return insert_facts(ctx.conn)
+
+
+def _query_table(ctx: BuildContext) -> int:
+    from alkfred.sql.query_evidence_create import refresh_query_evidence
+    return refresh_query_evidence(ctx.conn)
+
+
+def _indexes(ctx: BuildContext) -> int:
+    config.create_indexes(ctx.conn)
+    return 0
+
+
+def _optimize(analyze: bool) -> Callable[[BuildContext], int]:
+    def run(ctx: BuildContext) -> int:
+        config.optimize_database(ctx.conn, analyze=analyze)
+        return 0
+    return run
+
+
+def _fk_check(ctx: BuildContext) -> int:
+    orphans = config.foreign_key_orphans(ctx.conn)
+    ctx.results["orphans"] = orphans
+    return sum(orphans.values())
+
+
+def build_stages(genes: list[str], bulk: bool = False, dim_workers: int = 0, link_workers: int = 0,
+                 incremental: bool = False) -> list[Stage]:
+    """
+    The standard build graph for one or more gene shards.
+
+    parse:<gene> and schema have no dependencies and overlap; all dims finish before any
+    links (links resolve against the full dimension tables); facts come next and the
+    query_evidence lookup table is materialized from them last. With
+    dim_workers > 1 a single "dims" stage builds the dimensions in worker processes
+    (staging databases merged with ATTACH) while the shards are parsed for the links.
+    With link_workers > 1 each links stage resolves eid shards in worker processes and a
+    single writer thread inserts the results. An incremental build replaces dims, links
+    and facts with one stage that applies only what changed since the last build; a gene
+    whose snapshot is missing is left out of it rather than treated as withdrawn. Every
+    build ends with an optimize stage: ANALYZE after a full build, PRAGMA optimize alone
+    after an incremental one.
+    """
+    stages = [Stage("schema", _schema)]
+    for gene in genes:
+        stages.append(Stage(f"parse:{gene}", _parse(gene, incremental), uses_db=False))
+    if incremental:
+        stages.append(Stage("incremental", _incremental, deps=("schema",) + tuple(f"parse:{g}" for g in genes)))
+        stages.append(Stage("optimize", _optimize(analyze=False), deps=("incremental",)))
+        return stages
+    if dim_workers > 1:
+        stages.append(Stage("dims", _dims_parallel(dim_workers), deps=("schema",)))
+        all_dims = ("dims",) + tuple(f"parse:{gene}" for gene in genes)
+    else:
+        for gene in genes:
+            stages.append(Stage(f"dims:{gene}", _dims(gene), deps=("schema", f"parse:{gene}")))
+        all_dims = tuple(f"dims:{gene}" for gene in genes)
+    for gene in genes:
+        stages.append(Stage(f"links:{gene}", _links(gene, link_workers), deps=all_dims))
+    stages.append(Stage("facts", _facts, deps=tuple(f"links:{gene}" for gene in genes)))
+    stages.append(Stage("query_table", _query_table, deps=("facts",)))
+    if bulk:
+        stages.append(Stage("indexes", _indexes, deps=("query_table",)))
+        stages.append(Stage("fk_check", _fk_check, deps=("indexes",)))
+    stages.append(Stage("optimize", _optimize(analyze=True), deps=(stages[-1].name,)))
+    return stages
+
+
+def format_timings(results: list[StageResult]) -> str:
+    lines = [f"{'stage':<16} {'secs':>8} {'rows':>9} {'rows/s':>11}"]
+    for r in results:
+        lines.append(f"{r.name:<16} {r.seconds:>8.2f} {r.rows:>9} {r.rows_per_sec:>11.0f}")
+    total = sum(r.seconds for r in results)
+    lines.append(f"{'total (serial)':<16} {total:>8.2f}")
+    return "\n".join(lines)
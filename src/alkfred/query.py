@@ -0,0 +1,301 @@
+"""
+Importable query API over a built ALKfred database.
+
+    from alkfred.query import Query, QueryEngine
+
+    with QueryEngine("data/alkfred.sqlite") as engine:
+        q = Query().where(variant_norm=bare_variant("ALK G1202R", gene="ALK"), significance="RESISTANCE").limit(25)
+        for row in engine.iter_rows(q):
+            ...
+
+A Query is an immutable filter set; QueryEngine turns it into parameterised SQL over
+query_evidence, the denormalized lookup table the build materializes. The SQL
+text depends only on the query's shape (which filters are set, how many values each binds,
+paged or not, limited or not), is built once per shape and reused, so SQLite's
+per-connection statement cache keeps every shape compiled. Rows are yielded one at a time
+off the cursor.
+
+Paging is keyset-based on the sort key (sort_label, eid, fact_id): a page resumes
+strictly after the last key of the previous one, passed around as an opaque cursor token,
+so page N costs the same as page 1.
+"""
+import base64
+import binascii
+import functools
+import json
+import sqlite3
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from alkfred.text import normalize_label
+
+# Columns of every result row, in order
+COLUMNS = ("eid", "doid", "therapy_id", "variant_id", "label_display", "label_disease_norm", "significance")
+
+# Every row also carries its sort key (last two columns) so the next page can resume after it.
+# query_evidence is keyed (variant_norm, sort_label, eid, fact_id) with covering indexes per
+# filter shape, so a lookup is one index range scan already in ORDER_SQL order
+SELECT_SQL = """SELECT eid, doid, therapy_id, variant_id, label_display, disease_norm, significance, sort_label, fact_id
+FROM query_evidence"""
+ORDER_SQL = "ORDER BY sort_label, eid, fact_id"
+AFTER_SQL = "(sort_label, eid, fact_id) > (?, ?, ?)"
+
+# Many lookups in one statement: inputs go into a temp table joined against query_evidence
+BATCH_TABLE_SQL = """CREATE TEMP TABLE IF NOT EXISTS batch_input (
+    row_no INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    significance TEXT,
+    disease TEXT,
+    gene TEXT
+)"""
+BATCH_SQL = """SELECT row_no, eid, doid, therapy_id, variant_id, label_display, disease_norm, significance
+FROM (
+    SELECT b.row_no, q.eid, q.doid, q.therapy_id, q.variant_id, q.label_display, q.disease_norm, q.significance,
+           ROW_NUMBER() OVER (PARTITION BY b.row_no ORDER BY q.sort_label, q.eid, q.fact_id) AS rank_in_row,
+           q.sort_label, q.fact_id
+    FROM temp.batch_input AS b
+    CROSS JOIN query_evidence AS q ON q.variant_norm = b.label  -- CROSS: the inputs drive the join
+    WHERE (b.significance IS NULL OR q.significance = b.significance)
+      AND (b.disease IS NULL OR q.disease_norm = b.disease)
+      AND (b.gene IS NULL OR q.gene_symbol = b.gene)
+)
+WHERE ?1 IS NULL OR rank_in_row <= ?1
+ORDER BY row_no, sort_label, eid, fact_id"""
+
+# filter name -> query_evidence column it constrains; the order here is the order predicates are emitted in
+FILTER_COLUMNS = {
+    "variant_norm": "variant_norm",
+    "variant": "variant_label",
+    "variant_id": "variant_id",
+    "gene": "gene_symbol",
+    "significance": "significance",
+    "direction": "direction",
+    "evidence_level": "evidence_level",
+    "evidence_type": "evidence_type",
+    "disease": "disease_norm",
+    "doid": "doid",
+    "therapy": "therapy_norm",
+    "eid": "eid",
+}
+
+# Up to this many values a filter binds one placeholder each (IN (?, ?)), which the planner
+# can drive an index with; longer lists travel as one JSON array through json_each
+INLINE_VALUES = 16
+
+# Statement cache per connection: every filter shape the CLI and server use, with room to spare
+CACHED_STATEMENTS = 256
+
+
+def bare_variant(variant: str, gene: str | None = None) -> str:
+    """
+    Normalized variant label with the gene prefix removed, as stored in query_evidence.variant_norm.
+
+    Args:
+        variant (str): Variant as typed, e.g. "G1202R" or "ALK G1202R".
+        gene (str | None): Gene symbol whose prefix is dropped.
+
+    Returns:
+        str: Value for the `variant_norm` filter, e.g. "g1202r".
+    """
+    return variant_labels(variant, gene)[0]
+
+
+def variant_labels(variant: str, gene: str | None = None) -> tuple[str, ...]:
+    """
+    Normalized labels a variant may be stored under.
+
+    CIViC variant names usually omit the gene ("G1202R") but some snapshots carry it
+    ("ALK G1202R"); with a gene both spellings are returned.
+
+    Args:
+        variant (str): Variant as typed, with or without the gene.
+        gene (str | None): Gene symbol, e.g. "ALK".
+
+    Returns:
+        tuple[str, ...]: Candidate values for the `variant` filter.
+    """
+    label = normalize_label(variant)
+    if not gene:
+        return (label,)
+    prefix = normalize_label(gene) + "_"
+    bare = label[len(prefix):] if label.startswith(prefix) else label
+    return (bare, prefix + bare)
+
+
+@dataclass(frozen=True)
+class Query:
+    """
+    Immutable, composable filter set; every method returns a new Query.
+
+    Args:
+        filters (tuple): (name, values) pairs in FILTER_COLUMNS order.
+        max_rows (int | None): LIMIT, or None for every row.
+        after (tuple[str, int, int] | None): Sort key the rows must follow (keyset paging).
+    """
+
+    filters: tuple[tuple[str, tuple], ...] = ()
+    max_rows: int | None = None
+    after: tuple[str, int, int] | None = None
+
+    def where(self, **conditions) -> "Query":
+        # None clears a filter; a list/tuple/set matches any of its values
+        merged = dict(self.filters)
+        for name, value in conditions.items():
+            if name not in FILTER_COLUMNS:
+                raise ValueError(f"Unknown filter {name!r}; expected one of {', '.join(FILTER_COLUMNS)}")
+            if value is None:
+                merged.pop(name, None)
+                continue
+            values = tuple(value) if isinstance(value, (list, tuple, set, frozenset)) else (value,)
+            if not values:
+                raise ValueError(f"Filter {name!r} needs at least one value")
+            merged[name] = values
+        return replace(self, filters=tuple((n, merged[n]) for n in FILTER_COLUMNS if n in merged))
+
+    def limit(self, max_rows: int | None) -> "Query":
+        if max_rows is not None and max_rows < 1:
+            raise ValueError("limit must be at least 1")
+        return replace(self, max_rows=max_rows)
+
+    def page_after(self, cursor: str | None) -> "Query":
+        # Resume after the row a cursor token points at; None starts from the first row
+        return replace(self, after=decode_cursor(cursor) if cursor else None)
+
+    @property
+    def shape(self) -> tuple:
+        # What the SQL text depends on; values only ever travel as parameters
+        # per filter: number of placeholders, or 0 for a JSON array
+        return tuple((name, len(values) if len(values) <= INLINE_VALUES else 0)
+                     for name, values in self.filters) + (self.after is not None, self.max_rows is not None)
+
+    def params(self) -> list:
+        params = []
+        for _, values in self.filters:
+            if len(values) <= INLINE_VALUES:
+                params.extend(values)
+            else:
+                params.append(json.dumps(list(values)))
+        if self.after is not None:
+            params.extend(self.after)
+        if self.max_rows is not None:
+            params.append(self.max_rows)
+        return params
+
+    def sql(self) -> str:
+        return compile_shape(self.shape)
+
+
+def encode_cursor(sort_key: tuple[str, int, int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(sort_key)).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[str, int, int]:
+    try:
+        sort_label, eid, fact_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return str(sort_label), int(eid), int(fact_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+
+@functools.lru_cache(maxsize=None)
+def compile_shape(shape: tuple) -> str:
+    *filters, paged, limited = shape
+    predicates = []
+    for name, placeholders in filters:
+        column = FILTER_COLUMNS[name]
+        if placeholders == 1:
+            predicates.append(f"{column} = ?")
+        elif placeholders:
+            predicates.append(f"{column} IN ({', '.join('?' * placeholders)})")
+        else:
+            predicates.append(f"{column} IN (SELECT value FROM json_each(?))")
+    if paged:
+        predicates.append(AFTER_SQL)
+    parts = [SELECT_SQL]
+    if predicates:
+        parts.append("WHERE " + " AND ".join(predicates))
+    parts.append(ORDER_SQL)
+    if limited:
+        parts.append("LIMIT ?")
+    return "\n".join(parts)
+
+
+class QueryEngine:
+    """
+    Runs Query objects against an ALKfred database.
+
+    Args:
+        source (sqlite3.Connection | str | Path): An open connection (the caller keeps
+            ownership) or a database path, opened read-only and closed by `close()`.
+    """
+
+    def __init__(self, source: "sqlite3.Connection | str | Path"):
+        if isinstance(source, sqlite3.Connection):
+            self.conn, self._owned = source, False
+        else:
+            if not Path(source).exists():
+                raise FileNotFoundError(f"Database not found: {source}")
+            uri = f"{Path(source).resolve().as_uri()}?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+            self._owned = True
+
+    def iter_rows(self, query: Query) -> Iterator[dict]:
+        """
+        Stream the rows matching `query`, ordered by therapy label then eid.
+
+        Yields:
+            dict: One result row keyed by COLUMNS.
+        """
+        for _, row in self.iter_keyed(query):
+            yield row
+
+    def iter_keyed(self, query: Query) -> Iterator[tuple[tuple[str, int, int], dict]]:
+        # Same rows paired with their sort key; encode_cursor(key) of the last row is the next page
+        cur = self.conn.execute(query.sql(), query.params())
+        try:
+            for row in cur:
+                yield (row[-2], row[0], row[-1]), dict(zip(COLUMNS, row))
+        finally:
+            cur.close()
+
+    def iter_batch(self, items: Iterable[tuple[int, Sequence[str], str | None, str | None, str | None]],
+                   limit: int | None = None) -> Iterator[dict]:
+        """
+        Resolve many lookups with one set-based query on this connection.
+
+        Args:
+            items (Iterable[tuple]): (row_no, variant labels, significance or None, disease or None,
+                gene symbol or None) per input row; labels as returned by bare_variant().
+            limit (int | None): Maximum rows per input row.
+
+        Yields:
+            dict: Result rows keyed by "row" plus COLUMNS, grouped by input row in row order.
+        """
+        self.conn.execute(BATCH_TABLE_SQL)
+        self.conn.execute("DELETE FROM temp.batch_input")
+        self.conn.executemany(
+            "INSERT INTO temp.batch_input (row_no, label, significance, disease, gene) VALUES (?, ?, ?, ?, ?)",
+            ((row_no, label, significance, disease, gene)
+             for row_no, labels, significance, disease, gene in items for label in dict.fromkeys(labels)))
+        cur = self.conn.execute(BATCH_SQL, (limit,))
+        try:
+            for row in cur:
+                yield dict(zip(("row",) + COLUMNS, row))
+        finally:
+            cur.close()
+            self.conn.execute("DELETE FROM temp.batch_input")
+            self.conn.commit()
+
+    def select(self, limit: int | None = None, **conditions) -> Iterator[dict]:
+        return self.iter_rows(Query().where(**conditions).limit(limit))
+
+    def close(self) -> None:
+        if self._owned:
+            self.conn.close()
+
+    def __enter__(self) -> "QueryEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
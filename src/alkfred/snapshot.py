@@ -0,0 +1,184 @@
+"""
+Raw snapshot format layer: plain/gzip/zstd JSON documents and NDJSON record streams.
+
+The format is read off the file name (`.json`, `.ndjson`/`.jsonl`, optionally followed by
+`.gz` or `.zst`) and, for reads, double-checked against the content: compression by magic
+bytes, NDJSON vs. a JSON document by the shape of the first line. orjson and zstandard
+are used when installed; without them we fall back to the stdlib json module and
+zstd snapshots are refused with a clear error.
+"""
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .zst snapshots
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:  # e.g. non-str dict keys, which stdlib json coerces
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def split_name(path: Path) -> tuple[str, str]:
+    # "civic_raw_evidence_db.ndjson.gz" -> ("civic_raw_evidence_db", ".ndjson.gz")
+    name = Path(path).name
+    compression = ""
+    for suffix in COMPRESSION_SUFFIXES:
+        if name.lower().endswith(suffix):
+            compression = name[-len(suffix):]
+            name = name[:-len(suffix)]
+            break
+    stem, dot, ext = name.rpartition(".")
+    if not dot or not stem:
+        return name, compression
+    return stem, f".{ext}{compression}"
+
+
+def compression_of(path: Path) -> str | None:
+    path = Path(path)
+    if path.exists():
+        with path.open("rb") as f:
+            head = f.read(4)
+        if head.startswith(GZIP_MAGIC):
+            return "gzip"
+        if head.startswith(ZSTD_MAGIC):
+            return "zstd"
+        return None
+    return COMPRESSION_SUFFIXES.get(path.suffix.lower())
+
+
+def _require_zstd() -> None:
+    if zstandard is None:
+        raise RuntimeError("zstd snapshots need the optional 'zstandard' package (pip install zstandard)")
+
+
+def open_binary(path: Path):
+    # Line-iterable binary reader that transparently decompresses
+    path = Path(path)
+    compression = compression_of(path)
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "zstd":
+        _require_zstd()
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(path.open("rb"), closefd=True))
+    return path.open("rb")
+
+
+def is_ndjson(path: Path) -> bool:
+    path = Path(path)
+    _, suffixes = split_name(path)
+    if suffixes.lower().startswith(NDJSON_SUFFIXES):
+        return True
+    if suffixes.lower().startswith(".json") or not path.exists():
+        return False
+    # Unknown extension: sniff, a complete object on the first line means one record per line
+    with open_binary(path) as f:
+        first = f.readline().strip()
+    if not first.startswith(b"{"):
+        return False
+    try:
+        return isinstance(loads(first), dict)
+    except ValueError:
+        return False
+
+
+def iter_records(path: Path) -> Iterator[Any]:
+    # Stream NDJSON line by line; JSON lists are parsed in one go and then iterated
+    path = Path(path)
+    if not is_ndjson(path):
+        data = load(path)
+        yield from data if isinstance(data, list) else [data]
+        return
+    with open_binary(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield loads(line)
+
+
+def load(path: Path) -> Any:
+    path = Path(path)
+    if is_ndjson(path):
+        return list(iter_records(path))
+    with open_binary(path) as f:
+        blob = f.read()
+    try:
+        return loads(blob)
+    except ValueError:
+        # NDJSON saved under a .json name: still readable, one record per line
+        return [loads(line) for line in blob.splitlines() if line.strip()]
+
+
+def _atomic_target(path: Path) -> Path:
+    return path.with_name(path.name + ".part")
+
+
+def save(data: Any, path: Path) -> None:
+    """
+    Write `data` in the format implied by `path`.
+
+    Plain `.json` keeps the historical indent=2 layout; compressed documents are compact.
+    """
+    path = Path(path)
+    if is_ndjson(path):
+        write_records(data, path)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _atomic_target(path)
+    with _open_for_write(path, tmp_path) as f:
+        if COMPRESSION_SUFFIXES.get(path.suffix.lower()):
+            f.write(dumps(data))
+        else:
+            f.write(json.dumps(data, indent=2).encode("utf-8"))
+    os.replace(tmp_path, path)
+
+
+def _open_for_write(path: Path, tmp_path: Path):
+    # Compression follows the final name, the bytes go to the temp file
+    compression = COMPRESSION_SUFFIXES.get(path.suffix.lower())
+    if compression == "gzip":
+        return gzip.open(tmp_path, "wb")
+    if compression == "zstd":
+        _require_zstd()
+        return zstandard.ZstdCompressor(level=10).stream_writer(tmp_path.open("wb"), closefd=True)
+    return tmp_path.open("wb")
+
+
+def write_records(records: Iterable[Any], path: Path) -> int:
+    # One record per line, streamed through the compressor, swapped in atomically
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _atomic_target(path)
+    written = 0
+    with _open_for_write(path, tmp_path) as f:
+        for rec in records:
+            f.write(dumps(rec) + b"\n")
+            written += 1
+    os.replace(tmp_path, path)
+    return written
@@ -1,52 +1,37 @@
 import json
-import sqlite3
-from pathlib import Path
 import logging
-from dotenv.main import logger
-from utils import normalize_label
+from pathlib import Path
+from alkfred.text import normalize_label
 from alkfred import config
 
 
 DB_PATH = config.default_db_path()
-JSON_PATH = Path("/app/data/civic_raw_evidence_db.json")  # use forward slashes or raw string
-
-def main():
-    
-
-    logger = logging.getLogger(__name__)
+JSON_PATH = config.data_dir() / "civic_raw_evidence_db.json"
 
+INSERT_SQL = "INSERT OR IGNORE INTO dim_disease (doid, label_display, label_disease_norm, synonyms_json, mondo_id, ncit_id, lineage_json) VALUES (?,?,?,?,?,?,?)"
 
-    conn = config.get_conn(DB_PATH)
-    cur = conn.cursor()
+logger = logging.getLogger(__name__)
 
 
-    logger.info("Table dim_disease created or already exists in %s", DB_PATH)
+def rows_from_record(rec: dict) -> list[tuple]:
+    # One dim_disease row per evidence node, keyed by the disease DOID
+    disease = rec.get("disease") or {}
+    doid = disease.get("doid")
+    label_display = disease.get("name")
+    if not doid or not label_display:
+        return []
+    label_disease_norm = normalize_label(label_display)
+    synonyms_json = json.dumps(disease.get("diseaseAliases") or [])
+    return [(doid, label_display, label_disease_norm, synonyms_json, None, None, "[]")]
 
-    data_dict = config.raw_json_list_to_dict(JSON_PATH)
-    
-    # Collect rows
-    rows_disease = []
-    
 
-    for rec in data_dict.values():                       # iterate values, not keys
-        doid = rec.get("id")
-        disease = rec.get("disease")
-        label_display = disease.get("name")
-        label_disease_norm = normalize_label(label_display)
-        
-        synonyms_json = json.dumps(rec.get("disease_aliases", []))
-        rows_disease.append((doid, label_display, label_disease_norm , synonyms_json, None, None, "[]"))
-        
-
-    # Bulk insert
-
-    cur.executemany(
-        "INSERT OR IGNORE INTO dim_disease (doid, label_display, label_disease_norm, synonyms_json, mondo_id, ncit_id, lineage_json) VALUES (?,?,?,?,?,?,?)",
-        rows_disease
-    )
+def main(db_path: Path = DB_PATH, raw_path: Path = JSON_PATH):
+    conn = config.get_conn(db_path)
+    rows_disease = [row for rec in config.iter_raw_evidence(raw_path) for row in rows_from_record(rec)]
+    conn.executemany(INSERT_SQL, rows_disease)
     conn.commit()
-
     conn.close()
+    logger.info("Loaded %d dim_disease rows into %s", len(rows_disease), db_path)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,67 +1,58 @@
 import json
-import sqlite3
+import logging
 from pathlib import Path
 from datetime import datetime, timezone
 from alkfred import config
 
 
-
-
-
 DB_PATH = config.default_db_path()
-JSON_PATH = Path("data/civic_raw_evidence_db.json")  # use forward slashes or raw string    
-
-def main():
+JSON_PATH = config.data_dir() / "civic_raw_evidence_db.json"
 
-    
+INSERT_SQL = "INSERT OR IGNORE INTO dim_evidence(eid, source_json, direction, significance, evidence_level, evidence_type, rating, status, pmids_json, pub_year, description, created_at_utc, updated_at_utc) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)"
 
-    conn = config.get_conn(DB_PATH)
-    cur = conn.cursor()
+logger = logging.getLogger(__name__)
 
-    data_dict = config.raw_json_list_to_dict(JSON_PATH)
-    
-    rows_evidence = []
 
-    for rec in data_dict.values():
-                            # iterate values, not keys
-        eid= rec.get("id", None)
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
 
-        source_json = json.dumps(rec.get("source", {}))
-        direction = rec.get(("evidenceDirection") or "").strip()
-        significance = rec.get(("significance") or "").strip()
-        evidence_level = rec.get(("evidenceLevel") or "").strip()
-        evidence_type = rec.get(("evidenceType") or "").strip()
-        rating = rec.get(("evidenceRating") or None)
-        status = rec.get(("status") or "").strip()
 
-        src = rec.get("source") or {}
-        citation_id = src.get("citationId")
-        pmids = []
-        if citation_id:
-            pmids.append(str(citation_id))
-        pmids_json = json.dumps(pmids)
+def rows_from_record(rec: dict, now_iso: str | None = None) -> list[tuple]:
+    eid = rec.get("id", None)
+    if eid is None:
+        return []
+    now_iso = now_iso or utc_now_iso()
 
-        pub_year = src.get(("publicationYear") or None)
-        description = rec.get(("description") or None)
-        created_at_utc = datetime.now(timezone.utc).isoformat(timespec="seconds")
-        updated_at_utc = datetime.now(timezone.utc).isoformat(timespec="seconds")
-        
+    src = rec.get("source") or {}
+    source_json = json.dumps(src)
+    direction = (rec.get("evidenceDirection") or "").strip()
+    significance = (rec.get("significance") or "").strip()
+    evidence_level = (rec.get("evidenceLevel") or "").strip()
+    evidence_type = (rec.get("evidenceType") or "").strip()
+    rating = rec.get("evidenceRating")
+    status = (rec.get("status") or "").strip()
 
+    citation_id = src.get("citationId")
+    pmids = []
+    if citation_id:
+        pmids.append(str(citation_id))
+    pmids_json = json.dumps(pmids)
 
+    pub_year = src.get("publicationYear")
+    description = rec.get("description")
 
-        rows_evidence.append((eid, source_json, direction, significance, evidence_level, evidence_type, rating, status, pmids_json, pub_year, description, created_at_utc, updated_at_utc))
+    return [(eid, source_json, direction, significance, evidence_level, evidence_type, rating, status,
+             pmids_json, pub_year, description, now_iso, now_iso)]
 
 
-    # Bulk insert
-
-    cur.executemany(
-        "INSERT OR IGNORE INTO dim_evidence(eid, source_json, direction, significance, evidence_level, evidence_type, rating, status, pmids_json, pub_year, description, created_at_utc, updated_at_utc) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
-        rows_evidence
-    )
+def main(db_path: Path = DB_PATH, raw_path: Path = JSON_PATH):
+    conn = config.get_conn(db_path)
+    now_iso = utc_now_iso()
+    rows_evidence = [row for rec in config.iter_raw_evidence(raw_path) for row in rows_from_record(rec, now_iso)]
+    conn.executemany(INSERT_SQL, rows_evidence)
     conn.commit()
-
-
     conn.close()
+    logger.info("Loaded %d dim_evidence rows into %s", len(rows_evidence), db_path)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
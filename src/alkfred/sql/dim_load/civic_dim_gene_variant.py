@@ -1,51 +1,47 @@
-import json
-import sqlite3
+import logging
+import uuid
 from pathlib import Path
 
-from dotenv.main import logger
-
-from utils import normalize_label
+from alkfred.text import normalize_label
 from alkfred import config
 
 
 DB_PATH = config.default_db_path()
-JSON_PATH = Path("data/civic_raw_evidence_db.json") 
-
-def main():
-    
-    conn = config.get_conn(DB_PATH)
-    cur = conn.cursor()
-
-    # Load JSON as a dict
-    data_dict = config.raw_json_list_to_dict(JSON_PATH)
-    
-    # Collect rows
-    rows_gene_variant = []
-
-    for rec in data_dict.values():
-        entry = rec.get("molecularProfile",[])
-        for v in entry.get("variants", []):                   
-            civic_ca_id= v.get("alleleRegistryId", "")
-            variant_id = civic_ca_id if civic_ca_id else v.get("name")
-            gene_symbol = v.get("feature", {}).get("name", "")
-            label_display = v.get("name","")
-            label_gene_variant_norm = normalize_label(label_display)
-            
-        
-        
-            rows_gene_variant.append((variant_id, civic_ca_id, None, gene_symbol, label_display, label_gene_variant_norm, None, None, None))
-        
-
-    # Bulk insert
-
-    cur.executemany(
-        "INSERT OR IGNORE INTO dim_gene_variant (variant_id, civic_ca_id, hgnc_id, gene_symbol, label_display, label_gene_variant_norm, hgvs_p, hgvs_c, confidence) VALUES (?,?,?,?,?,?,?,?,?)",
-        rows_gene_variant
-    )
+JSON_PATH = config.data_dir() / "civic_raw_evidence_db.json"
+UUID_NAMESPACE = uuid.UUID("00000000-0000-0000-0000-000000000000")
+
+INSERT_SQL = "INSERT OR IGNORE INTO dim_gene_variant (variant_id, civic_ca_id, hgnc_id, gene_symbol, label_display, label_gene_variant_norm, hgvs_p, hgvs_c, confidence) VALUES (?,?,?,?,?,?,?,?,?)"
+
+logger = logging.getLogger(__name__)
+
+
+def rows_from_record(rec: dict) -> list[tuple]:
+    # One dim_gene_variant row per component variant of the molecular profile
+    rows = []
+    entry = rec.get("molecularProfile") or {}
+    for v in entry.get("variants") or []:
+        civic_ca_id = v.get("alleleRegistryId", "")
+        gene_symbol = (v.get("feature") or {}).get("name", "")
+        label_display = v.get("name", "")
+        label_gene_variant_norm = normalize_label(label_display)
+        if civic_ca_id:
+            variant_id = civic_ca_id
+        elif label_gene_variant_norm:
+            # Same gene-scoped seed as evidence_link_create.DimResolver.variant, so both loaders agree
+            variant_id = str(uuid.uuid5(UUID_NAMESPACE, f"variant|{normalize_label(gene_symbol)}|{label_gene_variant_norm}"))
+        else:
+            continue
+        rows.append((variant_id, civic_ca_id, None, gene_symbol, label_display, label_gene_variant_norm, None, None, None))
+    return rows
+
+
+def main(db_path: Path = DB_PATH, raw_path: Path = JSON_PATH):
+    conn = config.get_conn(db_path)
+    rows_gene_variant = [row for rec in config.iter_raw_evidence(raw_path) for row in rows_from_record(rec)]
+    conn.executemany(INSERT_SQL, rows_gene_variant)
     conn.commit()
-
-
     conn.close()
+    logger.info("Loaded %d dim_gene_variant rows into %s", len(rows_gene_variant), db_path)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,207 @@
+"""
+Single-pass loader for the four CIViC dimension tables.
+
+Walks the raw snapshot once (JSON list or NDJSON, streamed) and feeds each evidence node
+through the per-table row builders, flushing batched `executemany` calls on one
+connection inside one transaction. `load_dimensions_parallel` spreads the same work over
+worker processes, each filling a private staging database, and merges the results with
+ATTACH + INSERT ... SELECT in one transaction.
+"""
+import logging
+import multiprocessing
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+from alkfred import config
+from alkfred.sql.keys import KINDS
+from alkfred.sql.dim_load import (
+    civic_dim_disease_create,
+    civic_dim_evidence_create,
+    civic_dim_gene_variant,
+    civic_dim_therapy_create,
+)
+
+DB_PATH = config.default_db_path()
+JSON_PATH = config.data_dir() / "civic_raw_evidence_db.json"
+BATCH_SIZE = 1000
+
+# table -> (row builder module); order matters only for readability, dims carry no FKs
+DIMENSIONS = {
+    "dim_disease": civic_dim_disease_create,
+    "dim_gene_variant": civic_dim_gene_variant,
+    "dim_therapy": civic_dim_therapy_create,
+    "dim_evidence": civic_dim_evidence_create,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def load_dimensions(conn: sqlite3.Connection, raw_path: Path, batch_size: int = BATCH_SIZE) -> dict[str, int]:
+    """
+    Populate every dimension table from one streaming pass over the raw snapshot.
+
+    Args:
+        conn (sqlite3.Connection): Open connection; the caller owns it.
+        raw_path (Path): Raw CIViC snapshot (JSON list or NDJSON, optionally compressed).
+        batch_size (int): Rows buffered per table before an executemany flush.
+
+    Returns:
+        dict[str, int]: Rows offered per table (INSERT OR IGNORE may keep fewer).
+    """
+    counts = load_dimension_records(conn, config.iter_raw_evidence(raw_path), batch_size)
+    logger.info("Dimensions loaded from %s: %s", raw_path,
+                ", ".join(f"{table}={n}" for table, n in counts.items()))
+    return counts
+
+
+def rows_for_table(table: str, rec: dict, now_iso: str) -> list[tuple]:
+    # Rows one evidence node contributes to a dimension table, in that loader's INSERT column order
+    if table == "dim_evidence":
+        return civic_dim_evidence_create.rows_from_record(rec, now_iso)
+    return DIMENSIONS[table].rows_from_record(rec)
+
+
+def load_dimension_records(conn: sqlite3.Connection, records: Iterable[dict], batch_size: int = BATCH_SIZE,
+                           tables: Iterable[str] = DIMENSIONS, now_iso: str | None = None) -> dict[str, int]:
+    # Same as load_dimensions, for evidence nodes that are already parsed (optionally a subset of tables)
+    now_iso = now_iso or civic_dim_evidence_create.utc_now_iso()
+    tables = list(tables)
+    batches: dict[str, list[tuple]] = {table: [] for table in tables}
+    counts = {table: 0 for table in tables}
+
+    def flush(table: str) -> None:
+        rows = batches[table]
+        if rows:
+            conn.executemany(DIMENSIONS[table].INSERT_SQL, rows)
+            counts[table] += len(rows)
+            rows.clear()
+
+    with conn:  # one transaction; rolled back as a whole on error
+        for rec in records:
+            for table, rows in batches.items():
+                rows.extend(rows_for_table(table, rec, now_iso))
+                if len(rows) >= batch_size:
+                    flush(table)
+        for table in tables:
+            flush(table)
+    return counts
+
+
+# --- parallel mode: one staging database per worker process, merged with ATTACH -------
+
+# SQLite attaches at most 10 databases by default; keep headroom
+MAX_STAGING = 8
+
+
+def plan_staging_units(raw_paths: list[Path], workers: int) -> list[list[tuple[str, tuple[str, ...]]]]:
+    """
+    Split the dimension build into at most `workers` process-sized buckets.
+
+    With at least as many snapshots as workers each bucket takes whole snapshots, so every
+    file is parsed once. Otherwise work is cut per (snapshot, dimension) so that, e.g., a
+    single full-CIViC snapshot is built as one dimension per process.
+    """
+    workers = max(1, min(workers, MAX_STAGING))
+    if len(raw_paths) >= workers:
+        units = [(str(p), tuple(DIMENSIONS)) for p in raw_paths]
+    else:
+        units = [(str(p), (table,)) for p in raw_paths for table in DIMENSIONS]
+    buckets: list[list[tuple[str, tuple[str, ...]]]] = [[] for _ in range(min(workers, len(units)))]
+    for i, unit in enumerate(units):
+        buckets[i % len(buckets)].append(unit)
+    return buckets
+
+
+def build_staging(staging_path: str, units: list[tuple[str, tuple[str, ...]]], now_iso: str,
+                  batch_size: int = BATCH_SIZE) -> dict[str, int]:
+    # Worker process entry point: build the requested dimensions into a private staging file
+    conn = sqlite3.connect(staging_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        config.create_schema(conn, with_indexes=False)
+        counts: dict[str, int] = {}
+        for raw_path, tables in units:
+            loaded = load_dimension_records(conn, config.iter_raw_evidence(Path(raw_path)), batch_size,
+                                            tables=tables, now_iso=now_iso)
+            for table, n in loaded.items():
+                counts[table] = counts.get(table, 0) + n
+        return counts
+    finally:
+        conn.close()
+
+
+def _natural_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    surrogate = {key_col for dim_table, key_col, _ in KINDS.values() if dim_table == table}
+    return [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})") if row[1] not in surrogate]
+
+
+def merge_staging(conn: sqlite3.Connection, staging_paths: list[Path]) -> None:
+    # ATTACH is not allowed inside a transaction: attach everything, merge in one, then detach
+    conn.commit()
+    aliases = []
+    try:
+        for i, path in enumerate(staging_paths):
+            alias = f"stage{i}"
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(path),))
+            aliases.append(alias)
+        with conn:
+            for table in DIMENSIONS:
+                # Surrogate keys are per staging file: leave them out so main allocates its own
+                cols = ", ".join(_natural_columns(conn, table))
+                for alias in aliases:
+                    conn.execute(f"INSERT OR IGNORE INTO main.{table} ({cols}) SELECT {cols} FROM {alias}.{table}")
+    finally:
+        for alias in aliases:
+            conn.execute(f"DETACH DATABASE {alias}")
+
+
+def load_dimensions_parallel(conn: sqlite3.Connection, raw_paths: list[Path], workers: int = 4,
+                             staging_dir: Path | None = None) -> dict[str, int]:
+    """
+    Build the dimension tables in worker processes and merge them into `conn`.
+
+    Args:
+        conn (sqlite3.Connection): Destination connection; the schema must exist.
+        raw_paths (list[Path]): Raw snapshots (e.g. one per gene shard); missing files are skipped.
+        workers (int): Worker processes (capped at MAX_STAGING staging databases).
+        staging_dir (Path | None): Where staging files go; a temporary directory by default.
+
+    Returns:
+        dict[str, int]: Rows offered per table across all workers.
+    """
+    raw_paths = [Path(p) for p in raw_paths if Path(p).exists()]
+    counts = {table: 0 for table in DIMENSIONS}
+    if not raw_paths:
+        return counts
+    buckets = plan_staging_units(raw_paths, workers)
+    now_iso = civic_dim_evidence_create.utc_now_iso()
+
+    with tempfile.TemporaryDirectory(prefix="alkfred-stage-", dir=staging_dir) as tmp:
+        staging_paths = [Path(tmp) / f"stage{i}.sqlite" for i in range(len(buckets))]
+        # spawn, not fork: the build pipeline calls this from a thread pool
+        with ProcessPoolExecutor(max_workers=len(buckets), mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(build_staging, str(path), units, now_iso)
+                       for path, units in zip(staging_paths, buckets)]
+            for fut in futures:
+                for table, n in fut.result().items():
+                    counts[table] += n
+        merge_staging(conn, staging_paths)
+
+    logger.info("Dimensions merged from %d staging databases: %s", len(staging_paths),
+                ", ".join(f"{table}={n}" for table, n in counts.items()))
+    return counts
+
+
+def main(db_path: Path = DB_PATH, raw_path: Path = JSON_PATH):
+    conn = config.get_conn(db_path)
+    try:
+        load_dimensions(conn, Path(raw_path))
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
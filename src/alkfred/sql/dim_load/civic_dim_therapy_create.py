@@ -1,66 +1,43 @@
-import json
 import logging
-
 from pathlib import Path
 import uuid
-from utils import normalize_label
+from alkfred.text import normalize_label
 from alkfred import config
 
 DB_PATH = config.default_db_path()
-JSON_PATH = Path("data/curated_resistance_db.json")  
+JSON_PATH = config.data_dir() / "civic_raw_evidence_db.json"
 UUID_NAMESPACE = uuid.UUID("00000000-0000-0000-0000-000000000000")
 
-
-
-        
-
-def main():
-
-    DB_PATH = config.default_db_path()
-    JSON_PATH = Path("data/civic_raw_evidence_db.json")  
-
-    logger = logging.getLogger(__name__)
-
-    conn = config.get_conn(DB_PATH)
-    cur = conn.cursor()
-
-
-    logger.info("Table dim_therapy created or already exists in %s", DB_PATH)
-
-    #load raw civic json 
-    data_dict = config.raw_json_list_to_dict(JSON_PATH)
-
-    # Collect rows (ncitid, label, synonyms_json, rxnorm_id)
-    rows_therapy = []
-    
-
-    for rec in data_dict.values():
-                               
-        for t in rec.get("therapies", []):          # list of {"name":..., "ncit_id":...}
-            ncit_id = t.get("ncitId")
-            label_display = t.get("name","")
-            label_therapy_norm = normalize_label(label_display)
-            if ncit_id:
-                seed = f"therapy|{ncit_id}"
-            else:
-                seed = f"therapy|{label_therapy_norm}" 
-            therapy_id = str(uuid.uuid5(UUID_NAMESPACE, seed))
-            if label_therapy_norm == "":
-                continue
-            
-            if not label_display or not label_therapy_norm:
-                continue                            # skip malformed entries
-            rows_therapy.append((therapy_id, ncit_id, label_display, label_therapy_norm, "[]", None, 0, None, None))  # synonyms/rxnorm unknown for now
-        
-    
-    # Bulk insert
-    cur.executemany(
-        "INSERT OR IGNORE INTO dim_therapy(therapy_id, ncit_id, label_display, label_therapy_norm, synonyms_json, rxnorm_id, id_combo, combo_parts_json, class_ids_json) VALUES (?,?,?,?,?,?,?,?,?)",
-        rows_therapy
-    )
-
+INSERT_SQL = "INSERT OR IGNORE INTO dim_therapy(therapy_id, ncit_id, label_display, label_therapy_norm, synonyms_json, rxnorm_id, id_combo, combo_parts_json, class_ids_json) VALUES (?,?,?,?,?,?,?,?,?)"
+
+logger = logging.getLogger(__name__)
+
+
+def rows_from_record(rec: dict) -> list[tuple]:
+    # Collect rows (ncitid, label, synonyms_json, rxnorm_id); synonyms/rxnorm unknown for now
+    rows = []
+    for t in rec.get("therapies") or []:          # list of {"name":..., "ncitId":...}
+        ncit_id = t.get("ncitId")
+        label_display = t.get("name", "")
+        label_therapy_norm = normalize_label(label_display or "")
+        if not label_display or not label_therapy_norm:
+            continue                            # skip malformed entries
+        if ncit_id:
+            seed = f"therapy|{ncit_id}"
+        else:
+            seed = f"therapy|{label_therapy_norm}"
+        therapy_id = str(uuid.uuid5(UUID_NAMESPACE, seed))
+        rows.append((therapy_id, ncit_id, label_display, label_therapy_norm, "[]", None, 0, None, None))
+    return rows
+
+
+def main(db_path: Path = DB_PATH, raw_path: Path = JSON_PATH):
+    conn = config.get_conn(db_path)
+    rows_therapy = [row for rec in config.iter_raw_evidence(raw_path) for row in rows_from_record(rec)]
+    conn.executemany(INSERT_SQL, rows_therapy)
     conn.commit()
-
     conn.close()
+    logger.info("Loaded %d dim_therapy rows into %s", len(rows_therapy), db_path)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,12 +2,12 @@
 from __future__ import annotations
 
 import sqlite3
-import uuid
+from pathlib import Path
 from datetime import datetime, timezone
 from alkfred import config
+from alkfred.sql.query_evidence_create import refresh_query_evidence
 
 DB_PATH = config.default_db_path()
-UUID_NAMESPACE = uuid.UUID("00000000-0000-0000-0000-000000000000")
 RUN_ID = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
 
 
@@ -15,49 +15,115 @@ def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="seconds")
 
 
-def main():
-    conn = config.get_conn(DB_PATH.as_posix())
-    conn.execute("PRAGMA foreign_keys = ON")
-    cur = conn.cursor()
+def build_facts(db_path: Path = DB_PATH, bulk: bool = False) -> int:
+    conn = config.get_conn(Path(db_path).as_posix())
+    if bulk:
+        config.apply_bulk_pragmas(conn)
+    else:
+        conn.execute("PRAGMA foreign_keys = ON")
+    try:
+        inserted = insert_facts(conn)
+        refresh_query_evidence(conn)
+        return inserted
+    finally:
+        conn.close()
+
+
+FACT_SOURCE_SQL = """
+    FROM evidence_link el
+    JOIN dim_evidence     de ON de.eid        = el.eid
+    JOIN dim_disease      d  ON d.disease_key = el.disease_key
+    JOIN dim_gene_variant v  ON v.variant_key = el.variant_key
+    JOIN dim_therapy      t  ON t.therapy_key = el.therapy_key
+"""
+
+# fact_id is an INTEGER PRIMARY KEY allocated on insert; uq_fact_tuple keeps re-runs idempotent
+FACT_INSERT_SQL = """
+    INSERT OR IGNORE INTO fact_evidence
+        (eid, variant_key, disease_key, therapy_key, direction, significance, created_at_utc, run_id)
+    VALUES (?,?,?,?,?,?,?,?)
+"""
+
+STREAM_BATCH = 5000
 
+
+def _require_tables(cur: sqlite3.Cursor) -> None:
     # sanity: required tables
     for t in ("dim_disease", "dim_gene_variant", "dim_therapy", "dim_evidence", "evidence_link", "fact_evidence"):
         cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (t,))
         if not cur.fetchone():
             raise RuntimeError(f"Missing required table: {t}")
 
-    # Build facts from link + dims, preserving evidence filters
-    cur.execute("""
-        SELECT el.eid, el.doid, el.variant_id, el.therapy_id,
+
+def _scope_sql(eid_table: str | None) -> str:
+    # Optional restriction to the eids listed in a (temp) table with an `eid` column
+    return f"WHERE el.eid IN (SELECT eid FROM {eid_table})" if eid_table else ""
+
+
+def _insert_facts_set_based(conn: sqlite3.Connection, now_iso: str, eid_table: str | None = None) -> int:
+    # One INSERT ... SELECT over integer keys; no rows cross into Python
+    before = conn.total_changes
+    conn.execute(f"""
+        INSERT OR IGNORE INTO fact_evidence
+            (eid, variant_key, disease_key, therapy_key, direction, significance, created_at_utc, run_id)
+        SELECT el.eid, el.variant_key, el.disease_key, el.therapy_key,
+               UPPER(COALESCE(de.direction,'')),
+               UPPER(COALESCE(de.significance,'')),
+               ?, ?
+        {FACT_SOURCE_SQL}
+        {_scope_sql(eid_table)}
+    """, (now_iso, RUN_ID))
+    return conn.total_changes - before
+
+
+def _insert_facts_streaming(conn: sqlite3.Connection, now_iso: str, batch_size: int = STREAM_BATCH,
+                            eid_table: str | None = None) -> int:
+    # Fallback: walk the join with a cursor and insert in fixed-size batches, memory stays flat
+    read = conn.cursor()
+    write = conn.cursor()
+    read.execute(f"""
+        SELECT el.eid, el.variant_key, el.disease_key, el.therapy_key,
                UPPER(COALESCE(de.direction,''))   AS direction,
                UPPER(COALESCE(de.significance,'')) AS significance
-        FROM evidence_link el
-        JOIN dim_evidence   de ON de.eid        = el.eid
-        JOIN dim_disease    d  ON d.doid        = el.doid
-        JOIN dim_gene_variant v ON v.variant_id = el.variant_id
-        JOIN dim_therapy    t  ON t.therapy_id  = el.therapy_id
+        {FACT_SOURCE_SQL}
+        {_scope_sql(eid_table)}
     """)
-    rows = cur.fetchall()
-    if not rows:
-        print("No eligible rows found (check evidence_link and dim_evidence filters).")
-        conn.close()
-        return
+    before = conn.total_changes
+    while True:
+        rows = read.fetchmany(batch_size)
+        if not rows:
+            break
+        write.executemany(FACT_INSERT_SQL, [tuple(row) + (now_iso, RUN_ID) for row in rows])
+    return conn.total_changes - before
 
-    payload = []
-    now_iso = utc_now_iso()
-    for eid, doid, variant_id, therapy_id, direction, significance in rows:
-        # deterministic PK over the tuple
-        key = f"{eid}|{doid}|{variant_id}|{therapy_id}"
-        fact_id = str(uuid.uuid5(UUID_NAMESPACE, key))
-        payload.append((fact_id, eid, variant_id, doid, therapy_id, direction, significance, now_iso, RUN_ID))
 
-    cur.executemany("""
-        INSERT OR IGNORE INTO fact_evidence
-            (fact_id, eid, variant_id, doid, therapy_id, direction, significance, created_at_utc, run_id)
-        VALUES (?,?,?,?,?,?,?,?,?)
-    """, payload)
+def insert_facts(conn: sqlite3.Connection, set_based: bool = True, eid_table: str | None = None) -> int:
+    """
+    Build fact_evidence from evidence_link + dims on an open connection.
+
+    Args:
+        conn (sqlite3.Connection): Open connection; the caller owns it.
+        set_based (bool): Use a single INSERT ... SELECT; False streams the join through
+            Python in batches.
+        eid_table (str | None): Only build facts for eids listed in this table (incremental builds).
+
+    Returns:
+        int: Fact rows inserted.
+    """
+    _require_tables(conn.cursor())
+    now_iso = utc_now_iso()
+    if set_based:
+        inserted = _insert_facts_set_based(conn, now_iso, eid_table)
+    else:
+        inserted = _insert_facts_streaming(conn, now_iso, eid_table=eid_table)
     conn.commit()
-    conn.close()
+    if not inserted and eid_table is None:
+        print("No eligible rows found (check evidence_link and dim_evidence filters).")
+    return inserted
+
+
+def main():
+    build_facts(DB_PATH)
 
 
 if __name__ == "__main__":
@@ -3,14 +3,20 @@ from __future__ import annotations
 import re
 import json
 import logging
+import multiprocessing
+import queue
 import sqlite3
+import threading
 import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterable
 
-from utils import normalize_label
+from alkfred.text import normalize_label
 import api_calls  # expects: fetch_civic_molecular_profile(mp_name) -> list[{"variant": str, "ca_id": str|None}]
 from alkfred import config
+from alkfred.sql.keys import KeyRegistry
 
 # ----------------------------
 # Config
@@ -33,7 +39,7 @@ def utc_now_iso() -> str:
 
 LINK_INSERT_SQL = """
 INSERT OR IGNORE INTO evidence_link
-  (eid, doid, variant_id, therapy_id, mp_name, therapy_label, created_at_utc, run_id)
+  (eid, disease_key, variant_key, therapy_key, mp_name, therapy_label, created_at_utc, run_id)
 VALUES (?,?,?,?,?,?,?,?)
 """
 
@@ -67,20 +73,30 @@ def preload_dim_caches(cur: sqlite3.Cursor):
 
 
 # ----------------------------
-# Minimal, defensive upserts (dimensions)
+# Two-phase resolver: collect missing dimension rows in memory, write them in bulk
 # ----------------------------
-def upsert_disease_min(cur: sqlite3.Cursor, doid: str, label_display: str | None, seen_doid: set[str]) -> None:
-    if not doid or doid in seen_doid:
-        return
-    label_display = (label_display or "").strip() or doid
-    label_disease_norm = normalize_label(label_display)
-    cur.execute(
-        "INSERT OR IGNORE INTO dim_disease "
-        "(doid, label_display, label_disease_norm, synonyms_json, mondo_id, ncit_id, lineage_json) "
-        "VALUES (?, ?, ?, '[]', NULL, NULL, '[]')",
-        (doid, label_display, label_disease_norm),
-    )
-    seen_doid.add(doid)
+DISEASE_INSERT_SQL = (
+    "INSERT OR IGNORE INTO dim_disease "
+    "(doid, label_display, label_disease_norm, synonyms_json, mondo_id, ncit_id, lineage_json) "
+    "VALUES (?, ?, ?, '[]', NULL, NULL, '[]')"
+)
+THERAPY_INSERT_SQL = (
+    "INSERT OR IGNORE INTO dim_therapy "
+    "(therapy_id, ncit_id, label_display, label_therapy_norm, synonyms_json, rxnorm_id, id_combo, combo_parts_json, class_ids_json) "
+    "VALUES (?, ?, ?, ?, '[]', NULL, 0, NULL, NULL)"
+)
+# Attach an NCIt id to a therapy first seen by label only; OR IGNORE since ncit_id is UNIQUE
+THERAPY_NCIT_UPDATE_SQL = "UPDATE OR IGNORE dim_therapy SET ncit_id = ? WHERE therapy_id = ? AND ncit_id IS NULL"
+VARIANT_INSERT_SQL = (
+    "INSERT OR IGNORE INTO dim_gene_variant "
+    "(variant_id, civic_ca_id, hgnc_id, gene_symbol, label_display, label_gene_variant_norm, hgvs_p, hgvs_c, confidence) "
+    "VALUES (?, ?, NULL, ?, ?, ?, NULL, NULL, NULL)"
+)
+EVIDENCE_INSERT_SQL = (
+    "INSERT OR IGNORE INTO dim_evidence "
+    "(eid, source_json, direction, significance, evidence_level, evidence_type, rating, status, pmids_json, pub_year, description, created_at_utc, updated_at_utc) "
+    "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)"
+)
 
 
 def _therapy_uuid_seed(ncit_id: str | None, label_norm: str) -> str:
@@ -88,160 +104,203 @@ def _therapy_uuid_seed(ncit_id: str | None, label_norm: str) -> str:
     return f"therapy|{ncit_id}" if ncit_id else f"therapy|{label_norm}"
 
 
+def _variant_uuid_seed(gene_symbol: str, label_norm: str) -> str:
+    # Gene-scoped: without a CA id the label alone is ambiguous across genes
+    return f"variant|{normalize_label(gene_symbol)}|{label_norm}"
 
 
-def upsert_therapy_min(
-    cur: sqlite3.Cursor,
-    name: str,
-    ncit_id: str | None,
-    therapy_id_by_ncit: dict[str, str],
-    therapy_id_by_norm: dict[str, str],
-) -> str | None:
-    """
-    Always returns the internal therapy_id (or None on hard failure).
-    Resolution order:
-      1) by ncit_id via cache
-      2) by normalized label via cache (+ attach ncit if newly provided)
-      3) insert new (deterministic therapy_id via uuid5 over seed)
-    """
-
-    label_display = (name or "").strip()
-    label_norm = normalize_label(label_display)
-    if not label_norm:
-        return None
-
-    # 1) Found by NCIt
-    if ncit_id and ncit_id in therapy_id_by_ncit:
-        return therapy_id_by_ncit[ncit_id]
-
-    # 2) Found by normalized label
-    if label_norm in therapy_id_by_norm:
-        therapy_id = therapy_id_by_norm[label_norm]
-        # Attach NCIt if we have it now and it's not set yet
-        if ncit_id:
-            cur.execute("SELECT ncit_id FROM dim_therapy WHERE therapy_id = ?", (therapy_id,))
-            row = cur.fetchone()
-            if row and (row[0] is None):
-                cur.execute("UPDATE dim_therapy SET ncit_id = ? WHERE therapy_id = ?", (ncit_id, therapy_id))
-            therapy_id_by_ncit[ncit_id] = therapy_id
-        return therapy_id
-
-    # 3) Insert new
-    seed = _therapy_uuid_seed(ncit_id, label_norm)
-    therapy_id = str(uuid.uuid5(UUID_NAMESPACE, seed))
-    cur.execute(
-        "INSERT OR IGNORE INTO dim_therapy "
-        "(therapy_id, ncit_id, label_display, label_therapy_norm, synonyms_json, rxnorm_id, id_combo, combo_parts_json, class_ids_json) "
-        "VALUES (?, ?, ?, ?, '[]', NULL, 0, NULL, NULL)",
-        (therapy_id, ncit_id, label_display, label_norm),
-    )
-    if ncit_id:
-        therapy_id_by_ncit[ncit_id] = therapy_id
-    therapy_id_by_norm[label_norm] = therapy_id
-    return therapy_id
-
 def _looks_like_gene(s: str | None) -> bool:
         return bool(s and re.fullmatch(r"[A-Z0-9]{2,}", s))
 
-def upsert_variant_min(
-    cur: sqlite3.Cursor,
-    variant_label: str | None,
-    civic_ca_id: str | None,
-    variant_ids: set[str],
-    gene_symbol_default: str | None,
-) -> str | None:
+
+class DimResolver:
     """
-    Returns variant_id. Uses CIViC CA if available; otherwise deterministic UUIDv5 over normalized label.
-    Ensures a row exists in dim_gene_variant.
+    Resolves evidence-node fragments to dimension keys without touching the database.
+
+    Keys already present in the dimension tables come from the preloaded caches; anything
+    new is queued as a row (deduplicated by key) and written later by `flush()` with one
+    executemany per table.
     """
-    gene_from_label = (variant_label or "").strip().split(" ")[0].upper()
-    gene_candidate = gene_from_label if _looks_like_gene(gene_from_label) else None
-
-    # prefer explicit default (from component or --oncogene) over label guess
-    gene_symbol = (gene_symbol_default or gene_candidate or "").strip().upper()
-    if not _looks_like_gene(gene_symbol):
-        return None
-    label_display = (variant_label or "").strip()
-    label_norm = normalize_label(label_display)
-    if civic_ca_id:
-        variant_id = civic_ca_id
-    elif label_norm:
-        variant_id = str(uuid.uuid5(UUID_NAMESPACE, f"variant|{label_norm}"))
-    else:
-        return None
 
-    if variant_id in variant_ids:
+    def __init__(self, caches: tuple, now_iso: str):
+        # caches: the tuple returned by preload_dim_caches(); copied so a shared snapshot stays read-only
+        seen_doid, therapy_id_by_ncit, therapy_id_by_norm, variant_ids, evidence_eids = caches
+        self.seen_doid = set(seen_doid)
+        self.therapy_id_by_ncit = dict(therapy_id_by_ncit)
+        self.therapy_id_by_norm = dict(therapy_id_by_norm)
+        self.variant_ids = set(variant_ids)
+        self.evidence_eids = set(evidence_eids)
+        self.now_iso = now_iso
+        self.new_diseases: dict[str, tuple] = {}
+        self.new_therapies: dict[str, tuple] = {}
+        self.ncit_updates: dict[str, str] = {}  # therapy_id -> ncit_id
+        self.new_variants: dict[str, tuple] = {}
+        self.new_evidence: dict[int, tuple] = {}
+
+    def disease(self, doid: str, label_display: str | None) -> None:
+        if not doid or doid in self.seen_doid:
+            return
+        label_display = (label_display or "").strip() or doid
+        self.new_diseases[doid] = (doid, label_display, normalize_label(label_display))
+        self.seen_doid.add(doid)
+
+    def therapy(self, name: str, ncit_id: str | None) -> str | None:
+        """
+        Always returns the internal therapy_id (or None on hard failure).
+        Resolution order:
+          1) by ncit_id via cache
+          2) by normalized label via cache (+ attach ncit if newly provided)
+          3) queue new (deterministic therapy_id via uuid5 over seed)
+        """
+        label_display = (name or "").strip()
+        label_norm = normalize_label(label_display)
+        if not label_norm:
+            return None
+
+        # 1) Found by NCIt
+        if ncit_id and ncit_id in self.therapy_id_by_ncit:
+            return self.therapy_id_by_ncit[ncit_id]
+
+        # 2) Found by normalized label
+        if label_norm in self.therapy_id_by_norm:
+            therapy_id = self.therapy_id_by_norm[label_norm]
+            if ncit_id:
+                queued = self.new_therapies.get(therapy_id)
+                if queued is not None and queued[1] is None:
+                    self.new_therapies[therapy_id] = (therapy_id, ncit_id) + queued[2:]
+                else:
+                    self.ncit_updates.setdefault(therapy_id, ncit_id)
+                self.therapy_id_by_ncit[ncit_id] = therapy_id
+            return therapy_id
+
+        # 3) New therapy
+        therapy_id = str(uuid.uuid5(UUID_NAMESPACE, _therapy_uuid_seed(ncit_id, label_norm)))
+        self.new_therapies.setdefault(therapy_id, (therapy_id, ncit_id, label_display, label_norm))
+        if ncit_id:
+            self.therapy_id_by_ncit[ncit_id] = therapy_id
+        self.therapy_id_by_norm[label_norm] = therapy_id
+        return therapy_id
+
+    def variant(self, variant_label: str | None, civic_ca_id: str | None, gene_symbol_default: str | None) -> str | None:
+        """
+        Returns variant_id. Uses CIViC CA if available; otherwise deterministic UUIDv5 over gene + normalized
+        label, so generic names ("Fusion", "Amplification") stay apart across genes.
+        """
+        gene_from_label = (variant_label or "").strip().split(" ")[0].upper()
+        gene_candidate = gene_from_label if _looks_like_gene(gene_from_label) else None
+
+        # prefer explicit default (from component or --oncogene) over label guess
+        gene_symbol = (gene_symbol_default or gene_candidate or "").strip().upper()
+        if not _looks_like_gene(gene_symbol):
+            return None
+        label_display = (variant_label or "").strip()
+        label_norm = normalize_label(label_display)
+        if civic_ca_id:
+            variant_id = civic_ca_id
+        elif label_norm:
+            variant_id = str(uuid.uuid5(UUID_NAMESPACE, _variant_uuid_seed(gene_symbol, label_norm)))
+        else:
+            return None
+
+        if variant_id not in self.variant_ids:
+            self.new_variants[variant_id] = (variant_id, civic_ca_id, gene_symbol,
+                                             label_display or variant_id, label_norm or variant_id)
+            self.variant_ids.add(variant_id)
         return variant_id
 
-    cur.execute(
-        "INSERT OR IGNORE INTO dim_gene_variant "
-        "(variant_id, civic_ca_id, hgnc_id, gene_symbol, label_display, label_gene_variant_norm, hgvs_p, hgvs_c, aliases_json, confidence) "
-        "VALUES (?, ?, NULL, ?, ?, ?, NULL, NULL, '[]', NULL)",
-        (variant_id, civic_ca_id, gene_symbol_default, label_display or variant_id, label_norm or variant_id),
-    )
-    variant_ids.add(variant_id)
-    return variant_id
-
-
-def upsert_dim_evidence_min(cur: sqlite3.Cursor, ei: dict, evidence_eids: set[int]) -> None:
-    eid = ei.get("id")
-    if eid is None:
-        return
-    eid = int(eid)
-    if eid in evidence_eids:
-        return
-
-    src = ei.get("source") or {}
-    source_json = json.dumps(src)
-    direction   = (ei.get("evidenceDirection") or "").strip().upper()
-    significance= (ei.get("significance") or "").strip().upper()
-    ev_level = (ei.get("evidenceLevel") or "").strip().upper()
-    ev_type = (ei.get("evidenceType") or "").strip().upper()
-    rating = ei.get("evidenceRating")
-    status = (ei.get("status") or "").strip().upper() or None
-    pmids = []
-    if src.get("citationId"):
-        pmids.append(str(src.get("citationId")))
-    pmids_json = json.dumps(pmids)
-    pub_year = src.get("publicationYear") or ei.get("publicationYear")
-    description = (ei.get("description") or "").strip() or None
-    now = utc_now_iso()
-
-    cur.execute(
-        "INSERT OR IGNORE INTO dim_evidence "
-        "(eid, source_json, direction, significance, evidence_level, evidence_type, rating, status, pmids_json, pub_year, description, created_at_utc, updated_at_utc) "
-        "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
-        (eid, source_json, direction, significance, ev_level, ev_type, rating, status, pmids_json, pub_year, description, now, None),
-    )
-    evidence_eids.add(eid)
-
-def create_links(db_path = config.default_db_path(), raw_path= Path("data/civic_raw_evidence_db.json"), oncogene = "") -> None:
-    
+    def evidence(self, ei: dict) -> None:
+        eid = ei.get("id")
+        if eid is None:
+            return
+        eid = int(eid)
+        if eid in self.evidence_eids:
+            return
+
+        src = ei.get("source") or {}
+        pmids = [str(src["citationId"])] if src.get("citationId") else []
+        self.new_evidence[eid] = (
+            eid,
+            json.dumps(src),
+            (ei.get("evidenceDirection") or "").strip().upper(),
+            (ei.get("significance") or "").strip().upper(),
+            (ei.get("evidenceLevel") or "").strip().upper(),
+            (ei.get("evidenceType") or "").strip().upper(),
+            ei.get("evidenceRating"),
+            (ei.get("status") or "").strip().upper() or None,
+            json.dumps(pmids),
+            src.get("publicationYear") or ei.get("publicationYear"),
+            (ei.get("description") or "").strip() or None,
+            self.now_iso,
+            None,
+        )
+        self.evidence_eids.add(eid)
+
+    def take_rows(self) -> dict[str, list[tuple]]:
+        # Hand over (and forget) everything queued so far, as plain picklable lists
+        rows = {
+            "dim_evidence": list(self.new_evidence.values()),
+            "dim_disease": list(self.new_diseases.values()),
+            "dim_therapy": list(self.new_therapies.values()),
+            "ncit_updates": [(ncit, tid) for tid, ncit in self.ncit_updates.items()],
+            "dim_gene_variant": list(self.new_variants.values()),
+        }
+        for queued in (self.new_evidence, self.new_diseases, self.new_therapies, self.ncit_updates, self.new_variants):
+            queued.clear()
+        return rows
+
+    def flush(self, cur: sqlite3.Cursor) -> dict[str, int]:
+        return write_dim_rows(cur, self.take_rows())
+
+
+def write_dim_rows(cur: sqlite3.Cursor, rows: dict[str, list[tuple]]) -> dict[str, int]:
+    # Phase 2: a handful of executemany calls instead of one statement per node
+    cur.executemany(EVIDENCE_INSERT_SQL, rows["dim_evidence"])
+    cur.executemany(DISEASE_INSERT_SQL, rows["dim_disease"])
+    cur.executemany(THERAPY_INSERT_SQL, rows["dim_therapy"])
+    cur.executemany(THERAPY_NCIT_UPDATE_SQL, rows["ncit_updates"])
+    cur.executemany(VARIANT_INSERT_SQL, rows["dim_gene_variant"])
+    return {table: len(rows[table]) for table in ("dim_evidence", "dim_disease", "dim_therapy", "dim_gene_variant")}
+
+
+def create_links(db_path = config.default_db_path(), raw_path= Path("data/civic_raw_evidence_db.json"), oncogene = "",
+                 bulk: bool = False) -> int:
+    # bulk: tuned pragmas, FKs checked once by the caller, and a single commit at the end
     if not raw_path.exists():
         raise FileNotFoundError(f"Raw CIViC JSON not found: {raw_path}")
-    with raw_path.open("r", encoding="utf-8") as f:
-        nodes = json.load(f)
-   
-    if not isinstance(nodes, list):
-        raise ValueError("civic_raw_evidence_db.json must be a list of evidence nodes")
+    nodes = config.load_from_json(raw_path)
 
     conn = config.get_conn(db_path.as_posix())
-    conn.execute("PRAGMA foreign_keys = ON")
-    cur = conn.cursor()
+    if bulk:
+        config.apply_bulk_pragmas(conn)
+    else:
+        conn.execute("PRAGMA foreign_keys = ON")
+    try:
+        return insert_links(conn, nodes, oncogene, bulk=bulk)
+    finally:
+        conn.close()
 
-    # Caches from dims
-    seen_doid, id_by_ncit, id_by_norm, variant_ids, evidence_eids = preload_dim_caches(cur)
 
-    components_cache: dict[str, list[dict]] = {}
+def _has_link_fields(ei: dict) -> bool:
+    # Evidence without a disease, molecular profile or therapy yields no link
+    return bool((ei.get("disease") or {}).get("doid") and ((ei.get("molecularProfile") or {}).get("name") or "").strip()
+                and ei.get("therapies"))
 
-    inserted_links = 0
-    skipped_direction = 0
-    skipped_missing_bits = 0
-    skipped_no_therapy_match = 0
-    skipped_no_components = 0
 
-    batch: list[tuple] = []
-    BATCH = 500
+def resolve_nodes(resolver: DimResolver, nodes: Iterable[dict], oncogene: str = "") -> tuple[list[tuple], dict[str, int]]:
+    """
+    Phase 1: resolve evidence nodes to link tuples entirely in memory.
+
+    Args:
+        resolver (DimResolver): Dimension caches; missing dimension rows are queued on it.
+        nodes (Iterable[dict]): Parsed raw CIViC evidence nodes.
+        oncogene (str): Gene symbol used for variants whose label carries none.
+
+    Returns:
+        tuple[list[tuple], dict[str, int]]: Link tuples by natural id (see KeyRegistry.link_keys)
+        and skip counters.
+    """
+    skipped = {"direction": 0, "missing": 0, "no_therapy": 0, "no_components": 0}
+    links: list[tuple] = []
 
     for ei in nodes:
         try:
@@ -250,86 +309,231 @@ def create_links(db_path = config.default_db_path(), raw_path= Path("data/civic_
                 continue
             eid = int(eid)
 
-            disease = ei.get("disease") or {}
-            doid = disease.get("doid")
-            mp = ei.get("molecularProfile") or {}
-            mp_id = mp.get("id")
-            mp_name = (mp.get("name") or "").strip()
-            therapies = ei.get("therapies") or []
-
-            mp_key = mp_id if mp_id is not None else mp_name
-
-            if not doid or not mp_name or not therapies:
-                skipped_missing_bits += 1
+            if not _has_link_fields(ei):
+                skipped["missing"] += 1
                 continue
+            disease = ei["disease"]
+            doid = disease["doid"]
+            mp = ei["molecularProfile"]
+            mp_name = mp["name"].strip()
+            therapies = ei["therapies"]
 
             # Ensure minimal dims exist
-            upsert_dim_evidence_min(cur, ei, evidence_eids)
-            upsert_disease_min(cur, doid, disease.get("name"), seen_doid)
+            resolver.evidence(ei)
+            resolver.disease(doid, disease.get("name"))
 
             # Resolve therapy → therapy_id (always)
             resolved_therapies: list[tuple[str, str]] = []  # (therapy_id, display_name)
             for t in therapies:
                 name = (t.get("name") or "").strip()
                 ncit = t.get("ncitId") or t.get("ncit_id")
-                therapy_id = upsert_therapy_min(cur, name, ncit, id_by_ncit, id_by_norm)
+                therapy_id = resolver.therapy(name, ncit)
                 if therapy_id:
                     resolved_therapies.append((therapy_id, name))
             if not resolved_therapies:
-                skipped_no_therapy_match += 1
+                skipped["no_therapy"] += 1
                 continue
 
-            # Resolve molecular profile → component variants
-            if mp_key not in components_cache:
-                try:
-                    if mp_id is not None:
-                        # new, ID-based fetch (robust)
-                        components_cache[mp_key] = mp or []
-                    else:
-                        # fallback, name-based (legacy)
-                        components_cache[mp_key] = mp or []
-                except Exception as e:
-                    log.debug("Component fetch failed for %r: %s", mp_key, e)
-                    components_cache[mp_key] = []
-
-            comps = components_cache[mp_key]
-            if not comps:
-                skipped_no_components += 1
+            # Molecular profile → component variants (carried inline by the evidence query)
+            variants = mp.get("variants") or []
+            if not variants:
+                skipped["no_components"] += 1
                 continue
 
             # Ensure variant rows exist, then cross-product links
-            # for c in comps:
-            for v in comps.get("variants" or []):
+            for v in variants:
                 vlabel = (v.get("name") or "").strip()
                 ca_id = v.get("alleleRegistryId") or None
-                variant_id = upsert_variant_min(cur, vlabel, ca_id, variant_ids, gene_symbol_default=oncogene)
+                variant_id = resolver.variant(vlabel, ca_id, gene_symbol_default=oncogene)
                 if not variant_id:
                     continue
 
                 for therapy_id, disp_name in resolved_therapies:
-                    batch.append((eid, doid, variant_id, therapy_id, mp_name, disp_name, utc_now_iso(), RUN_ID))
-
-            # Batch insert
-            if len(batch) >= BATCH:
-                cur.executemany(LINK_INSERT_SQL, batch)
-                inserted_links += len(batch)
-                batch.clear()
-                conn.commit()
+                    links.append((eid, doid, variant_id, therapy_id, mp_name, disp_name, resolver.now_iso, RUN_ID))
 
         except Exception:
             log.exception("Error processing eid=%s", ei.get("id"))
 
-    # Flush remaining
-    if batch:
+    return links, skipped
+
+
+def _log_link_summary(inserted_links: int, skipped: dict[str, int]) -> None:
+    log.info("Inserted links: %d | skipped_direction=%d skipped_missing=%d skipped_no_therapy=%d skipped_no_components=%d",
+             inserted_links, skipped["direction"], skipped["missing"], skipped["no_therapy"], skipped["no_components"])
+
+
+def insert_links(conn: sqlite3.Connection, nodes: list[dict], oncogene: str = "", bulk: bool = False) -> int:
+    """
+    Resolve evidence nodes against the dimension tables and insert evidence_link rows.
+
+    Phase 1 walks the nodes and resolves every disease, therapy, variant and evidence id
+    in memory (DimResolver), collecting link tuples by natural id. Phase 2 writes the
+    missing dimension rows, maps natural ids to surrogate keys (KeyRegistry) and writes the
+    links with a few executemany calls.
+
+    Args:
+        conn (sqlite3.Connection): Open connection; the caller owns it.
+        nodes (list[dict]): Parsed raw CIViC evidence nodes.
+        oncogene (str): Gene symbol used for variants whose label carries none.
+        bulk (bool): Commit once at the end instead of every batch.
+
+    Returns:
+        int: Link rows offered to INSERT OR IGNORE.
+    """
+    if not isinstance(nodes, list):
+        raise ValueError("civic_raw_evidence_db.json must be a list of evidence nodes")
+    cur = conn.cursor()
+
+    resolver = DimResolver(preload_dim_caches(cur), utc_now_iso())
+    links, skipped = resolve_nodes(resolver, nodes, oncogene)
+
+    # Phase 2: dimension rows first (FKs, key allocation), then the links by integer key
+    written = resolver.flush(cur)
+    links = KeyRegistry().link_keys(conn, links)
+    inserted_links = 0
+    BATCH = 500
+    for start in range(0, len(links), BATCH):
+        batch = links[start:start + BATCH]
         cur.executemany(LINK_INSERT_SQL, batch)
         inserted_links += len(batch)
-        batch.clear()
+        if not bulk:
+            conn.commit()
+    conn.commit()
+
+    _log_link_summary(inserted_links, skipped)
+    log.debug("Dimension rows added while linking: %s", written)
+    return inserted_links
+
+
+# ----------------------------
+# Process-parallel mode: workers resolve eid shards, one writer thread owns the connection
+# ----------------------------
+WRITE_BATCH = 50_000   # links per writer transaction
+QUEUE_DEPTH = 4        # resolved shards waiting for the writer (backpressure on the workers)
+SHARDS_PER_WORKER = 4
+
+
+def resolve_therapies(caches: tuple, nodes: list[dict], now_iso: str) -> tuple[tuple, dict[str, list[tuple]]]:
+    """
+    Serial pre-pass of the parallel mode: settle every therapy id before the nodes are sharded.
+
+    A therapy met without its NCIt id in one shard and with it in another would otherwise get
+    a different therapy_id per worker; the second row loses on ncit_id UNIQUE and its links
+    would be dropped. Resolving all therapies in node order, as insert_links does, leaves
+    the workers nothing but cache hits.
+
+    Returns:
+        tuple[tuple, dict]: The caches with every therapy of `nodes` added, and the
+        dimension rows (new therapies, NCIt updates) to write before any shard.
+    """
+    resolver = DimResolver(caches, now_iso)
+    for ei in nodes:
+        if ei.get("id") is None or not _has_link_fields(ei):
+            continue
+        for t in ei["therapies"]:
+            resolver.therapy((t.get("name") or "").strip(), t.get("ncitId") or t.get("ncit_id"))
+    seen_doid, _, _, variant_ids, evidence_eids = caches
+    return ((seen_doid, resolver.therapy_id_by_ncit, resolver.therapy_id_by_norm, variant_ids, evidence_eids),
+            resolver.take_rows())
+
+
+def _resolve_shard(nodes: list[dict], caches: tuple, oncogene: str, now_iso: str):
+    # Worker process entry point: resolve one eid shard against the read-only cache snapshot
+    resolver = DimResolver(caches, now_iso)
+    links, skipped = resolve_nodes(resolver, nodes, oncogene)
+    return resolver.take_rows(), links, skipped
+
+
+def _link_writer(conn: sqlite3.Connection, q: queue.Queue, bulk: bool, state: dict) -> None:
+    # Drains resolved shards: each shard's dimension rows, then its links, in large transactions
+    cur = conn.cursor()
+    keys = KeyRegistry().load(conn)
+    pending = 0
+    while True:
+        item = q.get()
+        if item is None:
+            break
+        if state.get("error") is not None:
+            continue  # keep draining so the producer never blocks on a dead writer
+        try:
+            dim_rows, links = item
+            write_dim_rows(cur, dim_rows)
+            links = keys.link_keys(conn, links)
+            cur.executemany(LINK_INSERT_SQL, links)
+            state["links"] += len(links)
+            pending += len(links)
+            if pending >= WRITE_BATCH and not bulk:
+                conn.commit()
+                pending = 0
+        except Exception as exc:
+            state["error"] = exc
+            conn.rollback()
+    if state.get("error") is None:
         conn.commit()
 
-    log.info("Inserted links: %d | skipped_direction=%d skipped_missing=%d skipped_no_therapy=%d skipped_no_components=%d",
-             inserted_links, skipped_direction, skipped_missing_bits, skipped_no_therapy_match, skipped_no_components)
 
-    conn.close()
+def insert_links_parallel(conn: sqlite3.Connection, nodes: list[dict], oncogene: str = "", workers: int = 4,
+                          bulk: bool = False) -> int:
+    """
+    Same result as insert_links, with resolution spread over worker processes.
+
+    Therapies are resolved serially first (resolve_therapies), then nodes are sharded by
+    eid; each worker resolves its shard against a snapshot of preload_dim_caches() and
+    returns link tuples plus the dimension rows it found missing.
+    A single writer thread drains a bounded queue of those results into large
+    transactions. `conn` must allow use from another thread (check_same_thread=False).
+
+    Args:
+        conn (sqlite3.Connection): Open connection; the caller owns it.
+        nodes (list[dict]): Parsed raw CIViC evidence nodes.
+        oncogene (str): Gene symbol used for variants whose label carries none.
+        workers (int): Worker processes.
+        bulk (bool): Commit once at the end instead of every WRITE_BATCH links.
+
+    Returns:
+        int: Link rows offered to INSERT OR IGNORE.
+    """
+    if not isinstance(nodes, list):
+        raise ValueError("civic_raw_evidence_db.json must be a list of evidence nodes")
+    caches = preload_dim_caches(conn.cursor())
+    conn.commit()
+    now_iso = utc_now_iso()
+    caches, therapy_rows = resolve_therapies(caches, nodes, now_iso)
+
+    n_shards = max(1, workers * SHARDS_PER_WORKER)
+    shards: list[list[dict]] = [[] for _ in range(n_shards)]
+    for ei in nodes:
+        try:
+            key = int(ei.get("id"))
+        except (TypeError, ValueError):
+            key = 0
+        shards[key % n_shards].append(ei)
+
+    q: queue.Queue = queue.Queue(maxsize=QUEUE_DEPTH)
+    state = {"links": 0, "error": None}
+    writer = threading.Thread(target=_link_writer, args=(conn, q, bulk, state), name="link-writer", daemon=True)
+    writer.start()
+    skipped = {"direction": 0, "missing": 0, "no_therapy": 0, "no_components": 0}
+    try:
+        q.put((therapy_rows, []))  # ahead of every shard that links to them
+        # spawn, not fork: the build pipeline calls this from a thread pool
+        with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_resolve_shard, shard, caches, oncogene, now_iso) for shard in shards if shard]
+            for fut in as_completed(futures):
+                dim_rows, links, shard_skipped = fut.result()
+                for k, n in shard_skipped.items():
+                    skipped[k] += n
+                q.put((dim_rows, links))
+    finally:
+        q.put(None)
+        writer.join()
+    if state["error"] is not None:
+        raise state["error"]
+
+    _log_link_summary(state["links"], skipped)
+    return state["links"]
+
+
 # ----------------------------
 # Main populate
 # ----------------------------
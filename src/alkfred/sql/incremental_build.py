@@ -0,0 +1,192 @@
+"""
+Content-hash incremental rebuild.
+
+A full build offers every row to INSERT OR IGNORE, so evidence that changed upstream is
+never updated. Here each evidence item's content hash is kept in `build_state` and each
+dimension row's hash in `dim_row_hash`; only what moved is touched:
+
+  - dimension rows whose hash changed are upserted (ON CONFLICT DO UPDATE),
+  - an eid is withdrawn only if it was built from one of the shards given to this run: a
+    build over fewer genes than the database holds leaves the other genes alone,
+  - links and facts of changed and withdrawn eids are deleted,
+  - links are re-resolved for changed eids and facts rebuilt for those eids only,
+  - withdrawn eids are removed from dim_evidence,
+  - query_evidence rows are refreshed for those eids and for every eid whose facts point at
+    an upserted dimension row (a renamed therapy changes rows of untouched evidence too).
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+from civic_parser import genes_in_molecular_profile
+from alkfred.etl.civic_sync import evidence_hash
+from alkfred.sql import evidence_fact_create, evidence_link_create
+from alkfred.sql.dim_load.civic_dim_load import DIMENSIONS, rows_for_table
+from alkfred.sql.keys import KINDS, LOOKUP_CHUNK
+from alkfred.sql.query_evidence_create import refresh_query_evidence
+
+logger = logging.getLogger(__name__)
+
+DIM_KEYS = {
+    "dim_disease": "doid",
+    "dim_gene_variant": "variant_id",
+    "dim_therapy": "therapy_id",
+    "dim_evidence": "eid",
+}
+# Volatile columns: not part of a row's content hash and kept as-is on update
+DIM_STAMPS = {"created_at_utc", "updated_at_utc"}
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _columns(table: str) -> list[str]:
+    # Column list of the loader's INSERT statement, e.g. "INSERT ... dim_disease (doid, ...) VALUES"
+    match = re.search(r"\(([^)]*)\)\s*VALUES", DIMENSIONS[table].INSERT_SQL)
+    return [c.strip() for c in match.group(1).split(",")]
+
+
+def _upsert_sql(table: str) -> str:
+    cols = _columns(table)
+    key = DIM_KEYS[table]
+    updates = [f"{c} = excluded.{c}" for c in cols if c != key and c != "created_at_utc"]
+    return (f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+            f"ON CONFLICT({key}) DO UPDATE SET {', '.join(updates)}")
+
+
+def row_hash(table: str, row: tuple) -> str:
+    content = [v for c, v in zip(_columns(table), row) if c not in DIM_STAMPS]
+    blob = json.dumps(content, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def node_hash(gene: str, node: dict) -> str:
+    # The shard is part of the content: an eid moving to another gene re-resolves its links
+    return hashlib.sha256(f"{gene}|{evidence_hash(node)}".encode("utf-8")).hexdigest()
+
+
+def _load_eids(conn: sqlite3.Connection, table: str, eids) -> None:
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} (eid INTEGER PRIMARY KEY)")
+    conn.execute(f"DELETE FROM {table}")
+    conn.executemany(f"INSERT OR IGNORE INTO {table} (eid) VALUES (?)", ((e,) for e in eids))
+
+
+def _in_scope(conn: sqlite3.Connection, state: dict[int, tuple[str, str | None]], known: set[int],
+              shards: dict) -> set[int]:
+    # Eids previously built from the genes of `shards`, i.e. the only ones this run may withdraw
+    if any(not gene for gene in shards):
+        return known  # an unfiltered snapshot covers everything
+    genes = {gene.upper() for gene in shards}
+    scoped = {eid for eid, (_, gene) in state.items() if gene and gene.upper() in genes}
+    # Evidence loaded by a full build has no state yet: its genes are read back from the
+    # molecular profile names on its links, with the same tokenizer the fetch classified by
+    for eid, mp_name in conn.execute("SELECT DISTINCT eid, mp_name FROM evidence_link "
+                                     "WHERE eid NOT IN (SELECT eid FROM build_state)"):
+        if genes_in_molecular_profile(mp_name, genes):
+            scoped.add(eid)
+    return scoped
+
+
+def incremental_build(conn: sqlite3.Connection, shards: dict[str, list[dict]]) -> dict[str, int]:
+    """
+    Apply only the differences between the raw snapshots and the last build.
+
+    Args:
+        conn (sqlite3.Connection): Open connection to a database with the schema applied.
+        shards (dict[str, list[dict]]): Gene symbol -> parsed raw evidence nodes. Only genes
+            listed here are diffed; evidence of other genes in the database is left as is.
+
+    Returns:
+        dict[str, int]: Counts for new, changed, withdrawn and unchanged eids, plus
+        dimension rows upserted and links/facts written.
+    """
+    current: dict[int, tuple[str, dict, str]] = {}  # eid -> (gene, node, hash)
+    for gene, nodes in shards.items():
+        for node in nodes:
+            if node.get("id") is None:
+                continue
+            current[int(node["id"])] = (gene, node, node_hash(gene, node))
+
+    state = {eid: (h, gene) for eid, h, gene in conn.execute("SELECT eid, content_hash, gene FROM build_state")}
+    old = {eid: h for eid, (h, _) in state.items()}
+    known = set(old) | {r[0] for r in conn.execute("SELECT eid FROM dim_evidence")}
+
+    changed = [eid for eid, (_, _, h) in current.items() if old.get(eid) != h]
+    withdrawn = _in_scope(conn, state, known, shards) - set(current)
+    counts = {
+        "new": sum(1 for eid in changed if eid not in known),
+        "changed": sum(1 for eid in changed if eid in known),
+        "withdrawn": len(withdrawn),
+        "unchanged": len(current) - len(changed),
+        "dim_rows": 0,
+        "links": 0,
+        "facts": 0,
+    }
+    if not changed and not withdrawn:
+        logger.info("Incremental build: nothing changed (%d eids)", len(current))
+        return counts
+
+    now_iso = utc_now_iso()
+
+    # Dimension rows of changed evidence, upserted only where their own hash moved
+    rows: dict[str, dict[str, tuple]] = {table: {} for table in DIMENSIONS}
+    for eid in changed:
+        node = current[eid][1]
+        for table in DIMENSIONS:
+            key_idx = _columns(table).index(DIM_KEYS[table])
+            for row in rows_for_table(table, node, now_iso):
+                rows[table][str(row[key_idx])] = row
+    old_row_hashes = {(t, k): h for t, k, h in conn.execute("SELECT table_name, row_key, content_hash FROM dim_row_hash")}
+    dirty_keys: dict[str, list[str]] = {}
+
+    with conn:
+        for table, by_key in rows.items():
+            dirty = [(key, row, row_hash(table, row)) for key, row in by_key.items()]
+            dirty = [(key, row, h) for key, row, h in dirty if old_row_hashes.get((table, key)) != h]
+            conn.executemany(_upsert_sql(table), [row for _, row, _ in dirty])
+            conn.executemany("INSERT OR REPLACE INTO dim_row_hash (table_name, row_key, content_hash) VALUES (?, ?, ?)",
+                             [(table, key, h) for key, _, h in dirty])
+            counts["dim_rows"] += len(dirty)
+            dirty_keys[table] = [key for key, _, _ in dirty]
+
+        # Links and facts of every touched eid are rebuilt from scratch
+        _load_eids(conn, "temp.affected_eids", list(changed) + list(withdrawn))
+        conn.execute("DELETE FROM fact_evidence WHERE eid IN (SELECT eid FROM temp.affected_eids)")
+        conn.execute("DELETE FROM evidence_link WHERE eid IN (SELECT eid FROM temp.affected_eids)")
+        conn.executemany("DELETE FROM dim_evidence WHERE eid = ?", ((e,) for e in withdrawn))
+        conn.executemany("DELETE FROM dim_row_hash WHERE table_name = 'dim_evidence' AND row_key = ?",
+                         ((str(e),) for e in withdrawn))
+
+    by_gene: dict[str, list[dict]] = {}
+    for eid in changed:
+        gene, node, _ = current[eid]
+        by_gene.setdefault(gene, []).append(node)
+    for gene, nodes in by_gene.items():
+        counts["links"] += evidence_link_create.insert_links(conn, nodes, oncogene=gene)
+    counts["facts"] = evidence_fact_create.insert_facts(conn, eid_table="temp.affected_eids")
+
+    # Denormalized rows also go stale when a dimension row they copy from was upserted
+    for table, key_col, natural_col in KINDS.values():
+        for start in range(0, len(dirty_keys.get(table, ())), LOOKUP_CHUNK):
+            chunk = dirty_keys[table][start:start + LOOKUP_CHUNK]
+            conn.execute(
+                f"INSERT OR IGNORE INTO temp.affected_eids (eid) SELECT f.eid FROM fact_evidence AS f "
+                f"JOIN {table} AS x ON x.{key_col} = f.{key_col} WHERE x.{natural_col} IN ({','.join('?' * len(chunk))})",
+                chunk)
+    refresh_query_evidence(conn, eid_table="temp.affected_eids")
+
+    # State last: an interrupted run simply redoes the same eids next time
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO build_state (eid, content_hash, gene, built_at_utc) VALUES (?, ?, ?, ?)",
+                         [(eid, current[eid][2], current[eid][0], now_iso) for eid in changed])
+        conn.executemany("DELETE FROM build_state WHERE eid = ?", ((e,) for e in withdrawn))
+        conn.execute("DROP TABLE IF EXISTS temp.affected_eids")
+
+    logger.info("Incremental build: new=%d changed=%d withdrawn=%d unchanged=%d dim_rows=%d links=%d facts=%d",
+                counts["new"], counts["changed"], counts["withdrawn"], counts["unchanged"],
+                counts["dim_rows"], counts["links"], counts["facts"])
+    return counts
@@ -0,0 +1,35 @@
+-- Secondary indexes, kept apart from schema.sql so a bulk build can create them
+-- once after the load instead of maintaining every B-tree row by row.
+-- uq_fact_tuple stays in schema.sql: INSERT OR IGNORE relies on it for dedupe.
+--
+-- No index repeats a primary key or the leading columns of another index: dim_evidence.eid
+-- is the rowid, evidence_link(eid, ...) is its own PK and uq_fact_tuple leads with eid.
+
+CREATE INDEX IF NOT EXISTS idx_label_disease_norm ON dim_disease(label_disease_norm);
+
+CREATE INDEX IF NOT EXISTS idx_gene_symbol ON dim_gene_variant(gene_symbol);
+-- query_choices entry point: label -> (variant_key, variant_id) without touching the table
+CREATE INDEX IF NOT EXISTS idx_variant_label_cover ON dim_gene_variant(label_gene_variant_norm, variant_id);
+
+CREATE INDEX IF NOT EXISTS idx_label_therapy_norm ON dim_therapy(label_therapy_norm);
+
+-- FK child lookups on the link table
+CREATE INDEX IF NOT EXISTS idx_link_disease_variant ON evidence_link(disease_key, variant_key);
+CREATE INDEX IF NOT EXISTS idx_link_therapy         ON evidence_link(therapy_key);
+
+-- query_choices: facts of a variant with every join key, answered from the index alone
+CREATE INDEX IF NOT EXISTS idx_fact_variant_cover ON fact_evidence(variant_key, disease_key, therapy_key, eid);
+CREATE INDEX IF NOT EXISTS idx_fact_disease_dir ON fact_evidence(disease_key, direction);
+CREATE INDEX IF NOT EXISTS idx_fact_therapy ON fact_evidence(therapy_key);
+CREATE INDEX IF NOT EXISTS idx_fact_semantics ON fact_evidence(direction, significance);
+
+-- query_evidence: one covering index per extra filter shape of the query CLI (the PK serves
+-- variant alone); equality columns first, then the sort key, then everything a row returns
+CREATE INDEX IF NOT EXISTS idx_qe_significance ON query_evidence(
+    variant_norm, significance, sort_label, eid, fact_id, doid, therapy_id, variant_id, label_display, disease_norm, gene_symbol);
+CREATE INDEX IF NOT EXISTS idx_qe_disease ON query_evidence(
+    variant_norm, disease_norm, sort_label, eid, fact_id, doid, therapy_id, variant_id, label_display, significance, gene_symbol);
+CREATE INDEX IF NOT EXISTS idx_qe_significance_disease ON query_evidence(
+    variant_norm, significance, disease_norm, sort_label, eid, fact_id, doid, therapy_id, variant_id, label_display, gene_symbol);
+-- incremental refresh deletes by eid
+CREATE INDEX IF NOT EXISTS idx_qe_eid ON query_evidence(eid);
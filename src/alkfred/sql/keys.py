@@ -0,0 +1,94 @@
+"""
+Integer surrogate key registry.
+
+Dimension rows are keyed by INTEGER PRIMARY KEY columns (disease_key, variant_key,
+therapy_key) that SQLite allocates when a row is inserted; the natural ids (DOID, CA id or
+uuid5, therapy uuid5) stay on the rows as UNIQUE lookup columns. Every loader inserts
+dimension rows by natural id and asks one KeyRegistry for the integer keys, so links and
+facts only ever carry integers. The registry caches natural id -> key per dimension and
+fetches unknown ids in chunked IN queries.
+"""
+import logging
+import sqlite3
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+# kind -> (table, surrogate key column, natural id column)
+KINDS = {
+    "disease": ("dim_disease", "disease_key", "doid"),
+    "variant": ("dim_gene_variant", "variant_key", "variant_id"),
+    "therapy": ("dim_therapy", "therapy_key", "therapy_id"),
+}
+
+# Stay well below SQLite's bound-parameter limit (999 on old builds)
+LOOKUP_CHUNK = 500
+
+
+class KeyRegistry:
+    """
+    Natural id -> surrogate key lookup shared by the dimension, link and fact loaders.
+
+    Keys are never generated here: SQLite allocates them on insert, so a key is stable for
+    the life of the row and merging staging databases cannot collide. The registry only
+    remembers what it has seen; call `load()` once for a warm cache or let `resolve()` fetch
+    on demand.
+    """
+
+    def __init__(self):
+        self._keys: dict[str, dict[str, int]] = {kind: {} for kind in KINDS}
+
+    def load(self, conn: sqlite3.Connection) -> "KeyRegistry":
+        for kind, (table, key_col, natural_col) in KINDS.items():
+            self._keys[kind].update(conn.execute(f"SELECT {natural_col}, {key_col} FROM {table}"))
+        return self
+
+    def get(self, kind: str, natural: str) -> int | None:
+        return self._keys[kind].get(natural)
+
+    def resolve(self, conn: sqlite3.Connection, kind: str, naturals: Iterable[str]) -> dict[str, int]:
+        """
+        Map natural ids of one dimension to their surrogate keys.
+
+        Args:
+            conn (sqlite3.Connection): Connection that sees the dimension rows.
+            kind (str): "disease", "variant" or "therapy".
+            naturals (Iterable[str]): Natural ids; the rows must already be inserted.
+
+        Returns:
+            dict[str, int]: Natural id -> key for every id found (unknown ids are left out).
+        """
+        table, key_col, natural_col = KINDS[kind]
+        cache = self._keys[kind]
+        wanted = set(naturals)
+        missing = [n for n in wanted if n not in cache]
+        for start in range(0, len(missing), LOOKUP_CHUNK):
+            chunk = missing[start:start + LOOKUP_CHUNK]
+            marks = ",".join("?" for _ in chunk)
+            cache.update(conn.execute(
+                f"SELECT {natural_col}, {key_col} FROM {table} WHERE {natural_col} IN ({marks})", chunk))
+        return {n: cache[n] for n in wanted if n in cache}
+
+    def link_keys(self, conn: sqlite3.Connection, links: list[tuple]) -> list[tuple]:
+        """
+        Rewrite link tuples (eid, doid, variant_id, therapy_id, ...) to integer keys.
+
+        Links whose dimension rows are missing are dropped, as the FKs would reject them;
+        the drop is logged as a warning with a count.
+        """
+        diseases = self.resolve(conn, "disease", (link[1] for link in links))
+        variants = self.resolve(conn, "variant", (link[2] for link in links))
+        therapies = self.resolve(conn, "therapy", (link[3] for link in links))
+        keyed, dropped = [], []
+        for eid, doid, variant_id, therapy_id, *rest in links:
+            disease_key = diseases.get(doid)
+            variant_key = variants.get(variant_id)
+            therapy_key = therapies.get(therapy_id)
+            if disease_key is None or variant_key is None or therapy_key is None:
+                dropped.append(eid)
+                continue
+            keyed.append((eid, disease_key, variant_key, therapy_key, *rest))
+        if dropped:
+            logger.warning("Dropped %d of %d links with no matching dimension row (eids %s)",
+                           len(dropped), len(links), sorted(set(dropped))[:10])
+        return keyed
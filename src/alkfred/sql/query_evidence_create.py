@@ -0,0 +1,61 @@
+# query_evidence_create.py
+"""
+Materialize `query_evidence`, the lookup table behind alkfred.query.
+
+Every query used to join fact_evidence to four dimensions and sort on
+LOWER(t.label_display), which no index can serve. query_evidence holds one row per fact
+with the filter columns, the returned fields and the precomputed sort key side by side;
+its primary key (variant_norm, sort_label, eid, fact_id) and the idx_qe_* indexes turn
+each lookup into a single index range scan already in result order.
+"""
+from __future__ import annotations
+
+import sqlite3
+
+# Variant label without its own gene prefix: stored labels come both ways ("g1202r", "alk_g1202r")
+VARIANT_NORM_SQL = """
+    CASE WHEN v.gene_symbol <> ''
+              AND substr(v.label_gene_variant_norm, 1, length(v.gene_symbol) + 1) = lower(v.gene_symbol) || '_'
+         THEN substr(v.label_gene_variant_norm, length(v.gene_symbol) + 2)
+         ELSE v.label_gene_variant_norm END
+"""
+
+QUERY_EVIDENCE_INSERT_SQL = f"""
+    INSERT OR REPLACE INTO query_evidence
+        (variant_norm, sort_label, eid, fact_id, variant_label, variant_id, gene_symbol,
+         significance, direction, evidence_level, evidence_type,
+         disease_norm, doid, therapy_id, therapy_norm, label_display)
+    SELECT {VARIANT_NORM_SQL}, LOWER(t.label_display), f.eid, f.fact_id, v.label_gene_variant_norm, v.variant_id,
+           v.gene_symbol, e.significance, e.direction, e.evidence_level, e.evidence_type,
+           d.label_disease_norm, d.doid, t.therapy_id, t.label_therapy_norm, t.label_display
+    FROM fact_evidence AS f
+    JOIN dim_evidence     AS e ON e.eid = f.eid
+    JOIN dim_disease      AS d ON d.disease_key = f.disease_key
+    JOIN dim_gene_variant AS v ON v.variant_key = f.variant_key
+    JOIN dim_therapy      AS t ON t.therapy_key = f.therapy_key
+"""
+
+
+def refresh_query_evidence(conn: sqlite3.Connection, eid_table: str | None = None) -> int:
+    """
+    Rebuild query_evidence from fact_evidence and the dimensions.
+
+    Args:
+        conn (sqlite3.Connection): Open connection; the caller owns it.
+        eid_table (str | None): Only replace the rows of eids listed in this table
+            (incremental builds); by default the whole table is rebuilt.
+
+    Returns:
+        int: Rows written.
+    """
+    with conn:
+        if eid_table:
+            conn.execute(f"DELETE FROM query_evidence WHERE eid IN (SELECT eid FROM {eid_table})")
+            scope = f"WHERE f.eid IN (SELECT eid FROM {eid_table})"
+        else:
+            conn.execute("DELETE FROM query_evidence")
+            scope = ""
+        before = conn.total_changes
+        # Inserted in primary-key order, so the WITHOUT ROWID B-tree is appended to, not split
+        conn.execute(f"{QUERY_EVIDENCE_INSERT_SQL} {scope} ORDER BY 1, 2, 3, 4")
+        return conn.total_changes - before
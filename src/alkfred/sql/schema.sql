@@ -1,8 +1,16 @@
 PRAGMA foreign_keys = ON;
 
+-- Schema 4: integer surrogate keys (disease_key, variant_key, therapy_key, fact_id) with the
+-- natural ids (DOID, CA id / uuid5, therapy uuid5) kept as UNIQUE lookup columns.
+-- See alkfred.sql.keys for the allocation registry shared by the loaders.
+-- Dimensions and facts key on INTEGER PRIMARY KEY (the rowid itself); evidence_link, keyed
+-- on a composite, is WITHOUT ROWID.
+-- query_evidence is a denormalized, read-only copy for lookups (see below).
+
 
 CREATE TABLE IF NOT EXISTS dim_disease (
-doid TEXT PRIMARY KEY,
+disease_key INTEGER PRIMARY KEY,
+doid TEXT NOT NULL UNIQUE,
 label_display TEXT NOT NULL,
 label_disease_norm TEXT NOT NULL,
 synonyms_json TEXT NOT NULL DEFAULT '[]',
@@ -11,11 +19,10 @@ ncit_id TEXT,
 lineage_json TEXT NOT NULL DEFAULT '[]'
 );
 
-CREATE INDEX IF NOT EXISTS idx_label_disease_norm ON dim_disease(label_disease_norm);
-
 
 CREATE TABLE IF NOT EXISTS dim_gene_variant (
-variant_id TEXT PRIMARY KEY,   -- either CIViC ca_id, or your own generated UID
+variant_key INTEGER PRIMARY KEY,
+variant_id TEXT NOT NULL UNIQUE, -- either CIViC ca_id, or your own generated UID
 civic_ca_id TEXT,
 hgnc_id TEXT,                  -- HGNC stable ID for the gene (if known)
 gene_symbol TEXT NOT NULL,     -- e.g. "ALK"
@@ -26,11 +33,10 @@ hgvs_c TEXT,                   -- optional: cDNA HGVS
 confidence TEXT                -- HIGH/MED/LOW for mapping certainty
 );
 
-CREATE INDEX IF NOT EXISTS idx_gene_symbol ON dim_gene_variant(gene_symbol);
-CREATE INDEX IF NOT EXISTS idx_label_gene_variant_norm ON dim_gene_variant(label_gene_variant_norm);
 
 CREATE TABLE IF NOT EXISTS dim_therapy (
-therapy_id TEXT PRIMARY KEY,
+therapy_key INTEGER PRIMARY KEY,
+therapy_id TEXT NOT NULL UNIQUE,
 ncit_id TEXT UNIQUE NULL,
 label_display TEXT NOT NULL,
 label_therapy_norm TEXT NOT NULL ,
@@ -43,8 +49,6 @@ class_ids_json TEXT
 );
 
 
-CREATE INDEX IF NOT EXISTS idx_label_therapy_norm ON dim_therapy(label_therapy_norm);
-
 CREATE TABLE IF NOT EXISTS dim_evidence (
     
 eid INTEGER PRIMARY KEY,
@@ -62,57 +66,80 @@ created_at_utc TEXT,
 updated_at_utc TEXT
 );
 
-CREATE INDEX IF NOT EXISTS idx_evidence_eid ON dim_evidence(eid);
-
-
 
 CREATE TABLE IF NOT EXISTS evidence_link (
   eid             INTEGER NOT NULL,
-  doid            TEXT    NOT NULL,
-  variant_id      TEXT    NOT NULL,
-  therapy_id      TEXT    NOT NULL,
+  disease_key     INTEGER NOT NULL,
+  variant_key     INTEGER NOT NULL,
+  therapy_key     INTEGER NOT NULL,
   mp_name         TEXT,         -- optional provenance
   therapy_label   TEXT,         -- optional provenance (as seen in CIViC)
   created_at_utc  TEXT NOT NULL DEFAULT (CURRENT_TIMESTAMP),
   run_id          TEXT,
-  PRIMARY KEY (eid, doid, variant_id, therapy_id),
-  FOREIGN KEY (eid)        REFERENCES dim_evidence(eid),
-  FOREIGN KEY (doid)       REFERENCES dim_disease(doid),
-  FOREIGN KEY (variant_id) REFERENCES dim_gene_variant(variant_id),
-  FOREIGN KEY (therapy_id)    REFERENCES dim_therapy(therapy_id)
-);
-
-
-CREATE INDEX IF NOT EXISTS idx_link_doid_variant ON evidence_link(doid, variant_id);
-CREATE INDEX IF NOT EXISTS idx_link_therapy      ON evidence_link(therapy_id);
-CREATE INDEX IF NOT EXISTS idx_link_eid          ON evidence_link(eid);
+  PRIMARY KEY (eid, disease_key, variant_key, therapy_key),
+  FOREIGN KEY (eid)         REFERENCES dim_evidence(eid),
+  FOREIGN KEY (disease_key) REFERENCES dim_disease(disease_key),
+  FOREIGN KEY (variant_key) REFERENCES dim_gene_variant(variant_key),
+  FOREIGN KEY (therapy_key) REFERENCES dim_therapy(therapy_key)
+) WITHOUT ROWID;  -- the composite PK is the table: no hidden rowid plus a separate PK index
 
 
 CREATE TABLE IF NOT EXISTS fact_evidence (
-fact_id         TEXT PRIMARY KEY,
+fact_id         INTEGER PRIMARY KEY,
 eid             INTEGER NOT NULL,
-variant_id      TEXT NOT NULL,
-doid            TEXT NOT NULL,
-therapy_id      TEXT NOT NULL,
+variant_key     INTEGER NOT NULL,
+disease_key     INTEGER NOT NULL,
+therapy_key     INTEGER NOT NULL,
 direction       TEXT NOT NULL DEFAULT 'N/A',
 significance    TEXT NOT NULL DEFAULT 'N/A',
 created_at_utc  TEXT NOT NULL DEFAULT (CURRENT_TIMESTAMP),
 run_id          TEXT,
-FOREIGN KEY (eid)        REFERENCES dim_evidence(eid),
-FOREIGN KEY (variant_id) REFERENCES dim_gene_variant(variant_id),
-FOREIGN KEY (doid)       REFERENCES dim_disease(doid),
-FOREIGN KEY (therapy_id)    REFERENCES dim_therapy(therapy_id)
+FOREIGN KEY (eid)         REFERENCES dim_evidence(eid),
+FOREIGN KEY (variant_key) REFERENCES dim_gene_variant(variant_key),
+FOREIGN KEY (disease_key) REFERENCES dim_disease(disease_key),
+FOREIGN KEY (therapy_key) REFERENCES dim_therapy(therapy_key)
 );
 
 
 CREATE UNIQUE INDEX IF NOT EXISTS uq_fact_tuple
-ON fact_evidence(eid, doid, variant_id, therapy_id);
-
-CREATE INDEX IF NOT EXISTS idx_fact_doid_dir ON fact_evidence(doid, direction);
-CREATE INDEX IF NOT EXISTS idx_fact_variant ON fact_evidence(variant_id);
-CREATE INDEX IF NOT EXISTS idx_fact_therapy ON fact_evidence(therapy_id);
-CREATE INDEX IF NOT EXISTS idx_fact_eid ON fact_evidence(eid);
-CREATE INDEX IF NOT EXISTS idx_fact_keys ON fact_evidence(variant_id, therapy_id, doid);
-CREATE INDEX IF NOT EXISTS idx_fact_semantics ON fact_evidence(direction, significance);
-
+ON fact_evidence(eid, disease_key, variant_key, therapy_key);
+
+
+-- Query-serving copy of fact_evidence joined to its dimensions, refreshed after the facts
+-- (alkfred.sql.query_evidence_create). The primary key is the variant lookup in result order,
+-- so a lookup by variant is one range scan with no sort; idx_qe_* cover the other filter shapes.
+CREATE TABLE IF NOT EXISTS query_evidence (
+variant_norm        TEXT NOT NULL,   -- variant label without its gene prefix ("g1202r")
+sort_label          TEXT NOT NULL,   -- LOWER(therapy label_display): the result order
+eid                 INTEGER NOT NULL,
+fact_id             INTEGER NOT NULL, -- fact_evidence.fact_id, breaks ties in the sort key
+variant_label       TEXT NOT NULL,   -- dim_gene_variant.label_gene_variant_norm as stored
+variant_id          TEXT NOT NULL,
+gene_symbol         TEXT,
+significance        TEXT,
+direction           TEXT,
+evidence_level      TEXT,
+evidence_type       TEXT,
+disease_norm        TEXT NOT NULL,
+doid                TEXT NOT NULL,
+therapy_id          TEXT NOT NULL,
+therapy_norm        TEXT NOT NULL,
+label_display       TEXT NOT NULL,
+PRIMARY KEY (variant_norm, sort_label, eid, fact_id)
+) WITHOUT ROWID;
+
+
+-- Incremental builds: what each evidence item / dimension row looked like when last applied
+CREATE TABLE IF NOT EXISTS build_state (
+eid             INTEGER PRIMARY KEY,
+content_hash    TEXT NOT NULL,     -- sha256 over gene shard + canonical raw node
+gene            TEXT,              -- shard the eid was built from; withdrawals are scoped by it
+built_at_utc    TEXT NOT NULL
+);
 
+CREATE TABLE IF NOT EXISTS dim_row_hash (
+table_name      TEXT NOT NULL,
+row_key         TEXT NOT NULL,
+content_hash    TEXT NOT NULL,
+PRIMARY KEY (table_name, row_key)
+) WITHOUT ROWID;
@@ -0,0 +1,11 @@
+"""
+Label normalization shared by the loaders and the query API.
+
+Standard library only, so importing alkfred.query (or the query server) does not pull in
+the HTTP client stack that `utils` sets up at import time.
+"""
+
+
+def normalize_label(s: str) -> str:
+    # Lowercase, "::" and "-" to "_", spaces to "_": "ALK G1202R" -> "alk_g1202r"
+    return s.lower().replace("::", "-").replace("-", "_").replace(" ", "_").strip()
@@ -1,6 +1,9 @@
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from utils import help_request, graphql_query
+from utils import help_request, graphql_query, PageSizeController
 import json
 import logging
 import re
@@ -8,70 +11,269 @@ from typing import Optional
 
 GRAPHQL_URL = "https://civicdb.org/api/graphql"
 HEADERS = {"Content-Type": "application/json"}
-API_THROTTLE = 0.2
 
 log = logging.getLogger(__name__)
 
-def fetch_civic_all_evidence_items():
-    after_cursor = None
-    all_items = []
-    seen_ids = set()
-    page = 1
-    MAX_PAGES = 10000
-
-    query = """
-      query ($first: Int!, $after: String) {
-        evidenceItems(status: ACCEPTED, first: $first, after: $after) {
-          pageInfo {
-            hasNextPage
-            endCursor
-          }
-          nodes {
-            id
-            status
-            significance
-            evidenceType
-            evidenceLevel
-            evidenceRating
-            evidenceDirection
-            description
-            molecularProfile { id name variants {
-              name
-              ... on GeneVariant { alleleRegistryId }
-              feature { name } }}
-            therapies { name ncitId }
-            disease {doid name diseaseAliases }
-            source { ascoAbstractId citationId pmcId sourceType title publicationYear }
-          }
-        }
+EVIDENCE_NODE_FIELDS = """
+      nodes {
+        id
+        status
+        significance
+        evidenceType
+        evidenceLevel
+        evidenceRating
+        evidenceDirection
+        description
+        molecularProfile { id name variants {
+          name
+          ... on GeneVariant { alleleRegistryId }
+          feature { name } }}
+        therapies { name ncitId }
+        disease {doid name diseaseAliases }
+        source { ascoAbstractId citationId pmcId sourceType title publicationYear }
       }
+"""
+# GraphQL types of the evidenceItems arguments we know how to filter on
+EVIDENCE_FILTER_TYPES = {
+    "molecularProfileId": "Int",
+    "evidenceType": "EvidenceType",
+    "evidenceLevel": "EvidenceLevel",
+}
+# Every EvidenceType value, so per-type partitions cover the whole corpus
+EVIDENCE_TYPES = ("PREDICTIVE", "DIAGNOSTIC", "PROGNOSTIC", "PREDISPOSING", "ONCOGENIC", "FUNCTIONAL")
+PAGE_SIZE = 500
+MAX_PAGES = 10000
+PAGE_RETRIES = 3  # retries of one page at a smaller size once utils.s has given up
+
+# Pacing comes from utils.rate_limiter; this only sizes the pages
+page_sizer = PageSizeController(size=PAGE_SIZE)
+
+
+def build_evidence_query(filters: Optional[dict] = None) -> str:
+    # Only declare the filters we pass: an explicit null is not the same as "no filter"
+    names = sorted(filters or {})
+    for name in names:
+        if name not in EVIDENCE_FILTER_TYPES:
+            raise ValueError(f"Unsupported evidenceItems filter: {name}")
+    decls = "".join(f", ${n}: {EVIDENCE_FILTER_TYPES[n]}" for n in names)
+    args = "".join(f", {n}: ${n}" for n in names)
+    return f"""
+  query ($first: Int!, $after: String{decls}) {{
+    evidenceItems(status: ACCEPTED, first: $first, after: $after{args}) {{
+      pageInfo {{
+        hasNextPage
+        endCursor
+      }}
+{EVIDENCE_NODE_FIELDS}
+    }}
+  }}
+"""
+
+
+EVIDENCE_QUERY = build_evidence_query()
+
+
+def _fetch_page(query: str, variables: dict) -> dict:
+    # One page at the controller's current size; failed pages are retried smaller
+    for attempt in range(PAGE_RETRIES + 1):
+        first = page_sizer.size
+        started = time.monotonic()
+        try:
+            data = graphql_query(
+                url=GRAPHQL_URL,
+                query=query,
+                variables={**variables, "first": first},
+                headers=HEADERS,
+            )
+        except RuntimeError as e:
+            page_sizer.record(time.monotonic() - started, ok=False)
+            if attempt == PAGE_RETRIES:
+                raise
+            log.warning("Page of %s failed (%s); retrying with first=%s", first, e, page_sizer.size)
+            continue
+        page_sizer.record(time.monotonic() - started, ok=True)
+        return data
+
+
+def iter_civic_evidence_pages(after_cursor: Optional[str] = None, seen_ids: Optional[set] = None,
+                              filters: Optional[dict] = None):
+    """
+    Page through accepted CIViC evidence items, yielding one page at a time.
+
+    Only the current page is held in memory; callers decide what to keep.
+
+    Args:
+        after_cursor (str | None): Cursor to start after (None = first page).
+        seen_ids (set | None): Evidence ids already emitted; duplicates are dropped.
+        filters (dict | None): Server-side evidenceItems arguments, e.g. {"molecularProfileId": 1}.
+
+    Yields:
+        tuple[list[dict], str | None]: De-duplicated nodes of the page and the page's endCursor.
     """
+    if seen_ids is None:
+        seen_ids = set()
+    page = 1
+    query = build_evidence_query(filters) if filters else EVIDENCE_QUERY
 
     while True:
-        data = graphql_query(
-            url= GRAPHQL_URL,
-            query=query,
-            variables={"first": 500, "after": after_cursor},
-            headers= HEADERS,
-        )
+        data = _fetch_page(query, {"after": after_cursor, **(filters or {})})
 
         evidence_items = data["evidenceItems"]
+        nodes = []
         for node in evidence_items["nodes"]:
             if node["id"] not in seen_ids:
                 seen_ids.add(node["id"])
-                all_items.append(node)
+                nodes.append(node)
+
+        end_cursor = evidence_items["pageInfo"]["endCursor"]
+        log.info("Fetched page %s with %s new items", page, len(nodes))
+        yield nodes, end_cursor
 
         if not evidence_items["pageInfo"]["hasNextPage"]:
             break
 
-        after_cursor = evidence_items["pageInfo"]["endCursor"]
+        after_cursor = end_cursor
         page += 1
-        logging.info("Fetched page %s with %s items", page, len(all_items))
-        time.sleep(API_THROTTLE)
 
         if page > MAX_PAGES:
             raise RuntimeError("Exceeded max pages — likely stuck in a loop")
 
+
+def iter_streams_concurrently(streams: list, max_workers: int = 4, cursors: Optional[dict] = None):
+    """
+    Page several evidenceItems streams in parallel over the pooled session.
+
+    Every worker goes through utils.help_request, so all of them share one rate limiter
+    and one page-size controller. Pages are handed back through a bounded queue, so at
+    most ~2 pages per worker are in memory at once.
+
+    Args:
+        streams (list): [stream_key, filters] pairs, e.g. ["type:PREDICTIVE", {"evidenceType": "PREDICTIVE"}].
+        max_workers (int): Worker threads.
+        cursors (dict | None): stream_key -> cursor to resume after.
+
+    Yields:
+        tuple[str, list[dict] | None, str | None]: (stream_key, nodes, endCursor) per page, and
+        (stream_key, None, None) once that stream is exhausted. Nodes are only de-duplicated
+        within their own stream; cross-stream de-duplication is the caller's job.
+    """
+    cursors = cursors or {}
+    pages: queue.Queue = queue.Queue(maxsize=max_workers * 2)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(key: str, filters: dict) -> None:
+        if stop.is_set():
+            return
+        try:
+            for nodes, end_cursor in iter_civic_evidence_pages(after_cursor=cursors.get(key), filters=filters or None):
+                if not _put((key, nodes, end_cursor)):
+                    return
+            _put((key, None, None))
+        except Exception as e:
+            _put((key, e, None))
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="civic-fetch")
+    try:
+        for key, filters in streams:
+            pool.submit(_worker, key, filters)
+        remaining = len(streams)
+        while remaining:
+            key, nodes, end_cursor = pages.get()
+            if isinstance(nodes, Exception):
+                raise nodes
+            if nodes is None:
+                remaining -= 1
+            yield key, nodes, end_cursor
+    finally:
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _iter_connection(query: str, field: str, variables: dict):
+    # Generic Relay pager for the small lookup queries below
+    after_cursor = None
+    for _ in range(MAX_PAGES):
+        data = _fetch_page(query, {**variables, "after": after_cursor})
+        conn = (data or {}).get(field) or {}
+        yield from conn.get("nodes") or []
+        page_info = conn.get("pageInfo") or {}
+        if not page_info.get("hasNextPage"):
+            return
+        after_cursor = page_info.get("endCursor")
+    raise RuntimeError("Exceeded max pages — likely stuck in a loop")
+
+
+def fetch_gene_molecular_profile_ids(gene_symbol: str) -> dict[int, str]:
+    """
+    Resolve a gene symbol to the molecular profiles built on its variants.
+
+    Returns:
+        dict[int, str]: molecular profile id -> molecular profile name.
+    """
+    data = graphql_query(
+        url=GRAPHQL_URL,
+        query="""
+          query ($symbol: String!) {
+            gene(entrezSymbol: $symbol) { id name }
+          }
+        """,
+        variables={"symbol": gene_symbol},
+        headers=HEADERS,
+    )
+    gene = (data or {}).get("gene")
+    if not gene:
+        log.debug("No CIViC gene feature for %r", gene_symbol)
+        return {}
+
+    query = """
+      query ($featureId: Int!, $first: Int!, $after: String) {
+        variants(featureId: $featureId, first: $first, after: $after) {
+          pageInfo { hasNextPage endCursor }
+          nodes { id molecularProfiles { nodes { id name } } }
+        }
+      }
+    """
+    profiles: dict[int, str] = {}
+    for variant in _iter_connection(query, "variants", {"featureId": int(gene["id"])}):
+        for mp in ((variant.get("molecularProfiles") or {}).get("nodes") or []):
+            profiles[int(mp["id"])] = mp.get("name") or ""
+    log.info("Resolved %s to %d molecular profiles via feature %s", gene_symbol, len(profiles), gene["id"])
+    return profiles
+
+
+def search_molecular_profiles(name: str) -> dict[int, str]:
+    """
+    Name search over molecular profiles; catches fusions (e.g. "EML4::ALK") that
+    hang off a fusion feature rather than the gene itself.
+
+    Returns:
+        dict[int, str]: molecular profile id -> molecular profile name.
+    """
+    query = """
+      query ($name: String!, $first: Int!, $after: String) {
+        molecularProfiles(name: $name, first: $first, after: $after) {
+          pageInfo { hasNextPage endCursor }
+          nodes { id name }
+        }
+      }
+    """
+    return {int(mp["id"]): mp.get("name") or "" for mp in _iter_connection(query, "molecularProfiles", {"name": name})}
+
+
+def fetch_civic_all_evidence_items():
+    # Materialize the whole stream; prefer iter_civic_evidence_pages for large pulls
+    all_items = []
+    for nodes, _ in iter_civic_evidence_pages():
+        all_items.extend(nodes)
     return all_items
 
 
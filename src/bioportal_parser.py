@@ -1,7 +1,7 @@
 import json
 from pathlib import Path
-import requests
 from dotenv import load_dotenv
+from utils import help_request
 import os
 
 src = Path("data/raw_bioportal_db.json")
@@ -23,9 +23,12 @@ def fetch_ncit_from_bioportal() -> list[dict]:
         class_url = node["links"]["self"]
         ontology = node["links"]["ontology"]
         if "NCIT" in ontology or "MONDO" in ontology or "HGNC" in ontology:
-            resp = requests.get(class_url, headers=HEADERS, timeout=5)
-            if resp.status_code == 200:
-                payload = resp.json()
+            try:
+                payload = help_request(class_url, headers=HEADERS)
+            except RuntimeError as e:
+                print(f"Skipping {class_url}: {e}")
+                continue
+            if payload:
                 class_id = payload.get("@id")
                 
                 if class_id:
@@ -3,6 +3,7 @@ from pathlib import Path
 import requests
 import json
 from dotenv import load_dotenv
+from utils import help_request
 
 # Load API key
 load_dotenv(Path("src/.env"))
@@ -41,8 +42,7 @@ def save_to_json(data, path="data/raw_bioportal_db.json"):
     with open(path, "w") as f:
         json.dump(data, f, indent=2)
 def fetch_bioportal_data() -> None:
-    requested_data = requests.get(SITE,headers= HEADERS)
-    nodes = requested_data.json()
+    nodes = help_request(SITE, headers=HEADERS)
     try:
         save_to_json(nodes)
     except:
@@ -10,6 +10,8 @@ from utils import normalize
 __all__ = [
     "generate_aliases",
     "gene_in_molecular_profile",
+    "genes_in_molecular_profile",
+    "molecular_profile_tokens",
     "parse_resistance_entries",
 ]
 
@@ -97,6 +99,29 @@ logger = logging.getLogger(__name__)
 #     return sorted(a for a in aliases if a and len(a) > 3)
 
 
+def molecular_profile_tokens(mp_name: str) -> set[str]:
+    """
+    Return the upper-cased gene/variant tokens of a molecular profile name.
+
+    - Splits on common separators, so "EML4::ALK" yields {"EML4", "ALK"}.
+    - Tokenize once and test as many genes against the result as needed.
+    """
+    if not mp_name:
+        return set()
+
+    mp_up = mp_name.upper()
+
+    # Tokenize by common separators
+    tokens = set(re.split(r"[\s\-\_:;()/\\|&]+", mp_up))
+
+    # Split fusion tokens like EML4::ALK
+    for fusion in re.findall(r"([A-Z0-9]+::[A-Z0-9]+)", mp_up):
+        tokens.update(part.strip() for part in fusion.split("::") if part.strip())
+
+    tokens.discard("")
+    return tokens
+
+
 def gene_in_molecular_profile(mp_name: str, gene_symbol: str) -> bool:
     """
     Return True if `gene_symbol` appears as a token in `mp_name` (including split fusion parts).
@@ -108,17 +133,19 @@ def gene_in_molecular_profile(mp_name: str, gene_symbol: str) -> bool:
     if not mp_name or not gene_symbol:
         return False
 
-    gene_symbol = gene_symbol.upper()
-    mp_up = mp_name.upper()
+    return gene_symbol.upper() in molecular_profile_tokens(mp_name)
 
-    # Tokenize by common separators
-    tokens = re.split(r"[\s\-\_:;()/\\|&]+", mp_up)
 
-    # Split fusion tokens like EML4::ALK
-    for fusion in re.findall(r"([A-Z0-9]+::[A-Z0-9]+)", mp_up):
-        tokens.extend(part.strip() for part in fusion.split("::") if part.strip())
+def genes_in_molecular_profile(mp_name: str, gene_symbols) -> set[str]:
+    """
+    Return which of `gene_symbols` appear in `mp_name`, classifying the profile once.
 
-    return gene_symbol in tokens
+    Same token rules as gene_in_molecular_profile; symbols come back as given.
+    """
+    tokens = molecular_profile_tokens(mp_name)
+    if not tokens:
+        return set()
+    return {g for g in gene_symbols if g and g.upper() in tokens}
 
 
 # def _composite_key(doid: str, profile_norm: str) -> str:
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of decoded JSON responses.
+
+    Entries are keyed by sha256(method + URL + request body) and stored as
+    <root>/<k[:2]>/<k>.json. GraphQL variables in UNKEYED_VARIABLES are left out of the
+    key: the page size (`first`) adapts to observed latency, so a replay would ask for
+    sizes that were never recorded. A page is identified by its query and `after`
+    cursor; whatever size was stored is served, and its endCursor leads to the next
+    recorded page. Hits refresh the file atime, so eviction past `max_bytes`
+    drops the least recently used entries first; the mtime stays at the entry's
+    stored_at time and is what `ttl` is measured against.
+
+    Args:
+        root (Path): Cache directory.
+        ttl (float | None): Seconds an entry stays fresh; None never expires.
+        max_bytes (int): Size bound for the whole cache directory.
+        offline (bool): Replay only: ignore TTL and never allow a network call.
+    """
+
+    UNKEYED_VARIABLES = frozenset({"first"})
+
+    def __init__(self, root: Path, ttl: float | None = 86400, max_bytes: int = 512 * 1024 * 1024,
+                 offline: bool = False):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self.root.glob("*/*.json"))
+
+    @staticmethod
+    def key(method: str, url: str, payload: dict | None = None) -> str:
+        if payload is not None and isinstance(payload.get("variables"), dict):
+            variables = {k: v for k, v in payload["variables"].items() if k not in ResponseCache.UNKEYED_VARIABLES}
+            payload = {**payload, "variables": variables}
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":")) if payload is not None else ""
+        return hashlib.sha256(f"{method.upper()} {url}\n{body}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Any | None:
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if not self.offline and self.ttl is not None and time.time() - stat.st_mtime > self.ttl:
+            log.debug("Cache entry %s expired", key)
+            return None
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            log.warning("Dropping unreadable cache entry %s", path)
+            path.unlink(missing_ok=True)
+            return None
+        # Hits count as use for LRU, but keep the stored_at stamp for TTL
+        os.utime(path, (time.time(), entry.get("stored_at", stat.st_mtime)))
+        return entry["data"]
+
+    def put(self, key: str, url: str, data: Any) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stored_at = time.time()
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump({"url": url, "stored_at": stored_at, "data": data}, f)
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            os.utime(path, (stored_at, stored_at))
+            self._size += path.stat().st_size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Oldest access time first until we are back under the bound
+        entries = sorted(self.root.glob("*/*.json"), key=lambda p: p.stat().st_atime)
+        for path in entries:
+            if self._size <= self.max_bytes:
+                break
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._size -= size
+            log.debug("Evicted cache entry %s", path.name)
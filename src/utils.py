@@ -1,5 +1,11 @@
 
 from asyncio import Runner
+from collections import deque
+from email.utils import parsedate_to_datetime
+import os
+from pathlib import Path
+import threading
+import time
 from typing import Any
 from urllib import response
 import requests
@@ -7,24 +13,158 @@ from requests.adapters import HTTPAdapter, Retry
 import json
 from graphql import GraphQLError
 import logging
+from http_cache import ResponseCache
+from alkfred.text import normalize_label  # re-exported for the flat modules
 
 
 s = requests.Session()
 
+# 429s are handled in help_request so the shared rate limiter can learn from them
 retries = Retry(total=5,
             backoff_factor=1,
-            status_forcelist=[ 429, 500, 502, 503, 504 ], allowed_methods={"GET","POST"},
+            status_forcelist=[ 500, 502, 503, 504 ], allowed_methods={"GET","POST"},
             respect_retry_after_header=True)
 
 connect,read = 10,20
-s.mount('https://', HTTPAdapter(max_retries=retries))
-s.mount('http://', HTTPAdapter(max_retries=retries))
+# Pool sized for the concurrent partitioned fetch (api_calls.iter_streams_concurrently)
+s.mount('https://', HTTPAdapter(max_retries=retries, pool_maxsize=16))
+s.mount('http://', HTTPAdapter(max_retries=retries, pool_maxsize=16))
 
 logging.basicConfig(
     level=logging.INFO,  # or DEBUG to also see debug() messages
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
+MAX_THROTTLE_RETRIES = 5
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every outgoing request.
+
+    The refill rate adapts AIMD-style: each success nudges it up by `increase`
+    requests/sec, each 429 halves it and blocks all callers for the Retry-After delay.
+    """
+
+    def __init__(self, rate: float = 5.0, capacity: float = 5.0, min_rate: float = 0.5,
+                 max_rate: float = 50.0, increase: float = 0.25):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        # Block until a token is available (and any Retry-After pause has passed)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: float) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        logging.warning("Throttled by server; waiting %.1fs, rate now %.2f req/s", retry_after, self.rate)
+
+
+class PageSizeController:
+    """
+    Grow or shrink the GraphQL page size from observed latency and error rate.
+
+    Fast, clean pages grow the size by 25%; slow pages shrink it by 25%; failures halve it.
+    Growth is frozen while more than `max_error_rate` of the recent window failed.
+    """
+
+    def __init__(self, size: int = 500, min_size: int = 50, max_size: int = 2000,
+                 target_latency: float = 2.0, window: int = 20, max_error_rate: float = 0.1):
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def record(self, latency: float, ok: bool = True) -> int:
+        with self._lock:
+            self._outcomes.append(ok)
+            if not ok:
+                self.size = max(self.min_size, self.size // 2)
+            elif latency > self.target_latency * 1.5:
+                self.size = max(self.min_size, int(self.size * 0.75))
+            elif latency < self.target_latency / 2 and self.error_rate <= self.max_error_rate:
+                self.size = min(self.max_size, int(self.size * 1.25))
+            return self.size
+
+
+rate_limiter = TokenBucket()
+
+# Optional response cache; off unless configured (or ALKFRED_CACHE_DIR / ALKFRED_OFFLINE is set)
+response_cache: ResponseCache | None = None
+
+
+def configure_cache(root: str | Path | None, ttl: float | None = 86400, offline: bool = False,
+                    max_bytes: int = 512 * 1024 * 1024) -> ResponseCache | None:
+    # Install (or with root=None, remove) the cache used by help_request
+    global response_cache
+    if root is None:
+        if offline:
+            raise ValueError("Offline mode needs a cache directory to replay from")
+        response_cache = None
+    else:
+        response_cache = ResponseCache(Path(root), ttl=ttl, max_bytes=max_bytes, offline=offline)
+    return response_cache
+
+
+if os.getenv("ALKFRED_CACHE_DIR") or os.getenv("ALKFRED_OFFLINE"):
+    configure_cache(
+        os.getenv("ALKFRED_CACHE_DIR") or Path(__file__).resolve().parents[1] / "data" / "http_cache",
+        ttl=float(os.getenv("ALKFRED_CACHE_TTL", "86400")),
+        offline=os.getenv("ALKFRED_OFFLINE", "") not in ("", "0"),
+    )
+
+
+def _retry_after_seconds(value: str | None, attempt: int) -> float:
+    # Retry-After is either delta-seconds or an HTTP-date; fall back to exponential backoff
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(value)
+                return max(0.0, when.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return float(2 ** attempt)
+
         
 
        
@@ -33,25 +173,41 @@ logging.basicConfig(
 def normalize(s: str) -> str:
     #defining what normalizing should do
     return s.lower().replace("::", "-").replace("_", "-").strip()
-def normalize_label(s: str) -> str:
-    #defining what normalizing should do
-    return s.lower().replace("::", "-").replace("-", "_").replace(" ", "_").strip()
-    
+
 
 def help_request(url: str, headers: dict, payload: dict = None, method: str = "GET") -> dict:
     
 
+    cache_key = None
+    if response_cache is not None:
+        cache_key = response_cache.key(method, url, payload if method == "POST" else None)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        if response_cache.offline:
+            raise RuntimeError(f"Offline mode: no cached response for {method} {url}")
+
     try:
-        resp = s.request(
-        method=method,           # "GET" or "POST"
-        url=url,
-        headers=headers,
-        json=payload if method == "POST" else None,
-        timeout=(connect, read))
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            rate_limiter.acquire()
+            resp = s.request(
+            method=method,           # "GET" or "POST"
+            url=url,
+            headers=headers,
+            json=payload if method == "POST" else None,
+            timeout=(connect, read))
+            if resp.status_code != 429:
+                break
+            rate_limiter.on_throttle(_retry_after_seconds(resp.headers.get("Retry-After"), attempt))
+        else:
+            raise RuntimeError(f"Still rate limited by {url} after {MAX_THROTTLE_RETRIES} retries")
         if "application/json" not in resp.headers.get("Content-Type", ""):
             raise RuntimeError(f"Expected JSON but got {resp.headers.get('Content-Type')} from {url}")
         resp.raise_for_status()
         data = resp.json()
+        rate_limiter.on_success()
+        if cache_key is not None and not (isinstance(data, dict) and data.get("errors")):
+            response_cache.put(cache_key, url, data)
         
         return data 
     except requests.exceptions.Timeout:
@@ -0,0 +1,19 @@
+def civic_node(eid, doid="3908", therapy="Crizotinib", ncit=None, gene="ALK", variants=("G1202R",), ca_id="CA1",
+               significance="RESISTANCE", disease="Lung Non-small Cell Carcinoma"):
+    """A raw CIViC evidence item as the GraphQL fetch stores it; every variant gets `ca_id`."""
+    return {
+        "id": eid,
+        "status": "ACCEPTED",
+        "significance": significance,
+        "evidenceType": "PREDICTIVE",
+        "evidenceLevel": "B",
+        "evidenceRating": 3,
+        "evidenceDirection": "SUPPORTS",
+        "description": f"item {eid}",
+        "disease": {"doid": doid, "name": disease, "diseaseAliases": ["NSCLC"]},
+        "molecularProfile": {"id": 1, "name": f"{gene} {' '.join(variants)}",
+                             "variants": [{"name": v, "alleleRegistryId": ca_id, "feature": {"name": gene}}
+                                          for v in variants]},
+        "therapies": [{"name": therapy, "ncitId": ncit}],
+        "source": {"citationId": str(eid), "publicationYear": 2016},
+    }
@@ -1,19 +1,29 @@
 # tests/test_civic_fetch.py
 import json
+import threading
 from pathlib import Path
+import pytest
 from alkfred.etl import civic_fetch
 
+_real_resolve = civic_fetch.resolve_molecular_profile_ids
+
+
+@pytest.fixture(autouse=True)
+def _no_profile_resolution(monkeypatch):
+    # Unresolvable gene -> full-scan stream, which each test patches
+    monkeypatch.setattr(civic_fetch, "resolve_molecular_profile_ids", lambda oncogene: [])
+
 def test_fetch_returns_cached_when_not_overwrite(tmp_path, monkeypatch):
     raw = tmp_path / "civic_raw_evidence_db.json"
     raw.write_text(json.dumps([{"id": 1, "molecularProfile": {"name": "EML4-ALK"}}]))
 
     # no network call should happen if file exists and overwrite=False
     called = {"count": 0}
-    def _fake_fetch():
+    def _fake_pages(*a, **kw):
         called["count"] += 1
-        return [{"id": 999}]
+        yield [{"id": 999}], None
     # Patch the api fetcher just to prove it won't be called
-    monkeypatch.setattr(civic_fetch.api_calls, "fetch_civic_all_evidence_items", _fake_fetch)
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", _fake_pages)
 
     out = civic_fetch.fetch_civic_evidence(oncogene=None, raw_path=raw, overwrite=False, limit=None)
 
@@ -32,7 +42,7 @@ def test_fetch_filters_and_limit(tmp_path, monkeypatch):
     ]
 
     # patch network + gene detector
-    monkeypatch.setattr(civic_fetch.api_calls, "fetch_civic_all_evidence_items", lambda: payload)
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", lambda *a, **kw: iter([(payload, None)]))
     monkeypatch.setattr(civic_fetch.civic_parser, "gene_in_molecular_profile",
                         lambda name, oncogene: (oncogene == "ALK") and ("ALK" in (name or "")))
 
@@ -51,12 +61,132 @@ def test_fetch_overwrite_replaces_file(tmp_path, monkeypatch):
     raw = tmp_path / "civic_raw_evidence_db.json"
     raw.write_text(json.dumps([{"id": "OLD"}]))
 
-    monkeypatch.setattr(civic_fetch.api_calls, "fetch_civic_all_evidence_items",
-                        lambda: [{"id": 101, "molecularProfile": {"name": "EML4-ALK"}}])
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages",
+                        lambda *a, **kw: iter([([{"id": 101, "molecularProfile": {"name": "EML4-ALK"}}], None)]))
     monkeypatch.setattr(civic_fetch.civic_parser, "gene_in_molecular_profile",
                         lambda name, oncogene: True)
 
     out = civic_fetch.fetch_civic_evidence(oncogene=None, raw_path=raw, overwrite=True, limit=None)
 
     assert out == [{"id": 101, "molecularProfile": {"name": "EML4-ALK"}}]
-    assert json.loads(raw.read_text()) == out
\ No newline at end of file
+    assert json.loads(raw.read_text()) == out
+
+def test_fetch_streams_ndjson_page_by_page(tmp_path, monkeypatch):
+    raw = tmp_path / "civic_raw_evidence_db.ndjson"
+
+    pages = [
+        ([{"id": 1, "molecularProfile": {"name": "EML4::ALK"}},
+          {"id": 2, "molecularProfile": {"name": "EGFR L858R"}}], "c1"),
+        ([{"id": 3, "molecularProfile": {"name": "ALK F1174L"}}], "c2"),
+    ]
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", lambda *a, **kw: iter(pages))
+
+    out = civic_fetch.fetch_civic_evidence(oncogene="ALK", raw_path=raw, overwrite=True, limit=None)
+
+    # nothing is materialized in NDJSON mode
+    assert out is None
+    lines = [json.loads(l) for l in raw.read_text().splitlines()]
+    assert [l["id"] for l in lines] == [1, 3]
+    assert not raw.with_name(raw.name + ".part").exists()
+
+def test_fetch_resumes_from_checkpoint(tmp_path, monkeypatch):
+    raw = tmp_path / "civic_raw_evidence_db.json"
+    page1 = [{"id": 1, "molecularProfile": {"name": "ALK F1174L"}}]
+    page2 = [{"id": 2, "molecularProfile": {"name": "EML4::ALK"}}]
+    cursors_seen = []
+
+    def _flaky_pages(after_cursor=None, seen_ids=None, filters=None):
+        cursors_seen.append(after_cursor)
+        if after_cursor is None:
+            yield page1, "c1"
+            raise RuntimeError("Request failed after retries")
+        yield page2, "c2"
+
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", _flaky_pages)
+
+    with pytest.raises(RuntimeError):
+        civic_fetch.fetch_civic_evidence(oncogene="ALK", raw_path=raw, overwrite=True)
+    checkpoint, partial = civic_fetch.checkpoint_paths(raw)
+    assert json.loads(checkpoint.read_text())["cursors"] == {"all": "c1"}
+    assert not raw.exists()
+
+    out = civic_fetch.fetch_civic_evidence(oncogene="ALK", raw_path=raw, overwrite=True, resume=True)
+
+    assert cursors_seen == [None, "c1"]
+    assert [ei["id"] for ei in out] == [1, 2]
+    assert not checkpoint.exists() and not partial.exists()
+
+
+def test_fetch_pushes_gene_filter_to_server(tmp_path, monkeypatch):
+    raw = tmp_path / "civic_raw_evidence_db.json"
+    monkeypatch.setattr(civic_fetch, "resolve_molecular_profile_ids", _real_resolve)
+    monkeypatch.setattr(civic_fetch.api_calls, "fetch_gene_molecular_profile_ids", lambda symbol: {10: "ALK F1174L"})
+    # name search also returns a false positive that the token matcher must drop
+    monkeypatch.setattr(civic_fetch.api_calls, "search_molecular_profiles",
+                        lambda name: {11: "EML4::ALK", 12: "TALK1 Fusion"})
+
+    requested = []
+    by_profile = {
+        10: [{"id": 1, "molecularProfile": {"id": 10, "name": "ALK F1174L"}}],
+        11: [{"id": 2, "molecularProfile": {"id": 11, "name": "EML4::ALK"}}],
+    }
+
+    def _pages(after_cursor=None, seen_ids=None, filters=None):
+        requested.append(filters)
+        yield by_profile[filters["molecularProfileId"]], None
+
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", _pages)
+
+    out = civic_fetch.fetch_civic_evidence(oncogene="ALK", raw_path=raw, overwrite=True)
+
+    assert requested == [{"molecularProfileId": 10}, {"molecularProfileId": 11}]
+    assert [ei["id"] for ei in out] == [1, 2]
+
+
+def test_fetch_partitions_concurrently_and_dedupes(tmp_path, monkeypatch):
+    raw = tmp_path / "civic_raw_evidence_db.json"
+    threads = set()
+
+    def _pages(after_cursor=None, seen_ids=None, filters=None):
+        threads.add(threading.current_thread().name)
+        etype = filters["evidenceType"]
+        if etype == "PREDICTIVE":
+            yield [{"id": 1, "molecularProfile": {"name": "ALK F1174L"}}], "p1"
+            yield [{"id": 2, "molecularProfile": {"name": "EML4::ALK"}}], "p2"
+        elif etype == "DIAGNOSTIC":
+            # id 2 also shows up here and must only be written once
+            yield [{"id": 2, "molecularProfile": {"name": "EML4::ALK"}},
+                   {"id": 3, "molecularProfile": {"name": "ALK R1275Q"}}], "d1"
+        else:
+            yield [], None
+
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", _pages)
+
+    out = civic_fetch.fetch_civic_evidence(oncogene="ALK", raw_path=raw, overwrite=True, workers=3)
+
+    assert sorted(ei["id"] for ei in out) == [1, 2, 3]
+    assert all(name.startswith("civic-fetch") for name in threads)
+
+
+def test_fetch_multi_oncogene_single_pass_shards(tmp_path, monkeypatch):
+    raw = tmp_path / "civic_raw_evidence_db.json"
+    passes = []
+
+    def _pages(after_cursor=None, seen_ids=None, filters=None):
+        passes.append(filters)
+        yield [
+            {"id": 1, "molecularProfile": {"name": "EML4::ALK"}},
+            {"id": 2, "molecularProfile": {"name": "CD74::ROS1"}},
+            {"id": 3, "molecularProfile": {"name": "EGFR L858R and ALK Fusion"}},
+            {"id": 4, "molecularProfile": {"name": "BRAF V600E"}},
+        ], None
+
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", _pages)
+
+    out = civic_fetch.fetch_civic_evidence(oncogene="ALK,ROS1,EGFR", raw_path=raw, overwrite=True)
+
+    assert len(passes) == 1  # one pass over the stream for all genes
+    assert {g: [ei["id"] for ei in items] for g, items in out.items()} == {"ALK": [1, 3], "ROS1": [2], "EGFR": [3]}
+    for gene in ("ALK", "ROS1", "EGFR"):
+        shard = tmp_path / f"civic_raw_evidence_db_{gene}.json"
+        assert json.loads(shard.read_text()) == out[gene]
@@ -0,0 +1,71 @@
+# tests/test_civic_sync.py
+import json
+from alkfred.etl import civic_fetch, civic_sync
+
+
+def _patch_pages(monkeypatch, nodes):
+    monkeypatch.setattr(civic_fetch, "resolve_molecular_profile_ids", lambda oncogene: [])
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", lambda *a, **kw: iter([(nodes, None)]))
+
+
+def test_sync_merges_only_deltas(tmp_path, monkeypatch):
+    raw = tmp_path / "civic_raw_evidence_db.json"
+    first = [
+        {"id": 1, "molecularProfile": {"name": "EML4::ALK"}, "description": "a"},
+        {"id": 2, "molecularProfile": {"name": "ALK F1174L"}, "description": "b"},
+        {"id": 3, "molecularProfile": {"name": "ALK G1202R"}, "description": "c"},
+    ]
+    _patch_pages(monkeypatch, first)
+    counts = civic_sync.sync_civic_evidence(oncogene="ALK", raw_path=raw)
+    assert counts == {"new": 3, "changed": 0, "withdrawn": 0, "unchanged": 0}
+
+    manifest = json.loads((tmp_path / "civic_raw_evidence_db.sync.json").read_text())
+    assert manifest["last_run_utc"]
+    assert set(manifest["hashes"]) == {"1", "2", "3"}
+
+    # 1 unchanged, 2 edited upstream, 3 withdrawn, 4 new
+    second = [
+        first[0],
+        {"id": 2, "molecularProfile": {"name": "ALK F1174L"}, "description": "b2"},
+        {"id": 4, "molecularProfile": {"name": "ALK L1196M"}, "description": "d"},
+    ]
+    _patch_pages(monkeypatch, second)
+    counts = civic_sync.sync_civic_evidence(oncogene="ALK", raw_path=raw)
+    assert counts == {"new": 1, "changed": 1, "withdrawn": 1, "unchanged": 1}
+
+    on_disk = {n["id"]: n for n in json.loads(raw.read_text())}
+    assert set(on_disk) == {1, 2, 4}
+    assert on_disk[2]["description"] == "b2"
+
+
+def test_sync_shards_share_one_pass_and_diff_per_gene(tmp_path, monkeypatch):
+    raw = tmp_path / "civic_raw_evidence_db.json"
+    passes = []
+
+    def _pages(nodes):
+        def pages(*a, **kw):
+            passes.append(1)
+            return iter([(nodes, None)])
+        return pages
+
+    first = [
+        {"id": 1, "molecularProfile": {"name": "EML4::ALK"}, "description": "a"},
+        {"id": 2, "molecularProfile": {"name": "CD74::ROS1"}, "description": "b"},
+    ]
+    monkeypatch.setattr(civic_fetch, "resolve_molecular_profile_ids", lambda oncogene: [])
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", _pages(first))
+    counts = civic_sync.sync_civic_shards(oncogene="ALK,ROS1", raw_path=raw)
+    assert counts["ALK"]["new"] == counts["ROS1"]["new"] == 1
+    assert len(passes) == 1
+
+    # ROS1 item edited, a new ALK item: each shard sees only its own delta
+    second = [first[0], {"id": 2, "molecularProfile": {"name": "CD74::ROS1"}, "description": "b2"},
+              {"id": 3, "molecularProfile": {"name": "ALK L1196M"}, "description": "c"}]
+    monkeypatch.setattr(civic_fetch.api_calls, "iter_civic_evidence_pages", _pages(second))
+    counts = civic_sync.sync_civic_shards(oncogene="ALK,ROS1", raw_path=raw)
+    assert counts == {"ALK": {"new": 1, "changed": 0, "withdrawn": 0, "unchanged": 1},
+                      "ROS1": {"new": 0, "changed": 1, "withdrawn": 0, "unchanged": 0}}
+    assert len(passes) == 2
+    assert [n["id"] for n in json.loads((tmp_path / "civic_raw_evidence_db_ALK.json").read_text())] == [1, 3]
+    assert json.loads((tmp_path / "civic_raw_evidence_db_ROS1.json").read_text())[0]["description"] == "b2"
+    assert not list(tmp_path.glob("*.partial.ndjson")) and not list(tmp_path.glob("*.checkpoint.json"))
@@ -0,0 +1,39 @@
+import pytest
+
+from alkfred import config
+from alkfred.sql import evidence_fact_create
+
+
+def _seed(conn, links=3):
+    config.create_schema(conn)
+    conn.execute("INSERT INTO dim_disease (doid, label_display, label_disease_norm) VALUES ('3908', 'NSCLC', 'nsclc')")
+    conn.execute("INSERT INTO dim_gene_variant (variant_id, gene_symbol, label_display, label_gene_variant_norm) "
+                 "VALUES ('CA1', 'ALK', 'G1202R', 'g1202r')")
+    for i in range(links):
+        conn.execute("INSERT INTO dim_therapy (therapy_id, label_display, label_therapy_norm) VALUES (?, ?, ?)",
+                     (f"t{i}", f"drug{i}", f"drug{i}"))
+        conn.execute("INSERT INTO dim_evidence (eid, direction, significance) VALUES (?, 'supports', 'resistance')",
+                     (i + 1,))
+        conn.execute("INSERT INTO evidence_link (eid, disease_key, variant_key, therapy_key) VALUES (?, 1, 1, ?)",
+                     (i + 1, i + 1))
+    conn.commit()
+
+
+@pytest.mark.parametrize("set_based", [True, False])
+def test_insert_facts_builds_keyed_rows(tmp_path, set_based, monkeypatch):
+    monkeypatch.setattr(evidence_fact_create, "STREAM_BATCH", 2)
+    conn = config.get_conn(tmp_path / "facts.sqlite")
+    _seed(conn)
+
+    assert evidence_fact_create.insert_facts(conn, set_based=set_based) == 3
+    assert evidence_fact_create.insert_facts(conn, set_based=set_based) == 0  # idempotent
+
+    rows = conn.execute("SELECT f.fact_id, f.eid, d.doid, v.variant_id, t.therapy_id, f.direction, f.significance "
+                        "FROM fact_evidence f "
+                        "JOIN dim_disease d USING (disease_key) "
+                        "JOIN dim_gene_variant v USING (variant_key) "
+                        "JOIN dim_therapy t USING (therapy_key) ORDER BY f.eid").fetchall()
+    assert [tuple(r)[:5] for r in rows] == [(1, 1, "3908", "CA1", "t0"), (2, 2, "3908", "CA1", "t1"),
+                                           (3, 3, "3908", "CA1", "t2")]
+    assert {(r["direction"], r["significance"]) for r in rows} == {("SUPPORTS", "RESISTANCE")}
+    conn.close()
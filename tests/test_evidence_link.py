@@ -0,0 +1,59 @@
+from alkfred import config
+from alkfred.sql import evidence_link_create
+from conftest import civic_node
+
+
+def test_insert_links_writes_dims_and_links_in_bulk(tmp_path):
+    conn = config.get_conn(tmp_path / "links.sqlite")
+    config.create_schema(conn)
+    # therapy known by label only; the raw data now brings its NCIt id
+    conn.execute("INSERT INTO dim_therapy (therapy_id, label_display, label_therapy_norm) VALUES ('t-criz', 'Crizotinib', 'crizotinib')")
+    conn.commit()
+
+    nodes = [civic_node(i, ncit="C74061", variants=("G1202R", "L1196M"), ca_id=None) for i in range(1, 51)]
+    nodes.append(civic_node(99, therapy="Lorlatinib", ca_id=None))
+    links = evidence_link_create.insert_links(conn, nodes, oncogene="ALK")
+
+    assert links == 50 * 2 + 1
+    assert conn.execute("SELECT ncit_id FROM dim_therapy WHERE therapy_id = 't-criz'").fetchone()[0] == "C74061"
+    assert conn.execute("SELECT COUNT(*) FROM dim_gene_variant").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM dim_evidence").fetchone()[0] == 51
+    assert conn.execute("SELECT COUNT(*) FROM evidence_link").fetchone()[0] == 101
+    assert conn.execute("SELECT COUNT(*) FROM pragma_foreign_key_check").fetchone()[0] == 0
+    conn.close()
+
+
+def _build(path, nodes, parallel):
+    conn = config.get_conn(path, check_same_thread=False)
+    config.create_schema(conn)
+    if parallel:
+        n = evidence_link_create.insert_links_parallel(conn, nodes, oncogene="ALK", workers=2)
+    else:
+        n = evidence_link_create.insert_links(conn, nodes, oncogene="ALK")
+    # Surrogate keys depend on write order: compare by natural id
+    dump = {t: sorted(tuple(r) for r in conn.execute(sql)) for t, sql in {
+        "evidence_link": "SELECT l.eid, d.doid, v.variant_id, t.therapy_id FROM evidence_link l "
+                         "JOIN dim_disease d USING (disease_key) JOIN dim_gene_variant v USING (variant_key) "
+                         "JOIN dim_therapy t USING (therapy_key)",
+        "dim_gene_variant": "SELECT variant_id, civic_ca_id, gene_symbol FROM dim_gene_variant",
+        "dim_therapy": "SELECT therapy_id, ncit_id, label_therapy_norm FROM dim_therapy",
+        "dim_evidence": "SELECT eid, direction, significance FROM dim_evidence",
+        "dim_disease": "SELECT doid, label_display, label_disease_norm FROM dim_disease",
+    }.items()}
+    conn.close()
+    return n, dump
+
+
+def test_insert_links_parallel_matches_serial(tmp_path):
+    nodes = [civic_node(i, therapy=f"drug{i % 7}", ncit=f"C{i % 7}" if i % 7 else None, variants=("G1202R", f"V{i % 5}"),
+                        ca_id=None)
+             for i in range(1, 121)]
+    assert _build(tmp_path / "parallel.sqlite", nodes, True) == _build(tmp_path / "serial.sqlite", nodes, False)
+
+
+def test_insert_links_parallel_agrees_on_therapies_seen_with_and_without_ncit(tmp_path):
+    # eids 2 and 10 share a shard that meets Crizotinib without its NCIt id first; eid 1's shard has it
+    nodes = [civic_node(1, ncit="C1", ca_id=None), civic_node(2, ca_id=None), civic_node(10, ncit="C1", ca_id=None)]
+    n, dump = _build(tmp_path / "parallel.sqlite", nodes, True)
+    assert (n, dump) == _build(tmp_path / "serial.sqlite", nodes, False)
+    assert n == 3 and len(dump["dim_therapy"]) == 1
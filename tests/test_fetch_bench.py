@@ -0,0 +1,25 @@
+import pytest
+
+from alkfred.bench.fetch_bench import run_fetch_bench
+from alkfred.bench.mock_civic import MockCivicServer, profile_for, synthetic_evidence
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_bench_drains_mock_server_under_faults(workers):
+    server = MockCivicServer(total=300, rate_429=0.1, burst_5xx_every=4, burst_len=1, max_page=50, seed=1)
+    with server:
+        r = run_fetch_bench(server, workers=workers, page_size=50, rate=500.0)
+    assert r["items"] == 300
+    assert r["retries"] == r["http_429"] + r["http_5xx"]
+    assert r["http_5xx"] >= 1
+    assert 0.0 < r["retry_overhead"] < 1.0
+
+
+def test_bench_gene_filter_matches_synthetic_corpus():
+    total = 400
+    expected = sum(1 for eid in range(1, total + 1)
+                   if synthetic_evidence(eid)["molecularProfile"]["variants"][0]["feature"]["name"] == "ALK")
+    with MockCivicServer(total=total) as server:
+        r = run_fetch_bench(server, workers=2, page_size=100, rate=500.0, gene="ALK")
+    assert r["items"] == expected
+    assert profile_for(1) == ("ALK", "EML4::ALK")
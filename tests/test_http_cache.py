@@ -0,0 +1,107 @@
+# tests/test_http_cache.py
+import os
+import time
+import pytest
+import api_calls
+import utils
+from alkfred.bench.mock_civic import MockCivicServer
+from alkfred.etl import civic_fetch
+from http_cache import ResponseCache
+
+
+class _JsonResponse:
+    status_code = 200
+    headers = {"Content-Type": "application/json"}
+
+    def __init__(self, body):
+        self._body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._body
+
+
+def test_cache_key_is_content_addressed():
+    a = ResponseCache.key("POST", "https://x/graphql", {"query": "q", "variables": {"a": 1, "b": 2}})
+    b = ResponseCache.key("post", "https://x/graphql", {"variables": {"b": 2, "a": 1}, "query": "q"})
+    c = ResponseCache.key("POST", "https://x/graphql", {"query": "q", "variables": {"a": 2, "b": 2}})
+    assert a == b
+    assert a != c
+    # the adaptive page size is not part of a page's identity
+    d = ResponseCache.key("POST", "https://x/graphql", {"query": "q", "variables": {"a": 1, "b": 2, "first": 625}})
+    assert a == d
+
+
+def test_cache_ttl_and_eviction(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=60, max_bytes=10_000)
+    cache.put("aa01", "u", {"n": 1})
+    assert cache.get("aa01") == {"n": 1}
+
+    # age the entry past its TTL
+    path = tmp_path / "aa" / "aa01.json"
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert cache.get("aa01") is None
+
+    small = ResponseCache(tmp_path / "small", ttl=None, max_bytes=300)
+    for i in range(5):
+        small.put(f"bb{i:02d}", "u", {"blob": "x" * 100, "i": i})
+    assert small.get("bb04") is not None
+    assert small.get("bb00") is None  # least recently used went first
+
+
+def test_help_request_serves_hits_and_offline_misses_fail(tmp_path, monkeypatch):
+    calls = []
+
+    def _request(**kw):
+        calls.append(kw)
+        return _JsonResponse({"data": {"n": len(calls)}})
+
+    monkeypatch.setattr(utils.s, "request", _request)
+    monkeypatch.setattr(utils, "rate_limiter", utils.TokenBucket(rate=100.0, capacity=100.0))
+    utils.configure_cache(tmp_path, ttl=3600)
+    try:
+        first = utils.help_request("https://x/graphql", {}, payload={"query": "q"}, method="POST")
+        second = utils.help_request("https://x/graphql", {}, payload={"query": "q"}, method="POST")
+        assert first == second == {"data": {"n": 1}}
+        assert len(calls) == 1
+
+        utils.configure_cache(tmp_path, offline=True)
+        assert utils.help_request("https://x/graphql", {}, payload={"query": "q"}, method="POST") == first
+        with pytest.raises(RuntimeError, match="Offline mode"):
+            utils.help_request("https://x/graphql", {}, payload={"query": "other"}, method="POST")
+        assert len(calls) == 1
+    finally:
+        utils.configure_cache(None)
+
+
+def _drain(page_sizer):
+    api_calls.page_sizer = page_sizer
+    items = []
+    for _, nodes, _ in civic_fetch.iter_stream_pages(civic_fetch.plan_streams(None), workers=1):
+        items.extend(n["id"] for n in nodes or ())
+    return items
+
+
+def test_offline_replay_survives_a_different_page_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "rate_limiter", utils.TokenBucket(rate=500.0, capacity=500.0))
+    monkeypatch.setattr(api_calls, "page_sizer", api_calls.page_sizer)
+    server = MockCivicServer(total=240, latency=0.05)
+    utils.configure_cache(tmp_path, ttl=3600)
+    try:
+        with server:
+            monkeypatch.setattr(api_calls, "GRAPHQL_URL", server.url)
+            # 50 ms pages sit inside the target band: the size holds at 50 while recording
+            online = _drain(utils.PageSizeController(size=50, target_latency=0.04))
+            requests = server.stats["requests"]
+        utils.configure_cache(tmp_path, offline=True)
+        # replayed pages come back instantly, so this controller grows past anything recorded
+        sizer = utils.PageSizeController(size=50, target_latency=0.04)
+        assert _drain(sizer) == online
+        assert sizer.size > 50
+        assert server.stats["requests"] == requests
+    finally:
+        utils.configure_cache(None)
+    assert len(online) == 240
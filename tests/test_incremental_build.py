@@ -0,0 +1,44 @@
+import copy
+
+from alkfred import config
+from alkfred.sql.incremental_build import incremental_build
+from conftest import civic_node
+
+
+
+def _facts(conn):
+    return {(r["eid"], r["significance"]) for r in conn.execute("SELECT eid, significance FROM fact_evidence")}
+
+
+def _query_rows(conn):
+    return {(r["eid"], r["significance"], r["disease_norm"]) for r in conn.execute("SELECT * FROM query_evidence")}
+
+
+def test_incremental_build_applies_only_what_moved(tmp_path):
+    conn = config.get_conn(tmp_path / "inc.sqlite")
+    config.create_schema(conn)
+    nodes = [civic_node(1), civic_node(2, therapy="Lorlatinib"), civic_node(3, doid="3910")]
+
+    first = incremental_build(conn, {"ALK": nodes})
+    assert (first["new"], first["changed"], first["withdrawn"]) == (3, 0, 0)
+    assert _facts(conn) == {(1, "RESISTANCE"), (2, "RESISTANCE"), (3, "RESISTANCE")}
+
+    assert incremental_build(conn, {"ALK": copy.deepcopy(nodes)})["unchanged"] == 3
+
+    updated = [civic_node(1, significance="SENSITIVITYRESPONSE"), civic_node(2, therapy="Lorlatinib"), civic_node(4)]
+    counts = incremental_build(conn, {"ALK": updated})
+
+    assert (counts["new"], counts["changed"], counts["withdrawn"], counts["unchanged"]) == (1, 1, 1, 1)
+    assert _facts(conn) == {(1, "SENSITIVITYRESPONSE"), (2, "RESISTANCE"), (4, "RESISTANCE")}
+    assert conn.execute("SELECT significance FROM dim_evidence WHERE eid = 1").fetchone()[0] == "SENSITIVITYRESPONSE"
+    assert conn.execute("SELECT COUNT(*) FROM dim_evidence WHERE eid = 3").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM evidence_link WHERE eid = 3").fetchone()[0] == 0
+    assert {r[0] for r in conn.execute("SELECT eid FROM build_state")} == {1, 2, 4}
+    assert conn.execute("SELECT COUNT(*) FROM pragma_foreign_key_check").fetchone()[0] == 0
+    assert {(eid, sig) for eid, sig, _ in _query_rows(conn)} == _facts(conn)
+
+    # Renaming a shared disease through eid 4 also refreshes the lookup rows of untouched eid 2
+    renamed = updated[:2] + [civic_node(4, disease="NSCLC")]
+    assert incremental_build(conn, {"ALK": renamed})["changed"] == 1
+    assert {eid: norm for eid, _, norm in _query_rows(conn)} == {1: "nsclc", 2: "nsclc", 4: "nsclc"}
+    conn.close()
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from alkfred import config
+from alkfred.sql import keys
+
+
+def test_registry_resolves_natural_ids_to_allocated_keys(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(keys, "LOOKUP_CHUNK", 2)
+    conn = config.get_conn(tmp_path / "keys.sqlite")
+    config.create_schema(conn)
+    for doid in ("3908", "3910", "1324"):
+        conn.execute("INSERT INTO dim_disease (doid, label_display, label_disease_norm) VALUES (?, ?, ?)",
+                     (doid, doid, doid))
+    conn.execute("INSERT INTO dim_gene_variant (variant_id, gene_symbol, label_display, label_gene_variant_norm) "
+                 "VALUES ('CA1', 'ALK', 'G1202R', 'g1202r')")
+    conn.execute("INSERT INTO dim_therapy (therapy_id, label_display, label_therapy_norm) VALUES ('t1', 'x', 'x')")
+
+    registry = keys.KeyRegistry()
+    assert registry.resolve(conn, "disease", ["3908", "1324", "9999"]) == {"3908": 1, "1324": 3}
+    assert registry.get("disease", "3910") is None  # not fetched yet
+    assert registry.load(conn).get("disease", "3910") == 2
+
+    links = [(7, "3910", "CA1", "t1", "mp"), (8, "3910", "CA404", "t1", "mp")]
+    assert registry.link_keys(conn, links) == [(7, 2, 1, 1, "mp")]
+    assert "Dropped 1 of 2 links" in caplog.text and "[8]" in caplog.text
+    conn.close()
+
+
+def test_create_schema_rejects_text_key_database(tmp_path):
+    db = tmp_path / "old.sqlite"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE fact_evidence (fact_id TEXT PRIMARY KEY)")
+    with pytest.raises(RuntimeError, match="rebuild"):
+        config.create_schema(conn)
+    conn.close()
@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+
+import pytest
+
+from alkfred import config, pipeline
+from conftest import civic_node
+
+
+def test_run_pipeline_orders_stages_and_overlaps_non_db_stages(tmp_path):
+    ctx = pipeline.BuildContext(db_path=tmp_path / "x.sqlite", shards={})
+    both_running = threading.Barrier(2, timeout=5)
+    order = []
+
+    def parse(ctx):
+        both_running.wait()  # deadlocks (times out) unless parse and schema overlap
+        order.append("parse")
+        return 3
+
+    def schema(ctx):
+        both_running.wait()
+        order.append("schema")
+        return 0
+
+    stages = [
+        pipeline.Stage("load", lambda ctx: order.append("load") or 5, deps=("parse", "schema")),
+        pipeline.Stage("parse", parse, uses_db=False),
+        pipeline.Stage("schema", schema),
+    ]
+    results = pipeline.run_pipeline(stages, ctx)
+
+    assert order[-1] == "load"
+    assert {r.name: r.rows for r in results} == {"parse": 3, "schema": 0, "load": 5}
+
+
+def test_run_pipeline_rejects_cycles_and_unknown_deps(tmp_path):
+    ctx = pipeline.BuildContext(db_path=tmp_path / "x.sqlite", shards={})
+    with pytest.raises(ValueError, match="Cycle"):
+        pipeline.run_pipeline([pipeline.Stage("a", lambda c: 0, deps=("b",)),
+                               pipeline.Stage("b", lambda c: 0, deps=("a",))], ctx)
+    with pytest.raises(ValueError, match="unknown stage"):
+        pipeline.run_pipeline([pipeline.Stage("a", lambda c: 0, deps=("nope",))], ctx)
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_build_stages_end_to_end(tmp_path, bulk):
+    raw = tmp_path / "raw.json"
+    config.save_to_json([civic_node(1), civic_node(2, doid="3910", therapy="Lorlatinib")], raw)
+    db = tmp_path / "alkfred.sqlite"
+
+    ctx = pipeline.BuildContext(db_path=db, shards={"ALK": raw}, bulk=bulk)
+    results = pipeline.run_pipeline(pipeline.build_stages(["ALK"], bulk=bulk), ctx)
+
+    rows = {r.name: r.rows for r in results}
+    assert rows["parse:ALK"] == 2
+    assert rows["links:ALK"] == 2
+    assert rows["facts"] == 2
+    assert ("fk_check" in rows) is bulk
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM fact_evidence").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'idx_%'").fetchone()[0] > 0
+    assert results[-1].name == "optimize"
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1 WHERE tbl = 'fact_evidence'").fetchone()[0] > 0
+    conn.close()
+
+
+def test_build_stages_keeps_generic_variants_apart_per_gene(tmp_path):
+    # "Fusion" has no CA id in either gene: each shard's evidence must land on its own gene's row
+    shards = {}
+    for gene, eid in (("ALK", 1), ("ROS1", 2)):
+        shards[gene] = tmp_path / f"{gene}.json"
+        config.save_to_json([civic_node(eid, gene=gene, variants=("Fusion",), ca_id=None)], shards[gene])
+    db = tmp_path / "alkfred.sqlite"
+    pipeline.run_pipeline(pipeline.build_stages(["ALK", "ROS1"]), pipeline.BuildContext(db_path=db, shards=shards))
+
+    conn = sqlite3.connect(db)
+    genes = dict(conn.execute("SELECT f.eid, v.gene_symbol FROM fact_evidence AS f "
+                              "JOIN dim_gene_variant AS v USING (variant_key)"))
+    assert genes == {1: "ALK", 2: "ROS1"}
+    assert conn.execute("SELECT COUNT(*) FROM dim_gene_variant WHERE label_gene_variant_norm = 'fusion'").fetchone()[0] == 2
+    conn.close()
+
+
+def test_incremental_build_over_fewer_genes_leaves_the_others_alone(tmp_path):
+    shards = {"ALK": tmp_path / "ALK.json", "ROS1": tmp_path / "ROS1.json"}
+    config.save_to_json([civic_node(1), civic_node(3, therapy="Lorlatinib")], shards["ALK"])
+    config.save_to_json([civic_node(2, gene="ROS1", variants=("Fusion",), ca_id=None)], shards["ROS1"])
+    db = tmp_path / "alkfred.sqlite"
+
+    def run(genes):
+        ctx = pipeline.BuildContext(db_path=db, shards={g: shards[g] for g in genes})
+        pipeline.run_pipeline(pipeline.build_stages(genes, incremental=True), ctx)
+        ctx.close()
+        return ctx.results["incremental"]
+
+    def eids(table):
+        conn = sqlite3.connect(db)
+        try:
+            return {r[0] for r in conn.execute(f"SELECT eid FROM {table}")}
+        finally:
+            conn.close()
+
+    pipeline.run_pipeline(pipeline.build_stages(["ALK", "ROS1"]), pipeline.BuildContext(db_path=db, shards=shards))
+    # Full-build evidence has no build_state: its gene comes from the links
+    assert run(["ALK"])["withdrawn"] == 0
+    assert eids("fact_evidence") == eids("query_evidence") == {1, 2, 3}
+
+    config.save_to_json([civic_node(1)], shards["ALK"])
+    assert run(["ALK"])["withdrawn"] == 1
+    assert run(["ROS1"])["withdrawn"] == 0  # ALK eids now carry their gene in build_state
+    assert eids("dim_evidence") == eids("fact_evidence") == eids("query_evidence") == {1, 2}
+
+
+def test_incremental_build_skips_a_gene_whose_snapshot_is_missing(tmp_path):
+    raw = tmp_path / "ALK.json"
+    config.save_to_json([civic_node(1), civic_node(2, therapy="Lorlatinib")], raw)
+    db = tmp_path / "alkfred.sqlite"
+    pipeline.run_pipeline(pipeline.build_stages(["ALK"]), pipeline.BuildContext(db_path=db, shards={"ALK": raw}))
+
+    raw.unlink()
+    ctx = pipeline.BuildContext(db_path=db, shards={"ALK": raw})
+    results = pipeline.run_pipeline(pipeline.build_stages(["ALK"], incremental=True), ctx)
+    ctx.close()
+    assert ctx.results["incremental"]["withdrawn"] == 0
+    assert {r.name: r.rows for r in results}["parse:ALK"] == 0
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM fact_evidence").fetchone()[0] == 2
+    conn.close()
@@ -0,0 +1,162 @@
+import io
+import json
+import subprocess
+import sys
+import types
+
+import pytest
+
+from alkfred import config
+from alkfred import query as q
+from alkfred.cli.query import batch_items, build_query, run_batch, stream_query
+from alkfred.sql.query_evidence_create import refresh_query_evidence
+
+
+def _db(tmp_path):
+    db = tmp_path / "query.sqlite"
+    conn = config.get_conn(db)
+    config.create_schema(conn)
+    conn.execute("INSERT INTO dim_disease (doid, label_display, label_disease_norm) VALUES ('3908', 'NSCLC', 'nsclc')")
+    conn.execute("INSERT INTO dim_gene_variant (variant_id, gene_symbol, label_display, label_gene_variant_norm) "
+                 "VALUES ('CA1', 'ALK', 'G1202R', 'g1202r')")
+    conn.execute("INSERT INTO dim_gene_variant (variant_id, gene_symbol, label_display, label_gene_variant_norm) "
+                 "VALUES ('CA2', 'ALK', 'ALK L1196M', 'alk_l1196m')")
+    for i, (drug, significance) in enumerate([("Lorlatinib", "SENSITIVITY"), ("crizotinib", "RESISTANCE"),
+                                              ("Alectinib", "RESISTANCE"), ("Brigatinib", "RESISTANCE")], start=1):
+        conn.execute("INSERT INTO dim_therapy (therapy_id, label_display, label_therapy_norm) VALUES (?, ?, ?)",
+                     (f"t{i}", drug, drug.lower()))
+        conn.execute("INSERT INTO dim_evidence (eid, direction, significance) VALUES (?, 'SUPPORTS', ?)", (i, significance))
+        conn.execute("INSERT INTO fact_evidence (eid, variant_key, disease_key, therapy_key, direction, significance) "
+                     "VALUES (?, ?, 1, ?, 'SUPPORTS', ?)", (i, 1 + (i == 4), i, significance))
+    conn.commit()
+    refresh_query_evidence(conn)
+    conn.close()
+    return db
+
+
+def test_query_builder_is_immutable_and_shapes_share_sql():
+    base = q.Query().where(variant="g1202r")
+    narrowed = base.where(significance="RESISTANCE").limit(5)
+    assert base.filters == (("variant", ("g1202r",)),) and base.max_rows is None
+    assert narrowed.where(significance=None).filters == base.filters
+
+    other = q.Query().limit(9).where(significance="SENSITIVITY", variant="l1196m")
+    assert other.shape == narrowed.shape
+    assert other.sql() is narrowed.sql()  # compiled once per shape
+    assert other.params() == ["l1196m", "SENSITIVITY", 9]
+
+    with pytest.raises(ValueError, match="Unknown filter"):
+        q.Query().where(colour="red")
+    with pytest.raises(ValueError):
+        q.Query().limit(0)
+
+
+def test_engine_streams_rows_in_cli_order(tmp_path):
+    with q.QueryEngine(_db(tmp_path)) as engine:
+        rows = engine.iter_rows(q.Query().where(variant="g1202r"))
+        assert isinstance(rows, types.GeneratorType)
+        assert [r["label_display"] for r in rows] == ["Alectinib", "crizotinib", "Lorlatinib"]
+
+        resistant = list(engine.select(variant=["g1202r", "alk_l1196m"], significance="RESISTANCE", limit=2))
+        assert [(r["eid"], r["variant_id"]) for r in resistant] == [(3, "CA1"), (4, "CA2")]
+        assert set(resistant[0]) == set(q.COLUMNS)
+
+        many = q.Query().where(eid=list(range(1, q.INLINE_VALUES + 5)))
+        assert "json_each" in many.sql()
+        assert len(list(engine.iter_rows(many))) == 4
+
+
+def test_cli_query_matches_labels_with_or_without_gene(tmp_path):
+    assert q.variant_labels("G1202R", gene="ALK") == ("g1202r", "alk_g1202r")
+    assert q.variant_labels("ALK G1202R", gene="ALK") == ("g1202r", "alk_g1202r")
+    assert q.variant_labels("G1202R") == ("g1202r",)
+    with q.QueryEngine(_db(tmp_path)) as engine:
+        assert [r["eid"] for r in engine.iter_rows(build_query("L1196M", 10, "all", "all"))] == [4]
+        assert [r["eid"] for r in engine.iter_rows(build_query("alk g1202r", 10, "sens", "nsclc"))] == [1]
+
+
+def test_gene_filters_rows_of_shared_variant_labels(tmp_path):
+    db = _db(tmp_path)
+    conn = config.get_conn(db)
+    conn.execute("INSERT INTO dim_gene_variant (variant_id, gene_symbol, label_display, label_gene_variant_norm) "
+                 "VALUES ('CA3', 'ROS1', 'G1202R', 'g1202r')")
+    conn.execute("INSERT INTO dim_evidence (eid, direction, significance) VALUES (5, 'SUPPORTS', 'RESISTANCE')")
+    conn.execute("INSERT INTO fact_evidence (eid, variant_key, disease_key, therapy_key, direction, significance) "
+                 "VALUES (5, 3, 1, 2, 'SUPPORTS', 'RESISTANCE')")
+    conn.commit()
+    refresh_query_evidence(conn)
+    conn.close()
+    with q.QueryEngine(db) as engine:
+        assert [r["eid"] for r in engine.iter_rows(build_query("g1202r", 10, "res", "all", gene="ros1"))] == [5]
+        assert [r["eid"] for r in engine.iter_rows(build_query("g1202r", 10, "res", "all"))] == [3, 2]
+        batch = engine.iter_batch(batch_items([{"variant": "g1202r", "gene": "ROS1"}, {"variant": "g1202r"}]))
+        assert [(r["row"], r["eid"]) for r in batch] == [(1, 5), (2, 3), (2, 2), (2, 1)]
+
+
+def test_batch_matches_one_query_per_row(tmp_path):
+    db = _db(tmp_path)
+    inputs = [{"variant": "g1202r", "significance": "res"}, {"variant": "nope"},
+              {"variant": "ALK L1196M", "disease": "nsclc"}, {"variant": "g1202r", "significance": "all"}]
+    with q.QueryEngine(db) as engine:
+        expected = [dict(row=i, **r) for i, rec in enumerate(inputs, start=1)
+                    for r in engine.iter_rows(build_query(rec["variant"], 2, rec.get("significance", "all"),
+                                                          rec.get("disease", "all")))]
+        assert list(engine.iter_batch(batch_items(inputs), limit=2)) == expected
+        assert [r["row"] for r in expected] == [1, 1, 3, 4, 4]
+        # the temp table is emptied, so the engine can run the next batch
+        assert list(engine.iter_batch(batch_items(inputs[2:3]))) == [dict(expected[2], row=1)]
+
+
+def test_run_batch_streams_csv_from_ndjson(tmp_path):
+    source = io.StringIO("\n".join(json.dumps(r) for r in [{"variant": "l1196m"}, {"variant": "g1202r",
+                                                                                     "significance": "sens"}]))
+    out = io.StringIO()
+    assert run_batch(_db(tmp_path), source, out, input_format="ndjson", output_format="csv") == 2
+    lines = out.getvalue().splitlines()
+    assert lines[0] == ",".join(("row",) + q.COLUMNS)
+    assert [line.split(",")[:2] for line in lines[1:]] == [["1", "4"], ["2", "1"]]
+
+    with pytest.raises(ValueError, match="Input row 1"):
+        list(batch_items([{"variant": "g1202r", "significance": "bogus"}]))
+
+
+def test_keyset_pages_walk_the_full_result(tmp_path):
+    everything = q.Query().where(eid=[1, 2, 3, 4])
+    with q.QueryEngine(_db(tmp_path)) as engine:
+        full = list(engine.iter_rows(everything))
+        pages, cursor = [], None
+        while True:
+            out = io.StringIO()
+            n, cursor = stream_query(engine, everything.limit(3).page_after(cursor), out, "ndjson")
+            pages.append([json.loads(line) for line in out.getvalue().splitlines()])
+            if cursor is None:
+                break
+    assert [len(p) for p in pages] == [3, 1]
+    assert [row for page in pages for row in page] == full
+    assert q.decode_cursor(q.encode_cursor(("crizotinib", 2, 7))) == ("crizotinib", 2, 7)
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        q.Query().page_after("not a cursor")
+
+
+@pytest.mark.parametrize("significance,disease", [("all", "all"), ("resistance", "all"), ("all", "nsclc"),
+                                                  ("resistance", "nsclc")])
+def test_query_shapes_are_one_index_range_scan_without_sort(tmp_path, significance, disease):
+    conn = config.get_conn(_db(tmp_path))
+    try:
+        rows = [tuple(r) for r in conn.execute("SELECT variant_norm, sort_label FROM query_evidence ORDER BY eid")]
+        assert rows == [("g1202r", "lorlatinib"), ("g1202r", "crizotinib"), ("g1202r", "alectinib"),
+                        ("l1196m", "brigatinib")]
+        for query in (build_query("g1202r", 25, significance, disease),
+                      build_query("g1202r", 25, significance, disease).page_after(q.encode_cursor(("b", 0, 0)))):
+            plan = " | ".join(r[-1] for r in conn.execute("EXPLAIN QUERY PLAN " + query.sql(), query.params()))
+            assert "TEMP B-TREE" not in plan and plan.startswith("SEARCH query_evidence USING"), plan
+    finally:
+        conn.close()
+
+
+def test_query_api_imports_without_the_http_client_stack():
+    code = ("import sys, alkfred.query; "
+            "print(sorted(m for m in ('utils', 'requests', 'graphql', 'http_cache') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         env={"PYTHONPATH": str(config.repo_root() / "src")})
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,63 @@
+# tests/test_rate_limiter.py
+import pytest
+import api_calls
+import utils
+
+
+class _FakeResponse:
+    def __init__(self, status_code, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self._body = body or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise utils.requests.exceptions.HTTPError(f"{self.status_code}")
+
+    def json(self):
+        return self._body
+
+
+def test_page_size_grows_when_fast_and_shrinks_on_trouble():
+    ctl = utils.PageSizeController(size=400, min_size=50, max_size=1000, target_latency=2.0)
+
+    assert ctl.record(0.1) == 500          # fast page: +25%
+    assert ctl.record(5.0) == 375          # slow page: -25%
+    assert ctl.record(0.0, ok=False) == 187  # failure: halve
+    for _ in range(50):
+        ctl.record(0.1)
+    assert ctl.size == 1000                # capped
+
+
+def test_help_request_honours_retry_after(monkeypatch):
+    bucket = utils.TokenBucket(rate=10.0, capacity=10.0)
+    monkeypatch.setattr(utils, "rate_limiter", bucket)
+    responses = iter([
+        _FakeResponse(429, headers={"Retry-After": "0"}),
+        _FakeResponse(200, body={"data": {"ok": True}}),
+    ])
+    monkeypatch.setattr(utils.s, "request", lambda **kw: next(responses))
+
+    out = utils.help_request("https://example.test/graphql", {}, payload={"query": "{}"}, method="POST")
+
+    assert out == {"data": {"ok": True}}
+    # one 429 halves the rate, the success adds the additive step back
+    assert bucket.rate == pytest.approx(5.0 + bucket.increase)
+
+
+def test_failed_page_is_retried_smaller(monkeypatch):
+    monkeypatch.setattr(api_calls, "page_sizer", utils.PageSizeController(size=400, min_size=50))
+    firsts = []
+
+    def _graphql(url, query, variables, headers):
+        firsts.append(variables["first"])
+        if len(firsts) == 1:
+            raise RuntimeError("Timeout after 10s")
+        return {"evidenceItems": {"nodes": [], "pageInfo": {"hasNextPage": False, "endCursor": None}}}
+
+    monkeypatch.setattr(api_calls, "graphql_query", _graphql)
+
+    pages = list(api_calls.iter_civic_evidence_pages())
+
+    assert pages == [([], None)]
+    assert firsts == [400, 200]
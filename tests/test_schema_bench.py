@@ -0,0 +1,9 @@
+from alkfred.bench.schema_bench import run_schema_bench
+
+
+def test_schema_bench_builds_both_layouts(tmp_path):
+    results = run_schema_bench(total=300, rounds=1, workdir=tmp_path)
+    before, after = results["before"], results["after"]
+    assert before["queries"] == after["queries"] > 0
+    assert after["indexes"] < before["indexes"]
+    assert after["bytes"] > 0 and before["bytes"] > 0
@@ -0,0 +1,72 @@
+import json
+import urllib.request
+
+import pytest
+
+from alkfred import config
+from alkfred.cli import query
+from alkfred.cli.serve import QueryServer
+from alkfred.sql.query_evidence_create import refresh_query_evidence
+
+
+def _db(tmp_path):
+    db = tmp_path / "serve.sqlite"
+    conn = config.get_conn(db)
+    config.create_schema(conn)
+    conn.execute("INSERT INTO dim_disease (doid, label_display, label_disease_norm) VALUES ('3908', 'NSCLC', 'nsclc')")
+    conn.execute("INSERT INTO dim_disease (doid, label_display, label_disease_norm) VALUES ('3910', 'LUAD', 'luad')")
+    conn.execute("INSERT INTO dim_gene_variant (variant_id, gene_symbol, label_display, label_gene_variant_norm) "
+                 "VALUES ('CA1', 'ALK', 'ALK G1202R', 'alk_g1202r')")
+    for i, (drug, significance) in enumerate([("Lorlatinib", "SENSITIVITY"), ("Crizotinib", "RESISTANCE"),
+                                              ("Alectinib", "RESISTANCE")], start=1):
+        conn.execute("INSERT INTO dim_therapy (therapy_id, label_display, label_therapy_norm) VALUES (?, ?, ?)",
+                     (f"t{i}", drug, drug.lower()))
+        conn.execute("INSERT INTO dim_evidence (eid, direction, significance) VALUES (?, 'SUPPORTS', ?)", (i, significance))
+        conn.execute("INSERT INTO fact_evidence (eid, variant_key, disease_key, therapy_key, direction, significance) "
+                     "VALUES (?, 1, ?, ?, 'SUPPORTS', ?)", (i, 1 + i % 2, i, significance))
+    conn.commit()
+    refresh_query_evidence(conn)
+    conn.close()
+    return db
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("significance,disease", [("all", "all"), ("resistance", "all"), ("all", "luad"),
+                                                  ("resistance", "nsclc")])
+def test_server_matches_query_choices(tmp_path, monkeypatch, significance, disease):
+    db = _db(tmp_path)
+    monkeypatch.setattr(config, "default_db_path", lambda: db)
+    expected, _ = query.query_choices("g1202r", 10, significance, disease)
+
+    with QueryServer(db, port=0, pool_size=2) as server:
+        status, body = _get(f"{server.url}/query?variant=g1202r&significance={significance}&disease={disease}&limit=10")
+    assert status == 200
+    assert body == {"rows": expected, "count": len(expected), "next_cursor": None}
+
+
+def test_server_rejects_bad_requests_and_never_writes(tmp_path):
+    db = _db(tmp_path)
+    with QueryServer(db, port=0, pool_size=1) as server:
+        assert _get(f"{server.url}/query?significance=all")[0] == 400
+        assert _get(f"{server.url}/query?variant=g1202r&significance=bogus")[0] == 400
+        assert _get(f"{server.url}/query?variant=g1202r&limit=0")[0] == 400
+        assert _get(f"{server.url}/nope")[0] == 404
+        assert _get(f"{server.url}/health") == (200, {"status": "ok"})
+        with server._pool.connection() as conn, pytest.raises(Exception):
+            conn.execute("DELETE FROM fact_evidence")
+
+
+def test_server_answers_unexpected_errors_with_json_500(tmp_path, monkeypatch):
+    db = _db(tmp_path)
+    with QueryServer(db, port=0, pool_size=1) as server:
+        monkeypatch.setattr(server, "handle", lambda path: 1 / 0)
+        assert _get(f"{server.url}/query?variant=g1202r") == (500, {"error": "division by zero"})
+        monkeypatch.undo()
+        assert _get(f"{server.url}/health") == (200, {"status": "ok"})
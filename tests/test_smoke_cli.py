@@ -91,3 +91,13 @@ def test_cli_overwrite_runs(tmp_path):
 
 
 
+
+
+def test_cli_rejects_incremental_bulk_before_fetching(tmp_path, monkeypatch):
+    def _no_fetch(*a, **kw):
+        raise AssertionError("fetch ran before the flags were validated")
+
+    monkeypatch.setattr(build.civic_fetch, "fetch_civic_evidence", _no_fetch)
+    with pytest.raises(SystemExit) as exc:
+        build.main(["--source", "civic", "--incremental", "--bulk", "--db", str(tmp_path / "x.sqlite")])
+    assert exc.value.code == 2
@@ -0,0 +1,52 @@
+# tests/test_snapshot.py
+import gzip
+import pytest
+from alkfred import config, snapshot
+
+NODES = [
+    {"id": 1, "molecularProfile": {"name": "EML4::ALK"}, "description": "crizotinib sensitivität"},
+    {"id": 2, "molecularProfile": {"name": "ALK G1202R"}},
+]
+
+
+@pytest.mark.parametrize("name", ["raw.json", "raw.json.gz", "raw.ndjson", "raw.ndjson.gz", "raw.jsonl"])
+def test_snapshot_round_trip(tmp_path, name):
+    path = tmp_path / name
+    config.save_to_json(NODES, path)
+
+    assert config.load_from_json(path) == NODES
+    assert list(config.iter_raw_evidence(path)) == NODES
+    assert config.raw_json_list_to_dict(path) == {0: NODES[0], 1: NODES[1]}
+    if name.endswith(".gz"):
+        assert path.read_bytes()[:2] == snapshot.GZIP_MAGIC
+
+
+def test_detection_ignores_misleading_names(tmp_path):
+    # gzip content under a plain name is still found by its magic bytes
+    path = tmp_path / "raw.json"
+    path.write_bytes(gzip.compress(b'[{"id": 1}]'))
+    assert config.load_from_json(path) == [{"id": 1}]
+
+    # NDJSON content under an unknown extension is sniffed
+    path = tmp_path / "raw.dump"
+    path.write_text('{"id": 1}\n{"id": 2}\n')
+    assert config.is_ndjson(path)
+    assert [n["id"] for n in config.iter_raw_evidence(path)] == [1, 2]
+
+
+def test_stdlib_fallback_without_orjson(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "orjson", None)
+    path = tmp_path / "raw.ndjson.gz"
+    snapshot.write_records(iter(NODES), path)
+    assert snapshot.load(path) == NODES
+
+
+def test_zstd_needs_optional_package(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "zstandard", None)
+    with pytest.raises(RuntimeError, match="zstandard"):
+        config.save_to_json(NODES, tmp_path / "raw.ndjson.zst")
+
+
+def test_split_name_keeps_compound_suffix():
+    assert snapshot.split_name("data/civic_raw_evidence_db.ndjson.gz") == ("civic_raw_evidence_db", ".ndjson.gz")
+    assert snapshot.split_name("civic_raw_evidence_db.json") == ("civic_raw_evidence_db", ".json")
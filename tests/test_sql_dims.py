@@ -1,6 +1,10 @@
 # tests/test_dim_disease_unit.py
 import sqlite3
+import uuid
 import pytest
+from pathlib import Path
+
+from conftest import civic_node
 
 def test_dim_disease_insert_and_select(tmp_path):
     # Use an isolated DB per test
@@ -39,5 +43,107 @@ def test_dim_disease_insert_and_select(tmp_path):
     
 
 
+def test_load_dimensions_single_pass(tmp_path, monkeypatch):
+    from alkfred import config
+    from alkfred.sql.dim_load import civic_dim_gene_variant, civic_dim_load
+
+    db = tmp_path / "dims.sqlite"
+    raw = tmp_path / "raw.ndjson"
+    config.save_to_json([civic_node(1), civic_node(2, doid="3910", ca_id=None, therapy="Lorlatinib", ncit=None)], raw)
+
+    conn = config.get_conn(db)
+    conn.executescript((Path(config.__file__).parent / "sql" / "schema.sql").read_text())
+
+    reads = []
+    real_iter = config.iter_raw_evidence
+    monkeypatch.setattr(config, "iter_raw_evidence", lambda p: reads.append(p) or real_iter(p))
+    counts = civic_dim_load.load_dimensions(conn, raw, batch_size=1)
+
+    assert reads == [raw]
+    assert counts == {"dim_disease": 2, "dim_gene_variant": 2, "dim_therapy": 2, "dim_evidence": 2}
+    assert {r[0] for r in conn.execute("SELECT doid FROM dim_disease")} == {"3908", "3910"}
+    # no CA id: gene-scoped uuid5, the same id the link loader derives
+    fallback = str(uuid.uuid5(civic_dim_gene_variant.UUID_NAMESPACE, "variant|alk|g1202r"))
+    assert {r[0] for r in conn.execute("SELECT variant_id FROM dim_gene_variant")} == {"CA1", fallback}
+    assert conn.execute("SELECT synonyms_json FROM dim_disease WHERE doid='3908'").fetchone()[0] == '["NSCLC"]'
+    assert conn.execute("SELECT COUNT(*) FROM dim_evidence").fetchone()[0] == 2
+    conn.close()
+
+
+def test_bulk_schema_defers_indexes_and_reports_orphans(tmp_path):
+    from alkfred import config
 
+    db = tmp_path / "bulk.sqlite"
+    config.apply_schema(db, with_indexes=False)
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'idx_%'").fetchone()[0] == 0
+    conn.execute("INSERT INTO evidence_link (eid, disease_key, variant_key, therapy_key) VALUES (1, 1, 1, 1)")
+    conn.commit()
+    conn.close()
+
+    config.apply_indexes(db)
+    report = config.foreign_key_report(db)
+
+    assert report == {("evidence_link", "dim_evidence"): 1, ("evidence_link", "dim_disease"): 1,
+                      ("evidence_link", "dim_gene_variant"): 1, ("evidence_link", "dim_therapy"): 1}
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'idx_%'").fetchone()[0] > 0
+    conn.close()
 
+
+def test_parallel_dimension_load_matches_single_pass(tmp_path):
+    from alkfred import config
+    from alkfred.sql.dim_load import civic_dim_load
+
+    shards = [tmp_path / "raw_ALK.json", tmp_path / "raw_ROS1.ndjson"]
+    config.save_to_json([civic_node(1), civic_node(2, doid="3910", ca_id=None, therapy="Lorlatinib", ncit=None)], shards[0])
+    config.save_to_json([civic_node(3, ca_id="CA9"), civic_node(1)], shards[1])
+
+    def dump(conn):
+        return {t: sorted(tuple(r)[:3] for r in conn.execute(f"SELECT * FROM {t}"))
+                for t in civic_dim_load.DIMENSIONS}
+
+    serial = config.get_conn(tmp_path / "serial.sqlite")
+    config.create_schema(serial)
+    for shard in shards:
+        civic_dim_load.load_dimensions(serial, shard)
+
+    parallel = config.get_conn(tmp_path / "parallel.sqlite")
+    config.create_schema(parallel)
+    counts = civic_dim_load.load_dimensions_parallel(parallel, shards, workers=3, staging_dir=tmp_path)
+
+    assert counts["dim_evidence"] == 4
+    assert dump(parallel) == dump(serial)
+    assert not list(tmp_path.glob("alkfred-stage-*"))
+    serial.close()
+    parallel.close()
+
+
+def test_plan_staging_units_cuts_by_dimension_for_a_single_snapshot():
+    from alkfred.sql.dim_load import civic_dim_load
+
+    buckets = civic_dim_load.plan_staging_units([Path("raw.json")], workers=4)
+    assert [tables for bucket in buckets for _, tables in bucket] == [(t,) for t in civic_dim_load.DIMENSIONS]
+    whole = civic_dim_load.plan_staging_units([Path("a.json"), Path("b.json")], workers=2)
+    assert [len(bucket) for bucket in whole] == [1, 1]
+    assert whole[0][0][1] == tuple(civic_dim_load.DIMENSIONS)
+
+
+def test_no_index_duplicates_a_key_or_another_index(tmp_path):
+    from alkfred import config
+
+    db = tmp_path / "idx.sqlite"
+    config.apply_schema(db)
+    conn = sqlite3.connect(db)
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        pk = [r[1] for r in sorted(conn.execute(f"PRAGMA table_info({table})"), key=lambda r: r[5]) if r[5]]
+        keys = {name: [r[2] for r in conn.execute(f"PRAGMA index_info({name})")]
+                for _, name, *_ in conn.execute(f"PRAGMA index_list({table})")}
+        for name, cols in keys.items():
+            if name.startswith("sqlite_autoindex"):
+                continue
+            assert cols[:len(pk)] != pk[:len(cols)] or not pk, (table, name)
+            for other, other_cols in keys.items():
+                assert other == name or other_cols[:len(cols)] != cols, (table, name, other)
+    conn.close()